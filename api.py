@@ -4,16 +4,25 @@ import numpy as np
 import pandas as pd
 import datetime
 import json
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, jsonify, request, abort
 from flask_cors import CORS
-import yfinance as yf
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import LSTM, Dense
 from werkzeug.middleware.proxy_fix import ProxyFix
 import ssl
 import urllib3
+from ohlcv_store import get_store
+from model_registry import ModelKey, ModelRegistry, get_registry, MODEL_WARM_COUNT
+from training_jobs import TrainingJobQueue, TrainingPending, COMPLETED, FAILED
+from inference_batcher import InferenceBatcher
+from windows import sliding_windows
+from global_model import GLOBAL_SYMBOL, MODEL_MODE, global_key
+from scalers import PriceScaler, NORMALIZATION, NORMALIZATION_MODES
+from metrics import REGISTRY, instrument_app, cache_metrics, upstream_metrics, observe, timed, trace
+from upstream import UpstreamError
+from precompute import PrecomputeScheduler, refresh_bars, PRECOMPUTE_PREDICT_DAYS, PRECOMPUTE_WORKERS
 
 # SSL certificate verification fix for Windows
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -31,10 +40,20 @@ logger = logging.getLogger("stock_prediction_api")
 
 app = Flask(__name__)
 CORS(app)
+instrument_app(app)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
-MODEL_PATH = 'lstm_model.h5'
 TIME_STEP = 90  # Daha uzun pattern yakalamak için artırıldı
+DEFAULT_MODEL_PARAMS = {
+    'time_step': TIME_STEP,
+    'units': [100, 50, 25],
+    'epochs': 100,
+    'batch_size': 16,
+}
+MAX_HORIZON = 60  # trading days
+FORECAST_CACHE_SIZE = int(os.environ.get('FORECAST_CACHE_SIZE', 1024))
+# Seconds a synchronous /predict waits for a new model before answering 202 with the job id
+PREDICT_TRAIN_WAIT = float(os.environ.get('PREDICT_TRAIN_WAIT', 10))
 
 def convert_turkish_chars(text):
     tr_chars = {
@@ -45,56 +64,143 @@ def convert_turkish_chars(text):
         text = text.replace(tr_char, en_char)
     return text
 
+def preload(runtime=None):
+    """Import TensorFlow and scikit-learn now instead of on first use.
+    
+    They are imported lazily so the app answers / and /ready within a second of
+    starting; the warm-up thread and serve.py (before forking) call this. The
+    NumPy inference runtime does not need TensorFlow."""
+    import sklearn.metrics  # noqa: F401
+    if (runtime or get_registry().runtime) == 'keras':
+        import tensorflow.keras  # noqa: F401
+
+def data_fingerprint(data, scaler=None):
+    """Short hash of the bar dates and closes a prediction is computed from, and of
+    the scaler applied to them"""
+    digest = hashlib.sha1(data.index.values.astype('datetime64[D]').tobytes())
+    digest.update(np.ascontiguousarray(data['Close'].to_numpy(dtype=np.float64)).tobytes())
+    if scaler is not None:
+        digest.update(np.array([scaler.data_min, scaler.data_max]).tobytes())
+    return digest.hexdigest()[:16]
+
 class StockPredictor:
     
-    def __init__(self):
-        self.model = self._load_model()
+    def __init__(self, registry=None, jobs=None, batcher=None, runtime=None, model_mode=None, normalization=None):
+        # runtime ('keras' or 'numpy') overrides INFERENCE_RUNTIME, model_mode overrides MODEL_MODE,
+        # normalization overrides NORMALIZATION
+        self.registry = registry or (ModelRegistry(runtime=runtime) if runtime else get_registry())
+        self.model_mode = model_mode or MODEL_MODE
+        if self.model_mode not in ('auto', 'symbol', 'global'):
+            raise ValueError(f"Unknown model mode: {self.model_mode}")
+        self.normalization = normalization or NORMALIZATION
+        if self.normalization not in NORMALIZATION_MODES:
+            raise ValueError(f"Unknown normalization: {self.normalization}")
+        self.jobs = jobs
+        self.batcher = batcher or InferenceBatcher()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='metrics-refresh')
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self.metrics_hits = 0  # stored validation metrics reused (fresh or stale)
+        self.metrics_misses = 0
+        self._forecasts = OrderedDict()  # see forecast_token
+        self._forecasts_lock = threading.Lock()
+        self.forecast_hits = 0
+        self.forecast_misses = 0
         
-    def _load_model(self):
-        if os.path.exists(MODEL_PATH):
-            logger.info(f"Loading existing model from {MODEL_PATH}")
-            return load_model(MODEL_PATH)
-        logger.info("No existing model found")
-        return None
+    def model_params(self, stock_symbol):
+        """Tuned hyperparameters for the symbol (see model_tuning.py), else the defaults"""
+        return self.registry.tuned_params(stock_symbol) or DEFAULT_MODEL_PARAMS
+    
+    def model_key(self, stock_symbol, params=None):
+        return ModelKey.create(stock_symbol, **(params or self.model_params(stock_symbol)))
+    
+    def serving_key(self, stock_symbol):
+        """Key of the model that answers for a symbol: its own, or the global model (see global_model.py)"""
+        if self.model_mode == 'global':
+            return global_key()
+        key = self.model_key(stock_symbol)
+        if self.model_mode == 'auto' and self.registry.get(key) is None and self.registry.get(global_key()) is not None:
+            return global_key()
+        return key
+    
+    def warm_up(self, count=MODEL_WARM_COUNT):
+        """Import the ML libraries and load the most requested symbols' models in the background"""
+        def run():
+            started = datetime.datetime.now()
+            preload(self.registry.runtime)
+            symbols = [symbol for symbol in self.registry.popular_symbols(count) if symbol != GLOBAL_SYMBOL]
+            if symbols:
+                logger.info(f"Warming models for {', '.join(symbols)}")
+            keys = [self.model_key(symbol) for symbol in symbols]
+            if self.model_mode != 'symbol':
+                keys.append(global_key())
+            loaded = self.registry.warm(keys)
+            # Keras traces the predict function for the first two batch sizes it sees and
+            # generalizes after that; pay for both traces before traffic arrives
+            for key, entry in loaded.items():
+                try:
+                    for rows in (1, 2):
+                        self.batcher.predict((key, entry.version), entry.model,
+                                             np.zeros((rows, key.param_dict['time_step'], 1), dtype=np.float32))
+                except Exception as e:
+                    logger.warning(f"Warm-up inference failed for {key.symbol}: {str(e)}")
+            logger.info(f"Warm-up finished in {(datetime.datetime.now() - started).total_seconds():.2f}s")
+        
+        thread = threading.Thread(target=run, name='predictor-warmup', daemon=True)
+        thread.start()
+        return thread
     
     def get_stock_data(self, stock_symbol, start_date, end_date):
         stock_symbol = convert_turkish_chars(stock_symbol)
-        logger.info(f"Fetching data for {stock_symbol} from {start_date} to {end_date}")
-        return yf.download(stock_symbol, start=start_date, end=end_date)
+        trace(f"Fetching data for {stock_symbol} from {start_date} to {end_date}")
+        with timed('fetch'):
+            return get_store().get(stock_symbol, start_date, end_date)
     
     def preprocess_data(self, data):
         if data.empty:
             raise ValueError("No data available for this stock")
             
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_data = scaler.fit_transform(data[['Close']].values)
-        return scaled_data, scaler
+        scaler = PriceScaler.fit(data['Close'])
+        return scaler.transform(data[['Close']].values), scaler
+    
+    def scaler_for(self, key, meta, stock_symbol, data):
+        """Input scaler of a model version for a symbol's bars, following NORMALIZATION (see scalers.py)"""
+        if key.symbol == GLOBAL_SYMBOL:
+            stored = meta.get('scalers', {}).get(stock_symbol)
+        else:
+            stored = meta.get('scaler')
+        if stored is None or self.normalization == 'refit':
+            return self.preprocess_data(data)[1]
+        
+        scaler = PriceScaler.from_dict(stored)
+        train_end = meta.get('train_end')
+        if self.normalization == 'rolling' and train_end and data.index[-1] >= pd.Timestamp(train_end):
+            # Widen the range to the bars since training, up to the last one of this request
+            newer = get_store().get(stock_symbol, train_end, data.index[-1] + pd.Timedelta(days=1))
+            scaler = scaler.extend(newer['Close'].to_numpy())
+        return scaler
     
     def prepare_data(self, scaled_data, time_step=TIME_STEP):
-        if len(scaled_data) <= time_step:
-            raise ValueError(f"Insufficient data: {len(scaled_data)} points available, {time_step} required")
-            
-        X, y = [], []
-        for i in range(time_step, len(scaled_data)):
-            X.append(scaled_data[i - time_step:i, 0])
-            y.append(scaled_data[i, 0])
-            
-        X = np.array(X)
-        y = np.array(y)
-        X = np.reshape(X, (X.shape[0], X.shape[1], 1))
-        return X, y
+        # Strided views over scaled_data, the overlapping windows are not copied
+        return sliding_windows(scaled_data, time_step)
     
-    def create_model(self, input_shape):
+    def create_model(self, input_shape, units=(100, 50, 25)):
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, Dense
+        
         model = Sequential()
-        model.add(LSTM(units=100, return_sequences=True, input_shape=input_shape))
-        model.add(LSTM(units=50, return_sequences=True))
-        model.add(LSTM(units=25, return_sequences=False))
+        model.add(LSTM(units=units[0], return_sequences=True, input_shape=input_shape))
+        for layer_units in units[1:-1]:
+            model.add(LSTM(units=layer_units, return_sequences=True))
+        model.add(LSTM(units=units[-1], return_sequences=False))
         model.add(Dense(units=1))
         model.compile(optimizer='adam', loss='mean_squared_error', metrics=['mae'])
         return model
     
-    def train_model(self, stock_symbol, start_date, end_date):
+    def train_model(self, stock_symbol, start_date, end_date, params=None, progress=None):
         try:
+            params = params or self.model_params(stock_symbol)
+            key = self.model_key(stock_symbol, params)
             logger.info(f"Training model for {stock_symbol}")
             
             train_start = (datetime.datetime.strptime(start_date, "%Y-%m-%d") - 
@@ -103,47 +209,208 @@ class StockPredictor:
             data = self.get_stock_data(stock_symbol, train_start, end_date)
             scaled_data, scaler = self.preprocess_data(data)
             
-            X, y = self.prepare_data(scaled_data)
+            X, y = self.prepare_data(scaled_data, params['time_step'])
+            
+            model = self.create_model((X.shape[1], 1), params['units'])
             
-            model = self.create_model((X.shape[1], 1))
+            callbacks = []
+            if progress is not None:
+                from tensorflow.keras.callbacks import LambdaCallback
+                
+                callbacks.append(LambdaCallback(on_epoch_end=lambda epoch, logs: progress(
+                    epoch + 1, params['epochs'], {k: float(v) for k, v in (logs or {}).items()})))
+            
+            model.fit(X, y, epochs=params['epochs'], batch_size=params['batch_size'], validation_split=0.2,
+                      verbose=1, callbacks=callbacks)
             
-            model.fit(X, y, epochs=100, batch_size=16, validation_split=0.2, verbose=1)
+            meta = {
+                'train_start': train_start,
+                'train_end': end_date,
+                'data_points': len(data),
+                'scaler': scaler.to_dict(),
+            }
+            version = self.registry.save(key, model, meta)
             
-            model.save(MODEL_PATH)
-            self.model = model
+            logger.info(f"Model training completed for {stock_symbol} (v{version})")
             
-            logger.info(f"Model training completed for {stock_symbol}")
+            # Validation metrics for the requested range are served from the artifact later
+            try:
+                eval_data = self.get_stock_data(stock_symbol, start_date, end_date)
+                self.evaluate(key, version, model, eval_data, f"{start_date}:{end_date}",
+                              self.scaler_for(key, meta, stock_symbol, eval_data))
+            except Exception as e:
+                logger.warning(f"Could not compute validation metrics for {stock_symbol}: {str(e)}")
             return model, scaler
             
         except Exception as e:
             logger.error(f"Error training model: {str(e)}")
             raise
     
-    def predict(self, stock_symbol, start_date, end_date):
+    def submit_training(self, stock_symbol, start_date, end_date, params=None):
+        """Queue a background training job; returns (job, created)"""
+        key = self.model_key(stock_symbol, params)
+        return self.jobs.submit(key, stock_symbol, start_date, end_date, params)
+    
+    def ensure_model(self, stock_symbol, start_date, end_date, wait=True, key=None, train_wait=None):
+        """Return the cached model for a symbol, training it in the job pool if needed.
+        Raises TrainingPending when not waiting, or when training takes longer than train_wait seconds"""
+        key = key or self.model_key(stock_symbol)
+        entry = self.registry.get(key)
+        if entry is not None:
+            return entry
+        if key.symbol == GLOBAL_SYMBOL:
+            raise RuntimeError("No global model has been trained yet (python -m global_model)")
+        
+        logger.info(f"Training new model for {stock_symbol}")
+        job, _ = self.submit_training(stock_symbol, start_date, end_date, key.param_dict)
+        if not wait:
+            raise TrainingPending(job)
+        
+        job = self.jobs.wait(job['id'], timeout=train_wait)
+        if job is not None and job['status'] not in (COMPLETED, FAILED):
+            raise TrainingPending(job)
+        if job is None or job['status'] != COMPLETED:
+            raise RuntimeError(f"Model training failed for {stock_symbol}: {job and job['error']}")
+        return self.registry.get(key)
+    
+    def evaluate(self, key, version, model, data, data_range, scaler=None):
+        """Compute validation metrics of a model version on ``data`` and store them with the artifact.
+        ``scaler`` is the model's input scaler for these bars (see scaler_for); None fits one on ``data``"""
+        if scaler is None:
+            scaled_data, scaler = self.preprocess_data(data)
+        else:
+            scaled_data = scaler.transform(data[['Close']].values)
+        X, y = self.prepare_data(scaled_data, key.param_dict['time_step'])
+        val_size = max(1, len(X) // 5)
+        outputs = self.batcher.predict((key, version), model, X[-val_size:])
+        metrics = self.calculate_performance_metrics(outputs, y[-val_size:], scaler)
+        self.registry.save_metrics(key, version, data_fingerprint(data, scaler), data_range, metrics)
+        return metrics
+    
+    def cached_metrics(self, key, version, fingerprint, data_range):
+        """Stored metrics for this version and data; falls back to the newest ones for the
+        same date range (returned with stale=True) when new bars have arrived since"""
+        entries = self.registry.read_metrics(key, version)
+        if fingerprint not in entries:
+            entries = self.registry.read_metrics(key, version, reload=True)
+        if fingerprint in entries:
+            return entries[fingerprint]['metrics'], False
+        same_range = [entry for entry in entries.values() if entry.get('range') == data_range]
+        if same_range:
+            return max(same_range, key=lambda entry: entry['computed_at'])['metrics'], True
+        return None, False
+    
+    def refresh_metrics_async(self, key, entry, data, data_range, scaler):
+        """Recompute metrics for new bars in the background, once per version and fingerprint"""
+        token = (key, entry.version, data_fingerprint(data, scaler))
+        with self._refresh_lock:
+            if token in self._refreshing:
+                return
+            self._refreshing.add(token)
+        
+        def refresh():
+            try:
+                self.evaluate(key, entry.version, entry.model, data, data_range, scaler)
+                logger.info(f"Refreshed validation metrics for {key.symbol} v{entry.version}")
+            except Exception as e:
+                logger.warning(f"Metrics refresh failed for {key.symbol}: {str(e)}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(token)
+        
+        self._refresh_pool.submit(refresh)
+    
+    def rollout(self, entry, window, first_step, horizon):
+        """Recursive multi-step forecast: each predicted value is appended to the
+        window for the next step. Only ``first_step`` went through the batcher;
+        the later steps depend on each other and call the model directly, so
+        they do not each wait out the batching window."""
+        window = np.asarray(window, dtype=np.float32)
+        steps = [float(first_step)]
+        for _ in range(1, horizon):
+            window = np.concatenate([window[1:], [[steps[-1]]]])
+            output = np.asarray(entry.model.predict_on_batch(window[np.newaxis]))
+            steps.append(float(output[0, 0]))
+        return np.array(steps).reshape(-1, 1)
+    
+    def forecast_token(self, key, version, stock_symbol, data, scaler):
+        """The forecast depends only on the model and the last window, i.e. on the bars up to
+        the last one (final, except for a live bar that is identified by its close) and the scaler"""
+        return (key, version, stock_symbol, data.index[-1], float(data['Close'].iloc[-1]),
+                scaler.data_min, scaler.data_max)
+    
+    def cached_forecast(self, token, horizon):
+        """Scaled forecast path of at least ``horizon`` steps computed earlier, else None"""
+        with self._forecasts_lock:
+            path = self._forecasts.get(token)
+            if path is not None and len(path) >= horizon:
+                self._forecasts.move_to_end(token)
+                self.forecast_hits += 1
+                return path
+            self.forecast_misses += 1
+            return None
+    
+    def store_forecast(self, token, path):
+        with self._forecasts_lock:
+            self._forecasts[token] = path
+            self._forecasts.move_to_end(token)
+            while len(self._forecasts) > FORECAST_CACHE_SIZE:
+                self._forecasts.popitem(last=False)
+    
+    def predict(self, stock_symbol, start_date, end_date, wait=True, horizon=1, train_wait=None):
         try:
             data = self.get_stock_data(stock_symbol, start_date, end_date)
             
             if data.empty:
                 raise ValueError(f"No data available for {stock_symbol}")
                 
-            scaled_data, scaler = self.preprocess_data(data)
+            key = self.serving_key(stock_symbol)
+            entry = self.ensure_model(stock_symbol, start_date, end_date, wait, key, train_wait)
             
-            if self.model is None or len(scaled_data) < TIME_STEP:
-                logger.info(f"Training new model for {stock_symbol}")
-                self.model, scaler = self.train_model(stock_symbol, start_date, end_date)
+            # Scale the inputs like the model's training data instead of refitting on this range
+            scaler = self.scaler_for(key, entry.meta, stock_symbol, data)
+            scaled_data = scaler.transform(data[['Close']].values)
             
-            X, y = self.prepare_data(scaled_data)
+            X, y = self.prepare_data(scaled_data, key.param_dict['time_step'])
             
             if len(X) == 0:
                 raise ValueError("Not enough data points for prediction")
             
-            # Predict for the last point (future prediction)
-            predicted_scaled = self.model.predict(X[-1].reshape(1, X.shape[1], 1))
-            predicted_price = scaler.inverse_transform(predicted_scaled)
-            predicted_price = float(predicted_price[0][0])
+            data_range = f"{start_date}:{end_date}"
+            if key.symbol != stock_symbol:
+                # The global model's metrics are stored per symbol
+                data_range = f"{stock_symbol}@{data_range}"
+            fingerprint = data_fingerprint(data, scaler)
+            performance_metrics, stale = self.cached_metrics(key, entry.version, fingerprint, data_range)
+            token = self.forecast_token(key, entry.version, stock_symbol, data, scaler)
+            path_scaled = self.cached_forecast(token, horizon)
+            
+            if performance_metrics is None:
+                self.metrics_misses += 1
+                # Last window (future prediction) and the last 20% of windows (validation
+                # metrics) go through the model in one pass, batched with concurrent requests
+                val_size = max(1, len(X) // 5)
+                windows = X[-val_size:] if path_scaled is not None else np.concatenate([X[-1:], X[-val_size:]])
+                with timed('predict'):
+                    outputs = self.batcher.predict((key, entry.version), entry.model, windows)
+                if path_scaled is None:
+                    first_step, outputs = outputs[0, 0], outputs[1:]
+                performance_metrics = self.calculate_performance_metrics(outputs, y[-val_size:], scaler)
+                self.registry.save_metrics(key, entry.version, fingerprint, data_range, performance_metrics)
+            else:
+                self.metrics_hits += 1
+                if path_scaled is None:
+                    with timed('predict'):
+                        first_step = self.batcher.predict((key, entry.version), entry.model, X[-1:])[0, 0]
+                if stale:
+                    self.refresh_metrics_async(key, entry, data, data_range, scaler)
             
-            # Calculate performance metrics on validation data
-            performance_metrics = self.calculate_performance_metrics(X, y, scaler)
+            if path_scaled is None:
+                with timed('rollout'):
+                    path_scaled = self.rollout(entry, X[-1], first_step, horizon)
+                self.store_forecast(token, path_scaled)
+            path = scaler.inverse_transform(path_scaled[:horizon]).flatten()
+            predicted_price = float(path[0])
             
             last_actual_price = data['Close'].iloc[-1]
             price_change = predicted_price - last_actual_price
@@ -158,6 +425,7 @@ class StockPredictor:
                 "prediction_date": datetime.datetime.now().strftime("%Y-%m-%d"),
                 "last_close_date": data.index[-1].strftime("%Y-%m-%d"),
                 "data_points": len(data),
+                "model": "global" if key.symbol == GLOBAL_SYMBOL else "symbol",
                 # Performance metrics
                 "accuracy": performance_metrics["accuracy"],
                 "mae": performance_metrics["mae"],
@@ -165,23 +433,26 @@ class StockPredictor:
                 "r2": performance_metrics["r2"]
             }
             
+            if horizon > 1:
+                dates = pd.bdate_range(data.index[-1] + pd.offsets.BDay(1), periods=horizon)
+                result["horizon"] = horizon
+                result["predicted_path"] = [
+                    {"date": date.strftime("%Y-%m-%d"), "price": float(price)} for date, price in zip(dates, path)
+                ]
+            
             return result
             
+        except TrainingPending:
+            raise
         except Exception as e:
             logger.error(f"Prediction error for {stock_symbol}: {str(e)}")
             raise
     
-    def calculate_performance_metrics(self, X, y_actual, scaler):
-        """Calculate model performance metrics"""
+    def calculate_performance_metrics(self, y_pred_scaled, y_val, scaler):
+        """Calculate model performance metrics from validation predictions"""
+        from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+        
         try:
-            # Use last 20% of data for validation metrics
-            val_size = max(1, len(X) // 5)
-            X_val = X[-val_size:]
-            y_val = y_actual[-val_size:]
-            
-            # Predict on validation data
-            y_pred_scaled = self.model.predict(X_val)
-            
             # Convert back to original scale
             y_actual_original = scaler.inverse_transform(y_val.reshape(-1, 1)).flatten()
             y_pred_original = scaler.inverse_transform(y_pred_scaled).flatten()
@@ -219,7 +490,78 @@ class StockPredictor:
                 "r2": 0.0
             }
 
-predictor = StockPredictor()
+def train_symbol_model(stock_symbol, start_date, end_date, params=None, progress=None):
+    """Training job entry point, executed inside the worker pool"""
+    trainer = StockPredictor()
+    trainer.train_model(stock_symbol, start_date, end_date, params, progress=progress)
+    key = trainer.model_key(stock_symbol, params)
+    return {"symbol": stock_symbol, "version": trainer.registry.latest_version(key)}
+
+def on_training_complete(key, job):
+    # Load a freshly trained model into this process's LRU before it is requested
+    predictor.registry.warm_async([key])
+    if job['started_at'] is not None:
+        observe('train', job['finished_at'] - job['started_at'])
+
+job_queue = TrainingJobQueue(train_symbol_model, on_complete=on_training_complete)
+predictor = StockPredictor(jobs=job_queue)
+cache_metrics({
+    'model': lambda: (predictor.registry.cache_hits, predictor.registry.cache_misses),
+    'validation_metrics': lambda: (predictor.metrics_hits, predictor.metrics_misses),
+    'forecast': lambda: (predictor.forecast_hits, predictor.forecast_misses),
+})
+upstream_metrics(lambda: get_store().gate)
+REGISTRY.function('smartbist_inference_batches_total', 'Forward passes run by the inference batcher',
+                  lambda: {(): predictor.batcher.batches}, kind='counter')
+REGISTRY.function('smartbist_inference_requests_total', 'Inference requests merged into those passes',
+                  lambda: {(): predictor.batcher.requests}, kind='counter')
+REGISTRY.function('smartbist_training_jobs_active', 'Queued or running training jobs',
+                  lambda: {(): job_queue.active_count()})
+ready = threading.Event()
+
+def precompute_forecasts(symbols):
+    """After the close: refresh the bars, then compute the forecasts and validation metrics of
+    the watchlist for the last PRECOMPUTE_PREDICT_DAYS days, several symbols at a time.
+    Missing models are trained in the job pool first."""
+    symbols = list(dict.fromkeys(convert_turkish_chars(s) for s in symbols))
+    refresh_bars(symbols, PRECOMPUTE_PREDICT_DAYS)
+    end = datetime.date.today() + datetime.timedelta(days=1)
+    start = (end - datetime.timedelta(days=PRECOMPUTE_PREDICT_DAYS)).strftime("%Y-%m-%d")
+    end = end.strftime("%Y-%m-%d")
+    
+    def run(symbol):
+        try:
+            predictor.predict(symbol, start, end, horizon=MAX_HORIZON)
+            return True
+        except Exception as e:
+            logger.warning(f"Precompute failed for {symbol}: {str(e)}")
+            return False
+    
+    with ThreadPoolExecutor(max_workers=PRECOMPUTE_WORKERS, thread_name_prefix='precompute') as pool:
+        done = sum(pool.map(run, symbols))
+    return {"forecasts": done, "failed": len(symbols) - done}
+
+precompute_scheduler = PrecomputeScheduler('forecasts', precompute_forecasts)
+
+def start_background_tasks():
+    """Per-process startup work. serve.py calls this in each worker after the fork,
+    since threads and TensorFlow runtime state do not survive fork()"""
+    warmup = predictor.warm_up()
+    
+    def mark_ready():
+        warmup.join()
+        ready.set()
+        logger.info("Prediction API is ready")
+        precompute_scheduler.start()
+    
+    threading.Thread(target=mark_ready, name='readiness', daemon=True).start()
+
+def shutdown():
+    """Stop reporting ready and release background resources"""
+    ready.clear()
+    precompute_scheduler.stop()
+    job_queue.shutdown()
+    predictor.registry.flush()
 
 @app.route('/', methods=['GET'])
 def home():
@@ -227,7 +569,11 @@ def home():
         "name": "Stock Price Prediction API",
         "version": "1.0.0",
         "endpoints": {
-            "/predict": "GET - Predict stock price (params: symbol, start, end)",
+            "/predict": "GET - Predict stock price (params: symbol, start, end, horizon, async)",
+            "/train": "POST - Queue a training job (body: symbol, start, end)",
+            "/jobs/<id>": "GET - Training job status and epoch metrics",
+            "/ready": "GET - Readiness probe (503 until popular models are loaded)",
+            "/metrics": "GET - Prometheus metrics",
             "/": "GET - This help message"
         }
     })
@@ -240,28 +586,40 @@ def predict_endpoint():
         start_date = request.args.get('start', '2020-01-01')
         end_date = request.args.get('end', '2023-01-01')
         
-        logger.info(f"Prediction request for {stock_symbol} from {start_date} to {end_date}")
+        trace(f"Prediction request for {stock_symbol} from {start_date} to {end_date}")
         
         try:
             datetime.datetime.strptime(start_date, "%Y-%m-%d")
             datetime.datetime.strptime(end_date, "%Y-%m-%d")
         except ValueError:
             return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        
+        try:
+            horizon = int(request.args.get('horizon', 1))
+        except ValueError:
+            horizon = 0
+        if not 1 <= horizon <= MAX_HORIZON:
+            return jsonify({"error": f"horizon must be an integer between 1 and {MAX_HORIZON}"}), 400
             
-        result = predictor.predict(stock_symbol, start_date, end_date)
+        wait = request.args.get('async', 'false').lower() not in ('1', 'true', 'yes')
+        result = predictor.predict(stock_symbol, start_date, end_date, wait=wait, horizon=horizon,
+                                   train_wait=PREDICT_TRAIN_WAIT)
         
-        print(f"\n--- PREDICTION RESULTS ---")
-        print(f"Symbol: {result['symbol']}")
-        print(f"Current Price: {result['current_price']:.2f}")
-        print(f"Predicted Price: {result['predicted_price']:.2f}")
-        print(f"Change: {result['price_change']:.2f} ({result['percent_change']:.2f}%)")
-        print(f"Prediction Date: {result['prediction_date']}")
-        print(f"Last Close Date: {result['last_close_date']}")
-        print(f"Data Points Used: {result['data_points']}")
-        print("-------------------------\n")
+        trace(f"{result['symbol']}: {result['current_price']:.2f} -> {result['predicted_price']:.2f} "
+              f"({result['percent_change']:.2f}%, {result['data_points']} bars, {result['model']} model)")
         
-        return jsonify(result)
+        with timed('serialize'):
+            return jsonify(result)
         
+    except TrainingPending as e:
+        return jsonify({
+            "status": "training",
+            "job_id": e.job['id'],
+            "status_url": f"/jobs/{e.job['id']}"
+        }), 202
+    except UpstreamError as e:
+        logger.warning(f"Market data provider error: {str(e)}")
+        return jsonify({"error": "Market data provider is unavailable, try again later"}), 503
     except ValueError as e:
         logger.warning(f"Value error: {str(e)}")
         return jsonify({"error": str(e)}), 400
@@ -269,6 +627,47 @@ def predict_endpoint():
         logger.error(f"Unexpected error: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
 
+@app.route('/train', methods=['POST'])
+def train_endpoint():
+    try:
+        payload = request.get_json(silent=True) or request.form
+        stock_symbol = convert_turkish_chars(payload.get('symbol', 'ISCTR.BIST'))
+        start_date = payload.get('start', '2020-01-01')
+        end_date = payload.get('end', '2023-01-01')
+        
+        try:
+            datetime.datetime.strptime(start_date, "%Y-%m-%d")
+            datetime.datetime.strptime(end_date, "%Y-%m-%d")
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        
+        job, created = predictor.submit_training(stock_symbol, start_date, end_date)
+        logger.info(f"Training request for {stock_symbol}: job {job['id']} ({'new' if created else 'existing'})")
+        
+        return jsonify({
+            "job_id": job['id'],
+            "status": job['status'],
+            "deduplicated": not created,
+            "status_url": f"/jobs/{job['id']}"
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/ready', methods=['GET'])
+def readiness():
+    if not ready.is_set():
+        return jsonify({"status": "not ready"}), 503
+    return jsonify({"status": "ready", "models_loaded": len(predictor.registry.cached_keys())})
+
 @app.errorhandler(404)
 def not_found(e):
     return jsonify({"error": "Endpoint not found"}), 404
@@ -279,4 +678,5 @@ def server_error(e):
 
 if __name__ == '__main__':
     logger.info("Starting Stock Prediction API server")
+    start_background_tasks()
     app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""Vectorized walk-forward backtest of the technical analysis signals.
+
+``calculate_signals`` in technical_analysis_api.py turns the latest indicator
+values into BUY/SELL/NEUTRAL per indicator plus an overall vote. This module
+applies the same rules to every bar at once: the indicators come from
+``indicator_engine`` as symbol x time matrices, and each rule becomes an
+``int8`` matrix (+1 BUY, -1 SELL, 0 NEUTRAL or not enough history). Every
+indicator is causal, so the signal on a bar only uses that bar and the ones
+before it.
+
+Positions follow the signals: BUY opens a long position, SELL closes it (or
+flips to short with ``allow_short``), NEUTRAL keeps the current position. A
+signal seen at the close of bar ``t`` is traded ``delay`` bars later
+(``delay=1``: at the same close, ``delay=2``: at the next close). Every change
+of position pays ``cost_bps`` basis points of the traded notional.
+"""
+import os
+import logging
+
+import numpy as np
+
+from indicator_engine import BarContext, rsi_series, macd_series, stochastic_series, williams_r_series
+
+logger = logging.getLogger("backtest")
+
+BACKTEST_COST_BPS = float(os.environ.get('BACKTEST_COST_BPS', 10))
+TRADING_DAYS = 252
+SIGNAL_NAMES = ['sma', 'ema', 'rsi', 'macd', 'bollinger', 'stochastic', 'williams_r', 'overall']
+# First bar on which calculate_all_indicators returns each indicator (its minimum history)
+MIN_BARS = {'sma': 20, 'ema': 20, 'rsi': 15, 'macd': 35, 'bollinger': 20, 'stochastic': 17, 'williams_r': 14}
+
+
+def _above_below(value, upper, lower):
+    """-1 where ``value > upper``, +1 where ``value < lower``, else 0 (NaN compares False)."""
+    return (value < lower).astype(np.int8) - (value > upper).astype(np.int8)
+
+
+def signal_matrices(ctx):
+    """``{name: int8 (rows, n)}`` with the ``calculate_signals`` rules applied to every bar."""
+    close = ctx.close
+    sma = ctx.rolling('mean', 'close', 20)
+    std = ctx.rolling('std', 'close', 20)
+    macd_line, signal_line = macd_series(ctx)
+    k_percent, d_percent = stochastic_series(ctx)
+    with np.errstate(invalid='ignore'):
+        signals = {
+            'sma': np.where(close > sma, 1, -1).astype(np.int8),
+            'ema': np.where(close > ctx.ewm('close', 20), 1, -1).astype(np.int8),
+            'rsi': _above_below(rsi_series(ctx), 70, 30),
+            'macd': np.where(macd_line > signal_line, 1, -1).astype(np.int8),
+            'bollinger': _above_below(close, sma + 2 * std, sma - 2 * std),
+            'stochastic': ((k_percent < 20) & (d_percent < 20)).astype(np.int8)
+                          - ((k_percent > 80) & (d_percent > 80)).astype(np.int8),
+            'williams_r': _above_below(williams_r_series(ctx), -20, -80),
+        }
+
+    for name, signal in signals.items():
+        signal[:, :MIN_BARS[name] - 1] = 0
+    # Overall vote: more BUY than SELL -> BUY and vice versa; unavailable indicators count as 0
+    signals['overall'] = np.sign(sum(s.astype(np.int16) for s in signals.values())).astype(np.int8)
+    return signals
+
+
+def positions(signal, allow_short=False, delay=1):
+    """Position held over each bar's return (close ``t - 1`` to close ``t``) for a signal matrix."""
+    rows, n = signal.shape
+    # Carry the last BUY/SELL forward over NEUTRAL bars
+    last = np.where(signal != 0, np.arange(n), 0)
+    np.maximum.accumulate(last, axis=1, out=last)
+    held = np.take_along_axis(signal, last, axis=1)
+    if not allow_short:
+        held = np.maximum(held, 0)
+    position = np.zeros((rows, n), dtype=np.int8)
+    if delay < n:
+        position[:, delay:] = held[:, :n - delay]
+    return position
+
+
+def evaluate(position, returns, cost):
+    """Per-row performance of ``position`` (rows, n) against simple ``returns`` (rows, n)."""
+    rows, n = position.shape
+    previous = np.zeros_like(position)
+    previous[:, 1:] = position[:, :-1]
+    turnover = np.abs(position.astype(np.int16) - previous)
+    strategy = position * returns - turnover * cost
+
+    equity = np.cumprod(1 + strategy, axis=1)
+    drawdown = 1 - equity / np.maximum.accumulate(equity, axis=1)
+    total = equity[:, -1] - 1
+    years = max(n - 1, 1) / TRADING_DAYS
+
+    # Trades: runs of the same non-zero position; hit rate is net of a round trip
+    active = position != 0
+    starts = active & (position != previous)
+    trade_ids = np.cumsum(starts.ravel()) - 1
+    trade_count = int(starts.sum())
+    trade_log_return = np.bincount(trade_ids[active.ravel()],
+                                   weights=np.log1p(position * returns)[active],
+                                   minlength=trade_count)
+    winners = np.expm1(trade_log_return) - 2 * cost > 0
+    trade_rows = np.nonzero(starts)[0]
+    trades = starts.sum(axis=1)
+    wins = np.bincount(trade_rows[winners], minlength=rows)
+
+    with np.errstate(invalid='ignore'):
+        return {
+            'total_return': total,
+            'annualized_return': np.where(total > -1, (1 + total) ** (1 / years) - 1, -1.0),
+            'max_drawdown': drawdown.max(axis=1),
+            'hit_rate': np.where(trades > 0, wins / np.maximum(trades, 1), np.nan),
+            'trades': trades,
+            'exposure': active.mean(axis=1),
+            'years': np.full(rows, years),
+        }
+
+
+def _summary(stats, index):
+    def value(array):
+        return None if np.isnan(array[index]) else round(float(array[index]), 4)
+    return {name: (int(values[index]) if name == 'trades' else value(values))
+            for name, values in stats.items() if name != 'years'}
+
+
+def _aggregate(stats):
+    """Symbol-weighted averages; hit rate is pooled over all trades.
+
+    The annualized return is that of the average total return over the average
+    test length, so the two figures describe the same growth."""
+    trades = stats['trades']
+    hits = np.nansum(stats['hit_rate'] * trades)
+    total = float(stats['total_return'].mean())
+    annualized = (1 + total) ** (1 / float(stats['years'].mean())) - 1 if total > -1 else -1.0
+    return {
+        'total_return': round(total, 4),
+        'annualized_return': round(annualized, 4),
+        'max_drawdown': round(float(stats['max_drawdown'].mean()), 4),
+        'worst_drawdown': round(float(stats['max_drawdown'].max()), 4),
+        'hit_rate': round(float(hits / trades.sum()), 4) if trades.sum() else None,
+        'trades': int(trades.sum()),
+        'exposure': round(float(stats['exposure'].mean()), 4),
+    }
+
+
+def run_backtest(frames, cost_bps=BACKTEST_COST_BPS, allow_short=False, delay=1, per_symbol=False):
+    """Backtest every signal over ``{symbol: OHLCV DataFrame}``.
+
+    Symbols with the same bar dates are computed together as one matrix. The
+    result has one summary per signal (plus ``buy_and_hold``) averaged over the
+    symbols, and with ``per_symbol`` the same figures for each symbol.
+    """
+    if delay < 1:
+        raise ValueError("delay must be at least 1 bar")
+    cost = cost_bps / 10000.0
+    groups = {}
+    for symbol, data in frames.items():
+        if len(data) > max(MIN_BARS.values()):
+            groups.setdefault((len(data), data.index[0], data.index[-1]), []).append(symbol)
+
+    names = SIGNAL_NAMES + ['buy_and_hold']
+    symbols = []
+    collected = {name: [] for name in names}
+    for members in groups.values():
+        ctx = BarContext(
+            np.stack([frames[s]['Close'].to_numpy() for s in members]),
+            np.stack([frames[s]['High'].to_numpy() for s in members]),
+            np.stack([frames[s]['Low'].to_numpy() for s in members]),
+        )
+        returns = np.zeros(ctx.close.shape)
+        returns[:, 1:] = ctx.close[:, 1:] / ctx.close[:, :-1] - 1
+        signals = signal_matrices(ctx)
+        signals['buy_and_hold'] = np.ones(ctx.close.shape, dtype=np.int8)
+        for name in names:
+            collected[name].append(evaluate(positions(signals[name], allow_short, delay), returns, cost))
+        symbols.extend(members)
+
+    if not symbols:
+        return None
+    stats = {name: {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+             for name, parts in collected.items()}
+    start = min(frames[s].index[0] for s in symbols)
+    end = max(frames[s].index[-1] for s in symbols)
+    logger.info(f"Backtest: {len(symbols)} symbols, {len(groups)} bar groups, {start.date()} - {end.date()}")
+
+    result = {
+        'symbols': len(symbols),
+        'start': start.strftime('%Y-%m-%d'),
+        'end': end.strftime('%Y-%m-%d'),
+        'cost_bps': cost_bps,
+        'allow_short': allow_short,
+        'delay': delay,
+        'signals': {name: _aggregate(stats[name]) for name in names},
+    }
+    if per_symbol:
+        result['per_symbol'] = {
+            symbol.replace('.IS', ''): {name: _summary(stats[name], i) for name in names}
+            for i, symbol in enumerate(symbols)
+        }
+    return result
@@ -0,0 +1 @@
+"""Offline benchmarks for the Python services (run with ``python -m benchmarks.<name>``)."""
@@ -0,0 +1,69 @@
+"""Vectorized signal backtest against per-bar calls into calculate_signals.
+
+Checks on a sample of bars that ``backtest.signal_matrices`` gives the same
+signal as ``calculate_signals(calculate_all_indicators(data[:t + 1]), ...)``,
+times the legacy per-bar approach on that sample and extrapolates it to the
+whole run, then times ``run_backtest`` over every symbol and bar.
+
+Usage::
+
+    python -m benchmarks.bench_backtest --symbols 100 --years 5
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from ohlcv_store import SyntheticProvider
+from indicator_engine import BarContext
+from backtest import run_backtest, signal_matrices
+import technical_analysis_api as ta
+
+SIGNAL = {'BUY': 1, 'SELL': -1, 'NEUTRAL': 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--samples', type=int, default=200, help='bars checked against calculate_signals')
+    parser.add_argument('--cost-bps', type=float, default=10)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    provider = SyntheticProvider()
+    end = np.datetime64('2025-01-01')
+    start = end - np.timedelta64(365 * args.years, 'D')
+    frames = {f'SYM{i:03d}.IS': provider.fetch(f'SYM{i:03d}.IS', start, end) for i in range(args.symbols)}
+    bars = sum(len(data) for data in frames.values())
+
+    data = frames['SYM000.IS']
+    matrices = signal_matrices(BarContext.from_frame(data))
+    rng = np.random.default_rng(0)
+    sample = rng.integers(35, len(data), args.samples)
+    started = time.perf_counter()
+    for t in sample:
+        window = data.iloc[:t + 1]
+        expected = ta.calculate_signals(ta.calculate_all_indicators(window), float(window['Close'].iloc[-1]))
+        for name, value in expected['individual_signals'].items():
+            assert matrices[name][0, t] == SIGNAL[value], f"{name} differs on bar {t}"
+        assert matrices['overall'][0, t] == SIGNAL[expected['overall_signal']], f"overall differs on bar {t}"
+    per_bar = (time.perf_counter() - started) / len(sample)
+    print(f"parity: {len(sample)} bars match calculate_signals")
+
+    started = time.perf_counter()
+    result = run_backtest(frames, cost_bps=args.cost_bps)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.symbols} symbols x {bars // args.symbols} bars: vectorized {elapsed:.2f} s, "
+          f"per-bar calculate_signals ~{per_bar * bars:.0f} s ({per_bar * 1000:.1f} ms/bar)")
+    print(f"{'signal':12s} {'return':>8s} {'annual':>8s} {'hit':>6s} {'max dd':>7s} {'trades':>7s}")
+    for name, stats in result['signals'].items():
+        hit_rate = f"{stats['hit_rate']:.2f}" if stats['hit_rate'] is not None else '-'
+        print(f"{name:12s} {stats['total_return']:8.2%} {stats['annualized_return']:8.2%} "
+              f"{hit_rate:>6s} {stats['max_drawdown']:7.2%} {stats['trades']:7d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Closed-loop HTTP load test against a running service.
+
+Each client thread keeps one keep-alive connection and sends the next request
+as soon as the previous one completes.
+
+Usage::
+
+    python -m benchmarks.bench_http http://localhost:5001/technical-analysis/YGYO?period_days=60 \\
+        --clients 16 --duration 20
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+def run_client(url, deadline, latencies, errors, lock):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else '')
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 500
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(elapsed)
+    connection.close()
+
+
+def load_test(url, clients, duration):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=run_client, args=(url, deadline, latencies, errors, lock))
+               for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies = np.array(latencies or [np.nan]) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / wall,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('url')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20, help='seconds')
+    args = parser.parse_args()
+
+    result = load_test(args.url, args.clients, args.duration)
+    print(f"{args.clients} clients, {args.duration:.0f}s: {result['throughput']:.1f} req/s, "
+          f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+          f"{result['errors']} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Per-symbol cost of the indicator engine against the legacy calculate_* functions.
+
+Usage::
+
+    python -m benchmarks.bench_indicators --bars 140 --symbols 20 --repeat 50
+
+Data comes from the synthetic provider, so no network access is needed. Besides
+the timings, the run checks that the engine and the streaming IndicatorState
+give the values of the legacy functions, and exits non-zero when they do not.
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+
+from ohlcv_store import SyntheticProvider
+from indicator_engine import default_engine
+from streaming_indicators import IndicatorState
+import technical_analysis_api as ta
+
+LEGACY_FUNCTIONS = [
+    ('sma', ta.calculate_sma),
+    ('ema', ta.calculate_ema),
+    ('rsi', ta.calculate_rsi),
+    ('macd', ta.calculate_macd),
+    ('bollinger', ta.calculate_bollinger),
+    ('stochastic', ta.calculate_stochastic),
+    ('williams_r', ta.calculate_williams_r),
+]
+
+
+def legacy_all_indicators(data):
+    """The seven legacy functions called one after another (log lines excluded)."""
+    indicators = {}
+    for name, fn in LEGACY_FUNCTIONS:
+        result = fn(data)
+        if result:
+            indicators[name] = result
+    return indicators
+
+
+def max_abs_diff(a, b):
+    if isinstance(a, dict):
+        if a.keys() != b.keys():
+            raise AssertionError(f"Indicator keys differ: {sorted(a)} != {sorted(b)}")
+        return max([max_abs_diff(a[k], b[k]) for k in a] + [0.0])
+    if isinstance(a, list):
+        if len(a) != len(b):
+            raise AssertionError(f"Series lengths differ: {len(a)} != {len(b)}")
+        return max([abs(x - y) for x, y in zip(a, b)] + [0.0])
+    return abs(a - b)
+
+
+def streaming_divergence(data):
+    """Largest difference between the streaming state and the legacy functions over ``data``.
+
+    Bars are folded in one at a time and compared with the legacy functions
+    on the history so far. Halfway, the state goes through a JSON
+    snapshot/restore round trip and receives a revision of the last bar, so
+    both have to leave the values unchanged."""
+    state = IndicatorState()
+    worst = 0.0
+    for i, (date, row) in enumerate(zip(data.index, data[['High', 'Low', 'Close']].to_numpy())):
+        bar = {'date': date.strftime('%Y-%m-%d'), 'high': row[0], 'low': row[1], 'close': row[2]}
+        if i == len(data) // 2:
+            state = IndicatorState.restore(json.loads(json.dumps(state.snapshot())))
+            state.update(dict(bar, high=bar['high'] * 1.1, close=bar['close'] * 1.05))
+        current = state.update(bar)
+        expected = legacy_all_indicators(data.iloc[:i + 1])
+        # The streaming values carry the current reading only, not the series
+        expected = {name: {key: values[key] for key in current.get(name, {})} for name, values in expected.items()}
+        worst = max(worst, max_abs_diff(expected, current))
+    return worst
+
+
+def time_per_call(fn, frames, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for data in frames:
+            fn(data)
+    return (time.perf_counter() - started) / (repeat * len(frames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, default=140, help='bars per symbol (default: 140)')
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--streaming-symbols', type=int, default=3,
+                        help='symbols replayed bar by bar through IndicatorState (default: 3)')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    provider = SyntheticProvider()
+    frames = [provider.fetch(f"SYM{i:03d}.IS", '2000-01-01', '2030-01-01').tail(args.bars)
+              for i in range(args.symbols)]
+
+    worst = max(max_abs_diff(legacy_all_indicators(d), default_engine.compute(d)) for d in frames)
+    streaming_worst = max(streaming_divergence(d) for d in frames[:args.streaming_symbols])
+    legacy = time_per_call(legacy_all_indicators, frames, args.repeat)
+    engine = time_per_call(default_engine.compute, frames, args.repeat)
+
+    print(f"bars={args.bars} symbols={args.symbols} repeat={args.repeat}")
+    print(f"legacy functions : {legacy * 1e6:9.1f} us/symbol")
+    print(f"indicator engine : {engine * 1e6:9.1f} us/symbol  ({legacy / engine:.1f}x)")
+    print(f"max abs difference: {worst:.2e}")
+    print(f"streaming max abs difference: {streaming_worst:.2e}")
+    if not np.isfinite(worst) or worst > 1e-6:
+        raise SystemExit("Indicator engine diverges from the legacy functions")
+    if not np.isfinite(streaming_worst) or streaming_worst > 1e-6:
+        raise SystemExit("Streaming indicators diverge from the legacy functions")
+
+
+if __name__ == '__main__':
+    main()
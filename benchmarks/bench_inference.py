@@ -0,0 +1,84 @@
+"""Throughput of /predict-style inference under concurrent load.
+
+Compares the legacy path (two ``model.predict`` calls per request) with the
+InferenceBatcher, which coalesces concurrent requests into batched passes.
+
+Usage::
+
+    python -m benchmarks.bench_inference --threads 16 --requests 20 --max-wait-ms 5
+"""
+import argparse
+import logging
+import threading
+import time
+
+import numpy as np
+
+from api import StockPredictor, TIME_STEP
+from inference_batcher import InferenceBatcher
+
+
+def legacy_request(model, windows):
+    model.predict(windows[:1], verbose=0)
+    model.predict(windows[1:], verbose=0)
+
+
+def run_load(handler, threads, requests, windows):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(requests):
+            started = time.perf_counter()
+            handler(windows)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies = np.array(latencies) * 1000
+    return len(latencies) / wall, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=20, help='requests per thread')
+    parser.add_argument('--validation-windows', type=int, default=32,
+                        help='validation windows per request (last 20%% of ~1 year of bars)')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    model = StockPredictor().create_model((TIME_STEP, 1))
+    rng = np.random.default_rng(0)
+    windows = rng.random((1 + args.validation_windows, TIME_STEP, 1)).astype(np.float32)
+    batcher = InferenceBatcher(max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    def batched_request(inputs):
+        batcher.predict('bench', model, inputs)
+
+    # Warm up graph tracing for both paths
+    legacy_request(model, windows)
+    batched_request(windows)
+
+    print(f"threads={args.threads} requests/thread={args.requests} "
+          f"rows/request={len(windows)} max_batch={args.max_batch} max_wait_ms={args.max_wait_ms}")
+    for name, handler in [('legacy model.predict x2', lambda w: legacy_request(model, w)),
+                          ('batched', batched_request)]:
+        batcher.batches = batcher.requests = 0
+        throughput, p50, p95 = run_load(handler, args.threads, args.requests, windows)
+        print(f"{name:24s}: {throughput:8.1f} req/s  p50 {p50:7.1f} ms  p95 {p95:7.1f} ms")
+    print(f"batched passes: {batcher.batches} for {batcher.requests} requests "
+          f"({batcher.requests / max(batcher.batches, 1):.1f} requests/pass)")
+
+
+if __name__ == '__main__':
+    main()
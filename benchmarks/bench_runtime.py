@@ -0,0 +1,89 @@
+"""Keras vs NumPy inference runtime: parity, latency and memory footprint.
+
+Builds the model from ``StockPredictor.create_model``, exports it with
+``lstm_export`` and checks that both runtimes agree before timing them.
+Memory is the peak RSS (``VmHWM``, Linux only) of a fresh process that
+imports the runtime, loads the model and runs one prediction.
+
+Usage::
+
+    python -m benchmarks.bench_runtime --repeat 50
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from api import StockPredictor, TIME_STEP, DEFAULT_MODEL_PARAMS
+from lstm_export import NumpyLSTM, export_model, max_abs_difference, EXPORT_FILE
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARITY_TOLERANCE = 1e-5
+
+MEMORY_PROBE = {
+    'keras': """
+import sys, numpy as np
+from tensorflow.keras.models import load_model
+model = load_model(sys.argv[1])
+model.predict_on_batch(np.zeros((1, {time_step}, 1), dtype=np.float32))
+print(open('/proc/self/status').read().split('VmHWM:')[1].split()[0])
+""",
+    'numpy': """
+import sys, numpy as np
+from lstm_export import NumpyLSTM
+model = NumpyLSTM.load(sys.argv[1])
+model.predict_on_batch(np.zeros((1, {time_step}, 1), dtype=np.float32))
+print(open('/proc/self/status').read().split('VmHWM:')[1].split()[0])
+""",
+}
+
+
+def peak_rss_mb(runtime, path):
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIR, TF_CPP_MIN_LOG_LEVEL='3')
+    code = MEMORY_PROBE[runtime].format(time_step=TIME_STEP)
+    output = subprocess.run([sys.executable, '-c', code, path], env=env, capture_output=True, text=True, check=True)
+    return int(output.stdout.strip().splitlines()[-1]) / 1024  # VmHWM is in kB
+
+
+def latency_ms(model, inputs, repeat):
+    model.predict_on_batch(inputs)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        model.predict_on_batch(inputs)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    keras_model = StockPredictor().create_model((TIME_STEP, 1), DEFAULT_MODEL_PARAMS['units'])
+    with tempfile.TemporaryDirectory() as workdir:
+        h5_path = os.path.join(workdir, 'model.h5')
+        npz_path = os.path.join(workdir, EXPORT_FILE)
+        keras_model.save(h5_path)
+        export_model(keras_model, npz_path)
+        numpy_model = NumpyLSTM.load(npz_path)
+
+        windows = np.random.default_rng(0).random((64, TIME_STEP, 1)).astype(np.float32)
+        difference = max_abs_difference(keras_model, numpy_model, windows)
+        assert difference < PARITY_TOLERANCE, f"runtimes disagree by {difference}"
+        print(f"parity: max |keras - numpy| = {difference:.2e} over {len(windows)} windows")
+
+        for rows in (1, 33):
+            batch = windows[:rows]
+            print(f"{rows:3d} rows: keras {latency_ms(keras_model, batch, args.repeat):7.2f} ms, "
+                  f"numpy {latency_ms(numpy_model, batch, args.repeat):7.2f} ms")
+        print(f"peak RSS: keras {peak_rss_mb('keras', h5_path):6.0f} MB, "
+              f"numpy {peak_rss_mb('numpy', npz_path):6.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
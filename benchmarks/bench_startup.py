@@ -0,0 +1,93 @@
+"""Cold-start latency of the prediction API.
+
+Every run starts a fresh interpreter (in a temporary directory, against the
+synthetic data provider and a throwaway model registry) and measures:
+
+* ``import``: ``import api``
+* ``first /``: first response from the home endpoint after the import
+* ``ready``: until ``/ready`` returns 200 (ML libraries imported, models loaded)
+* ``first predict``: first ``/predict`` once ready
+* ``cold predict``: first ``/predict`` straight after the import, without warm-up
+
+Usage::
+
+    python -m benchmarks.bench_startup --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYMBOL = 'AKBNK.IS'
+PREDICT_URL = f'/predict?symbol={SYMBOL}&start=2024-01-01&end=2024-12-31'
+
+SETUP = f"""
+import api
+predictor = api.StockPredictor()
+model = predictor.create_model((api.TIME_STEP, 1), api.DEFAULT_MODEL_PARAMS['units'])
+predictor.registry.save(predictor.model_key({SYMBOL!r}), model)
+predictor.get_stock_data({SYMBOL!r}, '2022-01-01', '2025-01-01')
+"""
+
+CHILD = f"""
+import json, time
+started = time.perf_counter()
+import api
+imported = time.perf_counter()
+client = api.app.test_client()
+client.get('/')
+home = time.perf_counter()
+result = {{'import': imported - started, 'first /': home - imported}}
+if WARM:
+    api.start_background_tasks()
+    while client.get('/ready').status_code != 200:
+        time.sleep(0.01)
+    ready = time.perf_counter()
+    result['ready'] = ready - started
+    assert client.get({PREDICT_URL!r}).status_code == 200
+    result['first predict'] = time.perf_counter() - ready
+else:
+    before = time.perf_counter()
+    assert client.get({PREDICT_URL!r}).status_code == 200
+    result['cold predict'] = time.perf_counter() - before
+print('RESULT ' + json.dumps(result))
+"""
+
+
+def run(code, workdir):
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIR, OHLCV_PROVIDER='synthetic',
+               OHLCV_STORE_DIR=os.path.join(workdir, 'store'),
+               MODEL_REGISTRY_DIR=os.path.join(workdir, 'models'),
+               TF_CPP_MIN_LOG_LEVEL='3')
+    output = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    for line in output.splitlines():
+        if line.startswith('RESULT '):
+            return json.loads(line[len('RESULT '):])
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        run(SETUP, workdir)
+        samples = {}
+        for _ in range(args.runs):
+            for warm in (True, False):
+                for name, seconds in run(f"WARM = {warm}\n" + CHILD, workdir).items():
+                    samples.setdefault(name, []).append(seconds)
+
+    print(f"median of {args.runs} runs")
+    for name in ('import', 'first /', 'ready', 'first predict', 'cold predict'):
+        print(f"{name:14s}: {statistics.median(samples[name]) * 1000:8.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
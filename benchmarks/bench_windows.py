@@ -0,0 +1,58 @@
+"""Window building for the LSTM: Python loop vs strided views.
+
+Checks that ``prepare_data`` returns the same arrays as the legacy loop and
+reports time and memory per call.
+
+Usage::
+
+    python -m benchmarks.bench_windows --bars 2500 --time-step 90
+"""
+import argparse
+import time
+
+import numpy as np
+
+from windows import sliding_windows, iter_window_batches
+
+
+def legacy_prepare_data(scaled_data, time_step):
+    X, y = [], []
+    for i in range(time_step, len(scaled_data)):
+        X.append(scaled_data[i - time_step:i, 0])
+        y.append(scaled_data[i, 0])
+    X = np.array(X)
+    y = np.array(y)
+    return np.reshape(X, (X.shape[0], X.shape[1], 1)), y
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, default=2500)
+    parser.add_argument('--time-step', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    scaled = np.random.default_rng(0).random((args.bars, 1))
+    legacy_ms, (X_legacy, y_legacy) = timed(lambda: legacy_prepare_data(scaled, args.time_step), args.repeat)
+    view_ms, (X_view, y_view) = timed(lambda: sliding_windows(scaled, args.time_step), args.repeat)
+    assert X_view.shape == X_legacy.shape and np.array_equal(X_view, X_legacy)
+    assert np.array_equal(y_view, y_legacy)
+
+    batches = list(iter_window_batches([scaled], args.time_step, batch_size=256))
+    assert np.allclose(np.concatenate([X for X, _ in batches]), X_legacy.astype(np.float32))
+
+    owned = lambda a: a.nbytes if a.base is None else 0
+    print(f"bars={args.bars} time_step={args.time_step} windows={len(X_view)} (identical output)")
+    print(f"legacy loop : {legacy_ms:8.3f} ms  {(X_legacy.nbytes + y_legacy.nbytes) / 1e6:8.2f} MB allocated")
+    print(f"strided view: {view_ms:8.3f} ms  {(owned(X_view) + owned(y_view)) / 1e6:8.2f} MB allocated")
+
+
+if __name__ == '__main__':
+    main()
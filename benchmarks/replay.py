@@ -0,0 +1,304 @@
+"""Replay the services' access logs and report latency per endpoint.
+
+Parses the request lines that Werkzeug writes to ``api.log`` and
+``technical_analysis.log`` (gunicorn's common log format works too) and sends
+the same requests with the recorded spacing, divided by ``--speedup``. Each
+log is replayed from its own first request, so logs recorded on different
+days overlap. ``--speedup 0`` sends every request as soon as a client is
+free, which measures capacity for the recorded request mix.
+
+By default both apps run in this process on Werkzeug's threaded server, in a
+temporary directory, with the synthetic data provider and an empty model
+registry; models are trained on their first request with ``--train-epochs``
+epochs (``--models`` serves an existing registry instead). ``--api-url`` and
+``--technical-url`` replay against running services; start those with
+``OHLCV_PROVIDER=synthetic`` to keep the data provider out of the numbers.
+
+At most ``--concurrency`` requests are in flight. When the services cannot
+keep up, requests queue in the client; the report shows that delay as
+"lag" next to the latencies, which are measured from the moment a request is
+sent. Access logs hold no request bodies, so only GET requests are replayed.
+
+Usage::
+
+    python -m benchmarks.replay --speedup 60 --concurrency 8
+    python -m benchmarks.replay --speedup 0 --repeat 20 --concurrency 16 --output replay.json
+    python -m benchmarks.replay --technical-url http://localhost:5001 --api-log ''
+"""
+import argparse
+import datetime
+import http.client
+import importlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = {
+    'api': {'module': 'api', 'log': 'api.log'},
+    'technical': {'module': 'technical_analysis_api', 'log': 'technical_analysis.log'},
+}
+REQUEST_LINE = re.compile(r'"(?P<method>[A-Z]+) (?P<path>\S+) HTTP/[0-9.]+" (?P<status>\d{3})\b')
+LOGGING_TIME = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3})')
+ACCESS_TIME = re.compile(r'\[(\d\d/\w{3}/\d{4})[ :](\d\d:\d\d:\d\d)')
+
+LoggedRequest = namedtuple('LoggedRequest', ['offset', 'service', 'method', 'path', 'status'])
+Sample = namedtuple('Sample', ['service', 'endpoint', 'status', 'latency', 'lag'])
+
+
+def parse_time(line):
+    """Seconds since the epoch of a log line, from the logging prefix or the access log field."""
+    match = LOGGING_TIME.match(line)
+    if match:
+        stamp = datetime.datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S')
+        return stamp.timestamp() + int(match.group(2)) / 1000
+    match = ACCESS_TIME.search(line)
+    if match:
+        return datetime.datetime.strptime(f"{match.group(1)} {match.group(2)}", '%d/%b/%Y %H:%M:%S').timestamp()
+    return None
+
+
+def parse_log(path, service):
+    """Requests of an access log, with offsets in seconds from the first one."""
+    requests = []
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = REQUEST_LINE.search(line)
+            if match is None:
+                continue
+            at = parse_time(line)
+            if at is None:
+                continue
+            requests.append((at, match.group('method'), match.group('path'), int(match.group('status'))))
+    if not requests:
+        return []
+    first = min(at for at, *_ in requests)
+    return sorted(LoggedRequest(at - first, service, method, path, status)
+                  for at, method, path, status in requests)
+
+
+def schedule(requests, speedup, repeat=1, max_gap=None):
+    """``[(send_at, request)]`` in seconds from the start of the replay.
+
+    Gaps between consecutive requests are capped at ``max_gap`` seconds, then
+    the log is played ``repeat`` times back to back.
+    """
+    if not requests:
+        return []
+    offsets = np.array([request.offset for request in requests])
+    gaps = np.diff(offsets, prepend=offsets[0])
+    if max_gap is not None:
+        gaps = np.minimum(gaps, max_gap)
+    offsets = np.cumsum(gaps)
+    span = offsets[-1] + (np.median(gaps[1:]) if len(gaps) > 1 else 0)
+    scale = 1 / speedup if speedup > 0 else 0
+    return [(float((offset + span * passes) * scale), request)
+            for passes in range(repeat) for offset, request in zip(offsets, requests)]
+
+
+class Client:
+    """Keep-alive connections per thread and target."""
+
+    def __init__(self, timeout=600):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self, base_url):
+        connections = self._local.__dict__.setdefault('connections', {})
+        if base_url not in connections:
+            parts = urlsplit(base_url)
+            connections[base_url] = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=self.timeout)
+        return connections[base_url]
+
+    def send(self, base_url, method, path):
+        """Status code of the response; 0 when the request failed."""
+        connection = self._connection(base_url)
+        try:
+            connection.request(method, path)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            return 0
+
+
+def endpoint_classifier(modules):
+    """``classify(service, method, path)`` -> the Flask rule the path matches, e.g. ``GET /price-history/<symbol>``."""
+    from werkzeug.exceptions import HTTPException
+
+    adapters = {service: module.app.url_map.bind('localhost') for service, module in modules.items()}
+
+    def classify(service, method, path):
+        try:
+            rule, _ = adapters[service].match(urlsplit(path).path, method=method, return_rule=True)
+            return f"{method} {rule.rule}"
+        except HTTPException:
+            return f"{method} (unmatched)"
+    return classify
+
+
+def load_services(services, workdir, models=None, train_epochs=None):
+    """Import the app modules in ``workdir`` with the synthetic provider and a throwaway store."""
+    os.environ['OHLCV_PROVIDER'] = 'synthetic'
+    os.environ['OHLCV_STORE_DIR'] = os.path.join(workdir, 'ohlcv_store')
+    os.environ['INDICATOR_STATE_DIR'] = os.path.join(workdir, 'indicator_state')
+    os.environ['MODEL_REGISTRY_DIR'] = os.path.abspath(models) if models else os.path.join(workdir, 'models')
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+    os.chdir(workdir)  # the apps write api.log / technical_analysis.log to the working directory
+    modules = {service: importlib.import_module(SERVICES[service]['module']) for service in services}
+    if 'api' in modules and not models and train_epochs:
+        # Training jobs get the params with the request, so the job pool uses them too
+        modules['api'].DEFAULT_MODEL_PARAMS['epochs'] = train_epochs
+    return modules
+
+
+def start_servers(modules):
+    """Serve each module's app on a free local port; returns ``({service: url}, stop)``."""
+    from werkzeug.serving import make_server
+
+    servers = {}
+    for service, module in modules.items():
+        server = make_server('127.0.0.1', 0, module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name=f'replay-{service}', daemon=True).start()
+        module.start_background_tasks()
+        servers[service] = server
+
+    def stop():
+        for service, server in servers.items():
+            modules[service].shutdown()
+            server.shutdown()
+            server.server_close()
+
+    return {service: f"http://127.0.0.1:{server.server_port}" for service, server in servers.items()}, stop
+
+
+def replay(plan, targets, classify, concurrency):
+    """Send the planned requests; returns the samples and the wall-clock seconds."""
+    client = Client()
+    samples = []
+    lock = threading.Lock()
+
+    def send(due, request):
+        sent = time.perf_counter()
+        status = client.send(targets[request.service], request.method, request.path)
+        latency = time.perf_counter() - sent
+        sample = Sample(request.service, classify(request.service, request.method, request.path),
+                        status, latency, max(0.0, sent - due))
+        with lock:
+            samples.append(sample)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='replay') as pool:
+        for at, request in plan:
+            due = started + at
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, due, request)
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, wall):
+    """Per ``service endpoint`` (and per service and overall, under ``*``) throughput, latency and errors."""
+    groups = {}
+    for sample in samples:
+        for name in (f"{sample.service} {sample.endpoint}", f"{sample.service} *", '*'):
+            groups.setdefault(name, []).append(sample)
+
+    report = {}
+    for name, group in sorted(groups.items()):
+        latencies = np.array([s.latency for s in group]) * 1000
+        errors = sum(1 for s in group if s.status == 0 or s.status >= 500)
+        report[name] = {
+            'requests': len(group),
+            'throughput': len(group) / wall if wall > 0 else 0.0,
+            'error_rate': errors / len(group),
+            'client_errors': sum(1 for s in group if 400 <= s.status < 500),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'lag_p95_ms': float(np.percentile([s.lag * 1000 for s in group], 95)),
+        }
+    return report
+
+
+def print_report(report, wall):
+    print(f"{'endpoint':46s} {'reqs':>6s} {'req/s':>8s} {'err%':>6s} {'4xx':>5s} "
+          f"{'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'lag p95':>8s}")
+    for name, row in report.items():
+        print(f"{name:46s} {row['requests']:6d} {row['throughput']:8.2f} {row['error_rate'] * 100:6.1f} "
+              f"{row['client_errors']:5d} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f} "
+              f"{row['lag_p95_ms']:8.1f}")
+    print(f"replayed in {wall:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    for service, spec in SERVICES.items():
+        parser.add_argument(f'--{service}-log', default=os.path.join(PACKAGE_DIR, spec['log']),
+                            help=f"access log to replay ('' to skip the service; default: {spec['log']})")
+        parser.add_argument(f'--{service}-url', help='replay against a running service instead of an in-process app')
+    parser.add_argument('--speedup', type=float, default=1.0,
+                        help='divide the recorded gaps by this factor; 0 sends as fast as possible (default: 1)')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight at most (default: 8)')
+    parser.add_argument('--repeat', type=int, default=1, help='play the logs this many times back to back')
+    parser.add_argument('--max-gap', type=float, help='cap the recorded gap between two requests (seconds)')
+    parser.add_argument('--models', help='serve this model registry instead of training into an empty one')
+    parser.add_argument('--train-epochs', type=int, default=2,
+                        help='epochs for models trained during the replay (default: 2)')
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    args = parser.parse_args()
+    if args.speedup < 0 or args.concurrency < 1 or args.repeat < 1:
+        parser.error('--speedup must be >= 0, --concurrency and --repeat >= 1')
+
+    requests, skipped = [], 0
+    for service in SERVICES:
+        path = getattr(args, f'{service}_log')
+        if not path:
+            continue
+        logged = parse_log(path, service)
+        skipped += sum(1 for request in logged if request.method != 'GET')
+        requests.append([request for request in logged if request.method == 'GET'])
+    plan = sorted((item for log in requests for item in schedule(log, args.speedup, args.repeat, args.max_gap)),
+                  key=lambda item: item[0])
+    if not plan:
+        parser.error('no GET requests found in the logs')
+    services = sorted({request.service for _, request in plan})
+    output = os.path.abspath(args.output) if args.output else None
+    cwd = os.getcwd()
+
+    logging.disable(logging.INFO)  # the apps log every request and model load
+    with tempfile.TemporaryDirectory(prefix='replay-') as workdir:
+        modules = load_services(services, workdir, args.models, args.train_epochs)
+        local = {service: module for service, module in modules.items() if not getattr(args, f'{service}_url')}
+        targets, stop = start_servers(local)
+        targets.update({service: getattr(args, f'{service}_url').rstrip('/')
+                        for service in services if service not in local})
+        print(f"replaying {len(plan)} requests ({skipped} non-GET skipped) against "
+              + ', '.join(f"{service} at {url}" for service, url in sorted(targets.items())), flush=True)
+        try:
+            samples, wall = replay(plan, targets, endpoint_classifier(modules), args.concurrency)
+        finally:
+            stop()
+            os.chdir(cwd)
+
+    report = summarize(samples, wall)
+    print_report(report, wall)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'speedup': args.speedup, 'concurrency': args.concurrency, 'repeat': args.repeat,
+                       'seconds': wall, 'endpoints': report}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
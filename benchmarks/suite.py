@@ -0,0 +1,422 @@
+"""Offline benchmark suite with a stored baseline for regression checks.
+
+Times every indicator function, the signal aggregation, the response
+serialization and the model steps (scaling, windowing, forward passes of both
+runtimes, a training step and epoch, end-to-end ``StockPredictor.predict``)
+on deterministic synthetic bars (see benchmarks/synthetic.py). Each case runs
+enough calls to last ``--min-time`` seconds, ``--repeat`` times; the median
+and best time per call are written to ``--output`` as JSON.
+
+With ``--baseline``, every case is compared with the same case in an earlier
+results file and the run exits with status 1 when a median got slower by more
+than ``--threshold``. Baselines are machine specific: record one on the
+machine that checks against it.
+
+Usage::
+
+    python -m benchmarks.suite --save-baseline benchmark-baseline.json
+    python -m benchmarks.suite --baseline benchmark-baseline.json
+    python -m benchmarks.suite --groups indicators,signals --bars 250 --symbols 50
+
+The model group needs TensorFlow; it is skipped when it cannot be imported.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from indicator_engine import BarContext
+from streaming_indicators import IndicatorState
+import technical_analysis_api as ta
+import backtest
+import portfolio
+
+GROUPS = ('indicators', 'signals', 'serialization', 'model')
+CASES = []  # (group, name, setup(fixture) -> zero-argument callable)
+
+
+def case(group, name):
+    def decorator(setup):
+        CASES.append((group, name, setup))
+        return setup
+    return decorator
+
+
+class Fixture:
+    """Inputs shared by the cases, built on first use."""
+
+    def __init__(self, bars, symbols, workdir):
+        self.bars = bars
+        self.symbols = symbols
+        self.workdir = workdir
+
+    @cached_property
+    def frames(self):
+        return synthetic.frames(self.symbols, self.bars)
+
+    @cached_property
+    def data(self):
+        return next(iter(self.frames.values()))
+
+    @cached_property
+    def indicators(self):
+        return ta.calculate_all_indicators(self.data)
+
+    @cached_property
+    def context(self):
+        return BarContext(*(np.stack([data[column].to_numpy() for data in self.frames.values()])
+                            for column in ('Close', 'High', 'Low')))
+
+    # Model cases
+
+    @cached_property
+    def predictor(self):
+        from api import StockPredictor
+        from inference_batcher import InferenceBatcher
+        from model_registry import ModelRegistry
+
+        synthetic.install_store(os.path.join(self.workdir, 'bars'))
+        registry = ModelRegistry(os.path.join(self.workdir, 'models'), runtime='numpy')
+        # No batching window: time the computation, not INFERENCE_MAX_WAIT_MS
+        return StockPredictor(registry=registry, batcher=InferenceBatcher(max_wait_ms=0))
+
+    @cached_property
+    def params(self):
+        return self.predictor.model_params(self.symbol)
+
+    @property
+    def symbol(self):
+        return next(iter(self.frames))
+
+    @cached_property
+    def keras_model(self):
+        """Untrained model of the default architecture, saved to the registry for the predict cases."""
+        model = self.predictor.create_model((self.params['time_step'], 1), self.params['units'])
+        scaler = self.predictor.preprocess_data(self.data)[1]
+        self.predictor.registry.save(self.predictor.model_key(self.symbol), model, {'scaler': scaler.to_dict()})
+        return model
+
+    @cached_property
+    def numpy_model(self):
+        self.keras_model
+        return self.predictor.registry.get(self.predictor.model_key(self.symbol)).model
+
+    @cached_property
+    def training_set(self):
+        scaled, _ = self.predictor.preprocess_data(self.data)
+        X, y = self.predictor.prepare_data(scaled, self.params['time_step'])
+        if len(X) < self.params['batch_size']:
+            raise ValueError(f"--bars must exceed time_step + batch_size "
+                             f"({self.params['time_step'] + self.params['batch_size']}) for the model cases")
+        return np.ascontiguousarray(X, dtype=np.float32), np.asarray(y, dtype=np.float32)
+
+    @cached_property
+    def predict_range(self):
+        return str(self.data.index[0].date()), str(synthetic.END)
+
+
+# Indicators: one symbol of --bars bars unless noted
+
+for _name, _fn in [('sma', ta.calculate_sma), ('ema', ta.calculate_ema), ('rsi', ta.calculate_rsi),
+                   ('macd', ta.calculate_macd), ('bollinger', ta.calculate_bollinger),
+                   ('stochastic', ta.calculate_stochastic), ('williams_r', ta.calculate_williams_r)]:
+    case('indicators', _name)(lambda f, fn=_fn: lambda: fn(f.data))
+
+
+@case('indicators', 'all_indicators')
+def _(f):
+    return lambda: ta.calculate_all_indicators(f.data)
+
+
+@case('indicators', 'engine_batch')
+def _(f):
+    """Every symbol at once"""
+    return lambda: list(ta.iter_batch_indicators(f.frames))
+
+
+@case('indicators', 'streaming_seed')
+def _(f):
+    return lambda: IndicatorState.from_history(f.data)
+
+
+@case('indicators', 'streaming_update')
+def _(f):
+    state = IndicatorState.from_history(f.data.iloc[:-1])
+    last = f.data.iloc[-1]
+    bar = {'date': f.data.index[-1].strftime('%Y-%m-%d'), 'high': last['High'], 'low': last['Low'],
+           'close': last['Close']}
+    # Repeats of the same date revise the live bar, as /technical-analysis/<symbol>/update does
+    return lambda: state.update(bar)
+
+
+# Signals
+
+@case('signals', 'calculate_signals')
+def _(f):
+    price = float(f.data['Close'].iloc[-1])
+    return lambda: ta.calculate_signals(f.indicators, price)
+
+
+@case('signals', 'signal_matrices')
+def _(f):
+    """Every symbol and bar; the context is rebuilt since it memoizes the rolling windows"""
+    closes, highs, lows = f.context.close, f.context.high, f.context.low
+    return lambda: backtest.signal_matrices(BarContext(closes, highs, lows))
+
+
+@case('signals', 'backtest')
+def _(f):
+    return lambda: backtest.run_backtest(f.frames)
+
+
+@case('signals', 'portfolio')
+def _(f):
+    weights = {symbol: 1.0 for symbol in f.frames}
+    return lambda: portfolio.analyze(f.frames, weights, include_covariance=True)
+
+
+# Serialization: the default 90-day technical analysis response
+
+@case('serialization', 'price_history_rows')
+def _(f):
+    recent = f.data.tail(90)
+    return lambda: json.dumps(ta.format_price_history(recent))
+
+
+@case('serialization', 'price_history_columnar')
+def _(f):
+    recent = f.data.tail(90)
+    return lambda: ta.encode_json(ta.format_price_history_columnar(recent))
+
+
+@case('serialization', 'analysis_json')
+def _(f):
+    def run():
+        with ta.app.app_context():
+            return ta.jsonify(ta.build_analysis(f.symbol, f.data, 90, f.indicators)).get_data()
+    return run
+
+
+@case('serialization', 'analysis_columnar')
+def _(f):
+    return lambda: ta.encode_json(ta.build_analysis(f.symbol, f.data, 90, f.indicators, columnar=True))
+
+
+# Model
+
+@case('model', 'scale')
+def _(f):
+    return lambda: f.predictor.preprocess_data(f.data)
+
+
+@case('model', 'windows')
+def _(f):
+    scaled, _ = f.predictor.preprocess_data(f.data)
+    return lambda: f.predictor.prepare_data(scaled, f.params['time_step'])
+
+
+for _runtime in ('keras', 'numpy'):
+    for _rows in (1, 64):
+        @case('model', f'{_runtime}_forward_{_rows}')
+        def _(f, runtime=_runtime, rows=_rows):
+            model = f.keras_model if runtime == 'keras' else f.numpy_model
+            windows = f.training_set[0][-rows:]
+            return lambda: model.predict_on_batch(windows)
+
+
+@case('model', 'train_step')
+def _(f):
+    X, y = f.training_set
+    batch = f.params['batch_size']
+    return lambda: f.keras_model.train_on_batch(X[:batch], y[:batch])
+
+
+@case('model', 'train_epoch')
+def _(f):
+    X, y = f.training_set
+    return lambda: f.keras_model.fit(X, y, epochs=1, batch_size=f.params['batch_size'],
+                                     validation_split=0.2, verbose=0)
+
+
+@case('model', 'predict')
+def _(f):
+    """End to end from the bar store, validation metrics cached, forecast computed"""
+    f.numpy_model
+    start, end = f.predict_range
+
+    def run():
+        f.predictor._forecasts.clear()
+        return f.predictor.predict(f.symbol, start, end)
+    return run
+
+
+@case('model', 'predict_path')
+def _(f):
+    from api import MAX_HORIZON
+
+    f.numpy_model
+    start, end = f.predict_range
+
+    def run():
+        f.predictor._forecasts.clear()
+        return f.predictor.predict(f.symbol, start, end, horizon=MAX_HORIZON)
+    return run
+
+
+@case('model', 'predict_path_batched')
+def _(f):
+    """predict_path with the default batching window, which only the first step waits out"""
+    from api import MAX_HORIZON
+    from inference_batcher import InferenceBatcher
+
+    f.numpy_model
+    start, end = f.predict_range
+    batcher = InferenceBatcher()
+
+    def run():
+        f.predictor._forecasts.clear()
+        f.predictor.batcher, unbatched = batcher, f.predictor.batcher
+        try:
+            return f.predictor.predict(f.symbol, start, end, horizon=MAX_HORIZON)
+        finally:
+            f.predictor.batcher = unbatched
+    return run
+
+
+@case('model', 'predict_memoized')
+def _(f):
+    f.numpy_model
+    start, end = f.predict_range
+    return lambda: f.predictor.predict(f.symbol, start, end)
+
+
+def measure(fn, repeat, min_time):
+    """Median and best seconds per call over ``repeat`` runs of at least ``min_time`` seconds."""
+    fn()  # warm-up: lazy imports, caches, graph tracing
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, round(number * min_time / elapsed))
+    samples = [timer.timeit(number) / number for _ in range(repeat)]
+    return {'median': statistics.median(samples), 'best': min(samples), 'calls': number * repeat}
+
+
+def compare(results, baseline, threshold):
+    """``{case: ratio}`` of medians against the baseline, and the cases slower than ``1 + threshold``."""
+    ratios = {}
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous and 'median' in result and previous.get('median'):
+            ratios[name] = result['median'] / previous['median']
+    return ratios, sorted(name for name, ratio in ratios.items() if ratio > 1 + threshold)
+
+
+def environment(args):
+    versions = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__}
+    if 'tensorflow' in sys.modules:
+        versions['tensorflow'] = sys.modules['tensorflow'].__version__
+    return {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+        'bars': args.bars,
+        'symbols': args.symbols,
+        'repeat': args.repeat,
+        'min_time': args.min_time,
+    }
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, default=500, help='bars per symbol (default: 500)')
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case (default: 5)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timed run (default: 0.2)')
+    parser.add_argument('--groups', default=','.join(GROUPS), help=f"comma-separated subset of {', '.join(GROUPS)}")
+    parser.add_argument('--match', default='', help='only cases whose group.name contains this text')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown of the median reported as a regression (default: 0.2 = 20%%)')
+    parser.add_argument('--save-baseline', metavar='PATH', help='also write the results to PATH')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+
+    groups = [group.strip() for group in args.groups.split(',') if group.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            previous = json.load(f)
+        baseline = previous['results']
+        for field in ('bars', 'symbols'):
+            if previous['meta'].get(field) != getattr(args, field):
+                print(f"warning: baseline was recorded with {field}={previous['meta'].get(field)}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        fixture = Fixture(args.bars, args.symbols, workdir)
+        for group, name, setup in CASES:
+            full_name = f"{group}.{name}"
+            if group not in groups or args.match not in full_name:
+                continue
+            try:
+                result = measure(setup(fixture), args.repeat, args.min_time)
+            except ImportError as e:
+                result = {'skipped': f"missing dependency: {e.name}"}
+            except Exception as e:
+                result = {'error': f"{type(e).__name__}: {e}"}
+            results[full_name] = result
+
+            line = f"{full_name:36s}"
+            if 'median' in result:
+                line += f" {format_time(result['median'])}  best {format_time(result['best'])}"
+                if full_name in baseline and baseline[full_name].get('median'):
+                    ratio = result['median'] / baseline[full_name]['median']
+                    line += f"  {ratio:5.2f}x" + ('  REGRESSION' if ratio > 1 + args.threshold else '')
+            else:
+                line += f" {result.get('skipped') or result['error']}"
+            print(line, flush=True)
+
+    report = {'meta': environment(args), 'results': results}
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    failed = [name for name, result in results.items() if 'error' in result]
+    if baseline:
+        ratios, regressions = compare(results, baseline, args.threshold)
+        print(f"{len(ratios)} cases compared with {args.baseline}, {len(regressions)} regressions"
+              + (f": {', '.join(regressions)}" if regressions else ''))
+        if regressions:
+            sys.exit(1)
+    if failed:
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
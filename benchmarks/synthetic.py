@@ -0,0 +1,40 @@
+"""Deterministic synthetic OHLCV frames for the benchmarks.
+
+Frames come from ``SyntheticProvider`` and end on the fixed ``END`` date, so a
+given symbol, length and seed always produce the same bars, whatever the day
+the benchmark runs on.
+"""
+import numpy as np
+
+from ohlcv_store import OHLCVStore, SyntheticProvider, set_store
+
+END = np.datetime64('2025-01-01', 'D')
+
+
+def symbols(count):
+    return [f"SYM{i:03d}.IS" for i in range(count)]
+
+
+def calendar_start(bars, end=END):
+    """First calendar day of a range holding at least ``bars`` business days before ``end``."""
+    return np.busday_offset(end, -bars, roll='forward')
+
+
+def frame(symbol, bars, seed=0):
+    """The last ``bars`` daily bars of ``symbol`` before ``END``."""
+    data = SyntheticProvider(seed).fetch(symbol, calendar_start(bars), END).tail(bars)
+    if len(data) < bars:
+        raise ValueError(f"The synthetic history holds only {len(data)} bars before {END}")
+    return data
+
+
+def frames(count, bars, seed=0):
+    """``{symbol: frame}`` for ``count`` symbols."""
+    return {symbol: frame(symbol, bars, seed) for symbol in symbols(count)}
+
+
+def install_store(root, seed=0):
+    """Make an OHLCVStore over the synthetic provider, rooted at ``root``, the process-wide store."""
+    store = OHLCVStore(root=root, provider=SyntheticProvider(seed))
+    set_store(store)
+    return store
@@ -0,0 +1,153 @@
+"""One LSTM shared by every symbol, trained on pooled data.
+
+Per-symbol models cost one training run and one artifact per ticker. The
+global model is trained once on windows from many symbols. Each symbol's
+closes are min-max scaled on their own range, exactly as
+``StockPredictor.preprocess_data`` scales a single symbol, so the network
+only sees shapes and the per-symbol normalization carries the price level.
+The per-symbol scalers are saved in the version's ``meta.json`` and reused
+at inference (see scalers.py). The network is the same LSTM stack as the
+per-symbol models. It therefore goes through the registry, the NumPy export,
+the inference batcher and multi-step rollouts unchanged, and it can predict
+symbols it was never trained on.
+
+The training set is streamed: every epoch reads each symbol from the OHLCV
+store in a fresh random order. ``window_dataset`` then turns the series into
+windows and shuffles them across symbols through a bounded buffer, so the
+full window matrix (90 x the number of bars) is never materialized. The last
+20% of each symbol's windows is the validation set.
+
+``MODEL_MODE`` selects what ``/predict`` serves:
+
+* ``auto`` (default): the symbol's own model if one exists, else the global
+  model if one has been trained, else a per-symbol model trained on demand
+* ``symbol``: always a per-symbol model (the previous behaviour)
+* ``global``: always the global model
+
+Usage::
+
+    python -m global_model AKBNK.IS GARAN.IS THYAO.IS ... --start 2018-01-01 --end 2024-12-31
+"""
+import os
+import sys
+import random
+import logging
+import argparse
+
+from model_registry import ModelKey
+from ohlcv_store import get_store
+from windows import window_dataset
+
+logger = logging.getLogger("global_model")
+
+GLOBAL_SYMBOL = '__global__'
+MODEL_MODE = os.environ.get('MODEL_MODE', 'auto')  # 'auto', 'symbol' or 'global'
+# Same architecture and window as the per-symbol default; pooled data needs fewer, larger batches
+GLOBAL_MODEL_PARAMS = {
+    'time_step': 90,
+    'units': [100, 50, 25],
+    'epochs': 20,
+    'batch_size': 128,
+}
+VALIDATION_FRACTION = 0.2
+MIX_BUFFER = 20000  # windows
+
+
+def global_key(params=None):
+    """Registry key of the global model; only the architecture is part of it, so a
+    retrain with other epochs or batch size is a new version of the same model"""
+    params = params or GLOBAL_MODEL_PARAMS
+    return ModelKey.create(GLOBAL_SYMBOL, time_step=params['time_step'], units=params['units'])
+
+
+def split_series(scaled, time_step):
+    """Training part and validation part (the last 20% of the windows, with its lookback)."""
+    val_windows = max(1, int((len(scaled) - time_step) * VALIDATION_FRACTION))
+    split = len(scaled) - val_windows
+    return scaled[:split], scaled[split - time_step:]
+
+
+def train_global_model(predictor, symbols, start_date, end_date, params=None, progress=None, seed=0):
+    """Train the global model on ``symbols`` and save it as a new version; returns ``(key, version)``."""
+    from tensorflow.keras.callbacks import LambdaCallback
+
+    params = params or GLOBAL_MODEL_PARAMS
+    time_step = params['time_step']
+    rng = random.Random(seed)
+
+    usable = []
+    scalers = {}
+    bars = train_windows = val_windows = 0
+    for symbol in symbols:
+        data = predictor.get_stock_data(symbol, start_date, end_date)
+        if len(data) > 2 * time_step:
+            usable.append(symbol)
+            scalers[symbol] = predictor.preprocess_data(data)[1].to_dict()
+            bars += len(data)
+            train_part, val_part = split_series(data, time_step)
+            train_windows += len(train_part) - time_step
+            val_windows += len(val_part) - time_step
+        else:
+            logger.warning(f"Skipping {symbol}: {len(data)} bars")
+    if not usable:
+        raise ValueError("No symbol has enough data for the global model")
+    logger.info(f"Training global model on {len(usable)} symbols ({bars} bars)")
+
+    def series(part):
+        def source():
+            order = list(usable)
+            if part == 0:
+                rng.shuffle(order)
+            for symbol in order:
+                # The store is already synced, this is a memory-mapped read
+                scaled, _ = predictor.preprocess_data(get_store().get(symbol, start_date, end_date))
+                yield split_series(scaled, time_step)[part]
+        return source
+
+    # Repeated with explicit step counts, since Keras cannot size a generator-backed dataset
+    batch_size = params['batch_size']
+    train = window_dataset(series(0), time_step, batch_size, mix_buffer=MIX_BUFFER).repeat()
+    validation = window_dataset(series(1), time_step, batch_size).repeat()
+
+    model = predictor.create_model((time_step, 1), params['units'])
+    callbacks = []
+    if progress is not None:
+        callbacks.append(LambdaCallback(on_epoch_end=lambda epoch, logs: progress(
+            epoch + 1, params['epochs'], {k: float(v) for k, v in (logs or {}).items()})))
+    model.fit(train, validation_data=validation, epochs=params['epochs'], verbose=2, callbacks=callbacks,
+              steps_per_epoch=-(-train_windows // batch_size), validation_steps=-(-val_windows // batch_size))
+
+    key = global_key(params)
+    version = predictor.registry.save(key, model, {
+        'train_start': start_date,
+        'train_end': end_date,
+        'data_points': bars,
+        'symbols': usable,
+        'scalers': scalers,  # per symbol, see StockPredictor.scaler_for
+        'epochs': params['epochs'],
+        'batch_size': params['batch_size'],
+    })
+    logger.info(f"Global model trained on {len(usable)} symbols (v{version})")
+    return key, version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--start', default='2018-01-01')
+    parser.add_argument('--end', default='2024-12-31')
+    parser.add_argument('--epochs', type=int, default=GLOBAL_MODEL_PARAMS['epochs'])
+    args = parser.parse_args(argv)
+
+    from api import StockPredictor, convert_turkish_chars
+
+    params = dict(GLOBAL_MODEL_PARAMS, epochs=args.epochs)
+    key, version = train_global_model(StockPredictor(), [convert_turkish_chars(s) for s in args.symbols],
+                                      args.start, args.end, params)
+    print(f"Saved global model {key.slug} v{version}")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""Single-pass technical indicator engine.
+
+The engine reads the Close/High/Low columns once into contiguous float64
+arrays and shares intermediate results between indicators (the 20-bar window
+feeds both SMA and Bollinger, the 14-bar High/Low extremes feed both
+Stochastic and Williams %R, ...). All kernels work along the last axis, so the
+same code computes one symbol (shape ``(n,)``) or a symbol x time matrix
+(shape ``(symbols, n)``).
+
+Indicators are registered with ``register_indicator`` and produce the same
+dictionaries as the ``calculate_*`` functions in technical_analysis_api.py.
+"""
+import logging
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger("indicator_engine")
+
+TAIL_VALUES = 30
+INDICATORS = OrderedDict()
+
+
+def register_indicator(name):
+    """Register ``fn(ctx) -> list[dict | None]`` (one entry per row) under ``name``."""
+    def decorator(fn):
+        INDICATORS[name] = fn
+        return fn
+    return decorator
+
+
+# Kernels (last axis is time)
+
+def _pad_front(values, count):
+    pad = np.full(values.shape[:-1] + (count,), np.nan)
+    return np.concatenate([pad, values], axis=-1)
+
+
+def ewm_mean(x, span):
+    """``pandas.Series.ewm(span=span).mean()`` (adjust=True) for NaN-free input.
+
+    Uses the closed form ``y_t = sum(d**(t-k) x_k) / sum(d**(t-k))`` evaluated
+    blockwise with cumulative sums, so there is no Python loop over bars.
+    """
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    n = x.shape[-1]
+    # The rescaled sums keep full relative precision; blocks only guard against overflow
+    block = max(1, int(np.log(1e100) / -np.log(decay)))
+    out = np.empty(x.shape, dtype=np.float64)
+    num = np.zeros(x.shape[:-1])
+    den = 0.0
+    for start in range(0, n, block):
+        chunk = x[..., start:start + block]
+        m = chunk.shape[-1]
+        powers = decay ** np.arange(m)
+        chunk_num = np.cumsum(chunk / powers, axis=-1) * powers + num[..., None] * (powers * decay)
+        chunk_den = (1.0 - powers * decay) / alpha + den * powers * decay
+        out[..., start:start + m] = chunk_num / chunk_den
+        num = chunk_num[..., -1]
+        den = chunk_den[-1]
+    return out
+
+
+class BarContext:
+    """Price arrays for one batch of bars plus memoized shared intermediates."""
+
+    def __init__(self, close, high, low):
+        self.close = np.ascontiguousarray(np.atleast_2d(close), dtype=np.float64)
+        self.high = np.ascontiguousarray(np.atleast_2d(high), dtype=np.float64)
+        self.low = np.ascontiguousarray(np.atleast_2d(low), dtype=np.float64)
+        self.rows, self.n = self.close.shape
+        self._cache = {}
+
+    @classmethod
+    def from_frame(cls, data):
+        return cls(data['Close'].to_numpy(), data['High'].to_numpy(), data['Low'].to_numpy())
+
+    def _memo(self, key, compute):
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = compute()
+        return value
+
+    def windows(self, source, window):
+        """Read-only ``(rows, n - window + 1, window)`` view of rolling windows."""
+        return self._memo(('windows', source, window),
+                          lambda: sliding_window_view(getattr(self, source), window, axis=-1))
+
+    def rolling(self, stat, source, window):
+        """Rolling mean/std/min/max aligned to the input (NaN for the warm-up bars)."""
+        def compute():
+            view = self.windows(source, window)
+            if stat == 'std':
+                values = view.std(axis=-1, ddof=1)
+            else:
+                values = getattr(view, stat)(axis=-1)
+            return _pad_front(values, window - 1)
+        if self.n < window:
+            return np.full(self.close.shape, np.nan)
+        return self._memo(('rolling', stat, source, window), compute)
+
+    def ewm(self, source, span):
+        return self._memo(('ewm', source, span), lambda: ewm_mean(getattr(self, source), span))
+
+    def series(self, name, compute):
+        """Memoize a derived series (e.g. the MACD line) for reuse by other indicators."""
+        return self._memo(('series', name), compute)
+
+
+# Formatting helpers
+
+def _current(row):
+    value = float(row[-1])
+    return None if np.isnan(value) else value
+
+
+def _tail(row):
+    tail = row[-TAIL_VALUES:]
+    return tail[~np.isnan(tail)].tolist()
+
+
+# Indicators
+
+@register_indicator('sma')
+def sma(ctx, period=20):
+    if ctx.n < period:
+        return [None] * ctx.rows
+    values = ctx.rolling('mean', 'close', period)
+    results = []
+    for row in values:
+        current = _current(row)
+        results.append(None if current is None else {
+            'current': current, 'period': period, 'values': _tail(row)})
+    return results
+
+
+@register_indicator('ema')
+def ema(ctx, period=20):
+    if ctx.n < period:
+        return [None] * ctx.rows
+    values = ctx.ewm('close', period)
+    results = []
+    for row in values:
+        current = _current(row)
+        results.append(None if current is None else {
+            'current': current, 'period': period, 'values': _tail(row)})
+    return results
+
+
+def rsi_series(ctx, period=14):
+    def compute():
+        delta = np.zeros(ctx.close.shape)
+        delta[:, 1:] = np.diff(ctx.close, axis=-1)
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        avg_gain = _pad_front(sliding_window_view(gain, period, axis=-1).mean(axis=-1), period - 1)
+        avg_loss = _pad_front(sliding_window_view(loss, period, axis=-1).mean(axis=-1), period - 1)
+        avg_loss[avg_loss == 0] = 0.0001
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+    return ctx.series(f'rsi{period}', compute)
+
+
+@register_indicator('rsi')
+def rsi(ctx, period=14):
+    if ctx.n < period + 1:
+        return [None] * ctx.rows
+    values = rsi_series(ctx, period)
+    results = []
+    for row in values:
+        current = _current(row)
+        results.append(None if current is None else {
+            'current': current, 'period': period, 'values': _tail(row)})
+    return results
+
+
+def macd_series(ctx):
+    """``(macd_line, signal_line)``"""
+    macd_line = ctx.series('macd_line', lambda: ctx.ewm('close', 12) - ctx.ewm('close', 26))
+    return macd_line, ctx.series('macd_signal', lambda: ewm_mean(macd_line, 9))
+
+
+@register_indicator('macd')
+def macd(ctx):
+    if ctx.n < 35:
+        return [None] * ctx.rows
+    macd_line, signal_line = macd_series(ctx)
+    histogram = macd_line - signal_line
+    results = []
+    for macd_row, signal_row, hist_row in zip(macd_line, signal_line, histogram):
+        current = (_current(macd_row), _current(signal_row), _current(hist_row))
+        results.append(None if None in current else {
+            'macd_line': current[0],
+            'signal_line': current[1],
+            'histogram': current[2],
+            'macd_values': _tail(macd_row),
+            'signal_values': _tail(signal_row),
+        })
+    return results
+
+
+@register_indicator('bollinger')
+def bollinger(ctx, period=20):
+    if ctx.n < period:
+        return [None] * ctx.rows
+    middle = ctx.rolling('mean', 'close', period)
+    std = ctx.rolling('std', 'close', period)
+    upper = middle + 2 * std
+    lower = middle - 2 * std
+    results = []
+    for upper_row, middle_row, lower_row in zip(upper, middle, lower):
+        current = (_current(upper_row), _current(middle_row), _current(lower_row))
+        results.append(None if None in current else {
+            'upper_band': current[0],
+            'middle_band': current[1],
+            'lower_band': current[2],
+            'upper_values': _tail(upper_row),
+            'lower_values': _tail(lower_row),
+        })
+    return results
+
+
+def _price_range(ctx, period):
+    """Rolling High max minus Low min, with zero ranges nudged like the legacy code."""
+    def compute():
+        denominator = ctx.rolling('max', 'high', period) - ctx.rolling('min', 'low', period)
+        denominator[denominator == 0] = 0.0001
+        return denominator
+    return ctx.series(f'range{period}', compute)
+
+
+def stochastic_series(ctx, period=14):
+    """``(k_percent, d_percent)``"""
+    k_percent = ctx.series(f'stoch_k{period}', lambda: 100 * (ctx.close - ctx.rolling('min', 'low', period))
+                           / _price_range(ctx, period))
+    return k_percent, ctx.series(f'stoch_d{period}', lambda: _pad_front(
+        sliding_window_view(k_percent, 3, axis=-1).mean(axis=-1), 2))
+
+
+@register_indicator('stochastic')
+def stochastic(ctx, period=14):
+    if ctx.n < period + 3:
+        return [None] * ctx.rows
+    k_percent, d_percent = stochastic_series(ctx, period)
+    results = []
+    for k_row, d_row in zip(k_percent, d_percent):
+        current = (_current(k_row), _current(d_row))
+        results.append(None if None in current else {'k_percent': current[0], 'd_percent': current[1]})
+    return results
+
+
+def williams_r_series(ctx, period=14):
+    return ctx.series(f'willr{period}', lambda: -100 * (ctx.rolling('max', 'high', period) - ctx.close)
+                      / _price_range(ctx, period))
+
+
+@register_indicator('williams_r')
+def williams_r(ctx, period=14):
+    if ctx.n < period:
+        return [None] * ctx.rows
+    willr = williams_r_series(ctx, period)
+    results = []
+    for row in willr:
+        current = _current(row)
+        results.append(None if current is None else {'current': current})
+    return results
+
+
+class IndicatorEngine:
+    """Runs every registered indicator over a shared BarContext."""
+
+    def __init__(self, indicators=None):
+        self.indicators = indicators if indicators is not None else INDICATORS
+
+    def compute_context(self, ctx):
+        """Indicator dictionaries for every row of ``ctx``."""
+        per_row = [{} for _ in range(ctx.rows)]
+        for name, fn in self.indicators.items():
+            try:
+                results = fn(ctx)
+            except Exception as e:
+                logger.error(f"{name} indicator failed: {e}")
+                continue
+            for indicators, result in zip(per_row, results):
+                if result is not None:
+                    indicators[name] = result
+        return per_row
+
+    def compute(self, data):
+        """All indicators for a single OHLCV DataFrame."""
+        return self.compute_context(BarContext.from_frame(data))[0]
+
+
+default_engine = IndicatorEngine()
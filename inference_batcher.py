@@ -0,0 +1,118 @@
+"""Request coalescing for LSTM inference.
+
+Concurrent ``/predict`` calls that hit the same model are merged into one
+batched forward pass. The first caller for a model becomes the batch leader:
+it waits up to ``max_wait_ms`` (or until ``max_batch_size`` rows are queued),
+takes every pending request, runs the model once and hands each caller its
+slice of the output. Passes for one model run one at a time, so requests that
+arrive while a pass is running are collected into the next one. A model's queue
+only exists while it has callers, so queues of evicted or replaced model
+versions do not pile up.
+"""
+import os
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("inference_batcher")
+
+INFERENCE_MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH', 64))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 5))
+
+
+class _Request:
+    __slots__ = ('inputs', 'done', 'result', 'error')
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _ModelQueue:
+    def __init__(self):
+        self.pending = []
+        self.rows = 0
+        self.callers = 0  # guarded by InferenceBatcher._guard
+        self.ready = threading.Condition(threading.Lock())
+        self.running = threading.Lock()
+
+
+class InferenceBatcher:
+    """Coalesces concurrent predictions per model into batched forward passes."""
+
+    def __init__(self, max_batch_size=INFERENCE_MAX_BATCH, max_wait_ms=INFERENCE_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queues = {}
+        self._guard = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def _acquire(self, key):
+        with self._guard:
+            if key not in self._queues:
+                self._queues[key] = _ModelQueue()
+            queue = self._queues[key]
+            queue.callers += 1
+            return queue
+
+    def _release(self, key, queue):
+        with self._guard:
+            queue.callers -= 1
+            if queue.callers == 0:
+                del self._queues[key]
+
+    def predict(self, key, model, inputs):
+        """Model output for ``inputs`` (rows along axis 0), batched with concurrent callers."""
+        request = _Request(np.asarray(inputs, dtype=np.float32))
+        queue = self._acquire(key)
+        try:
+            return self._submit(queue, model, request)
+        finally:
+            self._release(key, queue)
+
+    def _submit(self, queue, model, request):
+        with queue.ready:
+            queue.pending.append(request)
+            queue.rows += len(request.inputs)
+            leader = len(queue.pending) == 1
+            if queue.rows >= self.max_batch_size:
+                queue.ready.notify_all()
+
+        if leader:
+            with queue.ready:
+                queue.ready.wait_for(lambda: queue.rows >= self.max_batch_size, timeout=self.max_wait)
+            with queue.running:
+                with queue.ready:
+                    batch, queue.pending, queue.rows = queue.pending, [], 0
+                self._run(model, batch)
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run(self, model, batch):
+        try:
+            inputs = np.concatenate([request.inputs for request in batch])
+            outputs = np.concatenate([
+                np.asarray(model.predict_on_batch(inputs[start:start + self.max_batch_size]))
+                for start in range(0, len(inputs), self.max_batch_size)
+            ])
+            offset = 0
+            for request in batch:
+                request.result = outputs[offset:offset + len(request.inputs)]
+                offset += len(request.inputs)
+            with self._guard:
+                self.batches += 1
+                self.requests += len(batch)
+        except Exception as e:
+            logger.error(f"Batched inference failed: {str(e)}")
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
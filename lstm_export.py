@@ -0,0 +1,158 @@
+"""Export of the stacked LSTM to a pure-NumPy inference runtime.
+
+Serving only needs the forward pass of the model built by
+``StockPredictor.create_model`` (stacked LSTM layers plus a Dense head).
+``export_model`` writes its weights to ``model.npz`` and ``NumpyLSTM`` runs
+the forward pass with NumPy alone, so a serving process does not have to
+import TensorFlow.
+
+Exports the artifacts of an existing registry::
+
+    python -m lstm_export models
+"""
+import os
+import sys
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("lstm_export")
+
+EXPORT_FILE = 'model.npz'
+
+
+def export_model(model, path):
+    """Write the weights of a Keras LSTM stack to ``path`` (``.npz``)."""
+    arrays = {}
+    lstm_count = 0
+    dense_seen = False
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        config = layer.get_config()
+        if kind == 'LSTM' and not dense_seen:
+            if config.get('activation') != 'tanh' or config.get('recurrent_activation') != 'sigmoid':
+                raise ValueError(f"Unsupported LSTM activations in layer {layer.name}")
+            if not config.get('use_bias', True):
+                raise ValueError(f"LSTM layer {layer.name} without bias is not supported")
+            kernel, recurrent, bias = layer.get_weights()
+            arrays[f'lstm{lstm_count}_kernel'] = kernel
+            arrays[f'lstm{lstm_count}_recurrent'] = recurrent
+            arrays[f'lstm{lstm_count}_bias'] = bias
+            arrays[f'lstm{lstm_count}_return_sequences'] = np.array(bool(config.get('return_sequences')))
+            lstm_count += 1
+        elif kind == 'Dense' and not dense_seen and config.get('activation') in (None, 'linear'):
+            arrays['dense_kernel'], arrays['dense_bias'] = layer.get_weights()
+            dense_seen = True
+        else:
+            raise ValueError(f"Unsupported layer for export: {layer.name} ({kind})")
+    if not lstm_count or not dense_seen:
+        raise ValueError("Model is not an LSTM stack with a Dense head")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **{name: np.asarray(value, dtype=np.float32) if value.dtype != bool else value
+                          for name, value in arrays.items()})
+    os.replace(tmp_path, path)
+    return path
+
+
+class NumpyLSTM:
+    """Forward pass of an exported LSTM stack; a drop-in for ``model.predict_on_batch``."""
+
+    def __init__(self, layers, dense_kernel, dense_bias):
+        # Keras stores the gates as [input, forget, cell, output]. Reorder the columns to
+        # [input, forget, output, cell] and halve the three sigmoid gates, so one tanh over
+        # the whole pre-activation gives tanh(x / 2) for them, and sigmoid(x) = (1 + tanh(x / 2)) / 2
+        self.layers = []
+        for kernel, recurrent, bias, return_sequences in layers:
+            units = recurrent.shape[0]
+            order = np.r_[0:2 * units, 3 * units:4 * units, 2 * units:3 * units]
+            scale = np.where(np.arange(4 * units) < 3 * units, 0.5, 1.0).astype(np.float32)
+            self.layers.append((np.ascontiguousarray(kernel[:, order] * scale),
+                                np.ascontiguousarray(recurrent[:, order] * scale),
+                                bias[order] * scale, return_sequences))
+        self.dense_kernel = dense_kernel
+        self.dense_bias = dense_bias
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as archive:
+            layers = []
+            index = 0
+            while f'lstm{index}_kernel' in archive:
+                layers.append((
+                    archive[f'lstm{index}_kernel'],
+                    archive[f'lstm{index}_recurrent'],
+                    archive[f'lstm{index}_bias'],
+                    bool(archive[f'lstm{index}_return_sequences']),
+                ))
+                index += 1
+            return cls(layers, archive['dense_kernel'], archive['dense_bias'])
+
+    @classmethod
+    def from_keras(cls, model, path):
+        export_model(model, path)
+        return cls.load(path)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for layer in self.layers for a in layer[:3]) + self.dense_kernel.nbytes + self.dense_bias.nbytes
+
+    def predict_on_batch(self, inputs):
+        """``(batch, time_step, features)`` -> ``(batch, 1)`` float32."""
+        # Time-major, so each step reads one contiguous (batch, features) block
+        sequence = np.ascontiguousarray(np.asarray(inputs, dtype=np.float32).transpose(1, 0, 2))
+        steps, batch, _ = sequence.shape
+        for kernel, recurrent, bias, return_sequences in self.layers:
+            units = recurrent.shape[0]
+            # Input projections for every time step in one matmul
+            projected = (sequence.reshape(steps * batch, -1) @ kernel + bias).reshape(steps, batch, 4 * units)
+            h = np.zeros((batch, units), dtype=np.float32)
+            c = np.zeros((batch, units), dtype=np.float32)
+            z = np.empty((batch, 4 * units), dtype=np.float32)
+            update = np.empty((batch, units), dtype=np.float32)
+            gates, cell = z[:, :3 * units], z[:, 3 * units:]
+            i, f, o = z[:, :units], z[:, units:2 * units], z[:, 2 * units:3 * units]
+            outputs = np.empty((steps, batch, units), dtype=np.float32) if return_sequences else None
+            for t in range(steps):
+                np.matmul(h, recurrent, out=z)
+                z += projected[t]
+                np.tanh(z, out=z)
+                gates += 1.0
+                gates *= 0.5
+                c *= f
+                np.multiply(i, cell, out=update)
+                c += update
+                np.tanh(c, out=h)
+                h *= o
+                if outputs is not None:
+                    outputs[t] = h
+            sequence = outputs if return_sequences else h
+        return sequence @ self.dense_kernel + self.dense_bias
+
+    predict = predict_on_batch
+
+
+def max_abs_difference(keras_model, numpy_model, inputs):
+    """Largest absolute difference between the two runtimes on ``inputs``."""
+    expected = np.asarray(keras_model.predict_on_batch(np.asarray(inputs, dtype=np.float32)))
+    return float(np.max(np.abs(expected - numpy_model.predict_on_batch(inputs))))
+
+
+def export_registry(root):
+    """Export every model version under a registry directory that has no ``model.npz`` yet."""
+    from tensorflow.keras.models import load_model
+
+    exported = 0
+    for directory, _, files in os.walk(root):
+        if 'model.h5' in files and EXPORT_FILE not in files:
+            export_model(load_model(os.path.join(directory, 'model.h5'), compile=False),
+                         os.path.join(directory, EXPORT_FILE))
+            logger.info(f"Exported {directory}")
+            exported += 1
+    return exported
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    root = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('MODEL_REGISTRY_DIR', 'models')
+    print(f"Exported {export_registry(root)} model(s) under {root}")
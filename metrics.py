@@ -0,0 +1,294 @@
+"""Prometheus metrics and sampled request tracing for both services.
+
+``instrument_app(app)`` adds ``GET /metrics`` (Prometheus text format 0.0.4)
+plus request counts, latencies and in-flight requests per endpoint. Request
+stages are timed with ``with timed('fetch'):`` into one histogram,
+``smartbist_stage_duration_seconds{stage=...}``. Values owned by other
+objects (cache hit counters, batch counts) are read at scrape time through
+``REGISTRY.function(...)``, so the hot path pays nothing for them.
+
+Metrics live in the process. Under gunicorn with several workers, each
+scrape is answered by one worker; run the technical analysis API with
+``SERVE_WORKERS=1`` or scrape the workers individually when exact totals
+matter.
+
+Per-request detail that used to be logged at INFO on every request is
+collected only for a sample of requests (``TRACE_SAMPLE_RATE``, default
+``0.01``; ``0`` disables it). A sampled request logs one DEBUG line on the
+``trace`` logger with its stage timings and notes when it finishes.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+logger = logging.getLogger("metrics")
+trace_logger = logging.getLogger("trace")
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.01))
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; from cached responses (sub-millisecond) to training runs (minutes)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60, 300, 1800)
+
+if TRACE_SAMPLE_RATE > 0:
+    trace_logger.setLevel(logging.DEBUG)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return self._header() + [f"{self.name}{_label_text(self.labels, k)} {_number(v)}" for k, v in values.items()]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = {k: (list(counts), total, count) for k, (counts, total, count) in self._values.items()}
+        lines = self._header()
+        for label_values, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _label_text(self.labels, label_values, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _label_text(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class FunctionMetric(_Metric):
+    """Counter or gauge whose samples come from ``fn() -> {label_values: value}`` at scrape time."""
+
+    def __init__(self, name, documentation, kind, fn, labels=()):
+        super().__init__(name, documentation, labels)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self):
+        try:
+            values = self.fn()
+        except Exception as e:
+            logger.warning(f"Collecting {self.name} failed: {e}")
+            return []
+        return self._header() + [f"{self.name}{_label_text(self.labels, k)} {_number(v)}" for k, v in values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Modules may be imported more than once (e.g. __main__ and by name); keep the first
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def function(self, name, documentation, fn, labels=(), kind='gauge'):
+        """Register (or replace) a metric read from ``fn`` at scrape time."""
+        metric = FunctionMetric(name, documentation, kind, fn, labels)
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram('smartbist_stage_duration_seconds', 'Time spent per request stage', ['stage'])
+HTTP_REQUESTS = REGISTRY.counter('smartbist_http_requests_total', 'HTTP requests', ['endpoint', 'method', 'status'])
+HTTP_SECONDS = REGISTRY.histogram('smartbist_http_request_duration_seconds', 'HTTP request latency', ['endpoint'])
+IN_FLIGHT = REGISTRY.gauge('smartbist_http_requests_in_flight', 'Requests being served')
+
+
+def cache_metrics(caches):
+    """Hit/miss counters and hit ratio for ``{name: fn() -> (hits, misses)}``."""
+    def collect(index):
+        def fn():
+            samples = {}
+            for name, counts in caches.items():
+                hits, misses = counts()
+                samples[(name, )] = (hits, misses, hits / max(1, hits + misses))[index]
+            return samples
+        return fn
+
+    REGISTRY.function('smartbist_cache_hits_total', 'Cache hits', collect(0), ['cache'], 'counter')
+    REGISTRY.function('smartbist_cache_misses_total', 'Cache misses', collect(1), ['cache'], 'counter')
+    REGISTRY.function('smartbist_cache_hit_ratio', 'Cache hits / lookups since start', collect(2), ['cache'])
+
+
+def upstream_metrics(get_gate):
+    """Calls of the market data UpstreamGate returned by ``get_gate()`` (see upstream.py)."""
+    REGISTRY.function('smartbist_upstream_calls_total', 'Market data provider calls',
+                      lambda: {(): get_gate().calls}, kind='counter')
+    REGISTRY.function('smartbist_upstream_shared_total', 'Fetches that joined an identical call in flight',
+                      lambda: {(): get_gate().shared}, kind='counter')
+    REGISTRY.function('smartbist_upstream_in_flight', 'Provider calls in flight',
+                      lambda: {(): get_gate().inflight()})
+
+
+# Sampled tracing
+
+class Trace:
+    __slots__ = ('spans', 'notes')
+
+    def __init__(self):
+        self.spans = []
+        self.notes = []
+
+
+def current_trace():
+    """The sampled request's Trace, or None (not sampled, or outside a request)."""
+    return g.get('_trace') if has_request_context() else None
+
+
+def trace(message):
+    """Attach a note to the current request's trace when it is sampled."""
+    current = current_trace()
+    if current is not None:
+        current.notes.append(message)
+
+
+@contextmanager
+def timed(stage):
+    """Observe the block's duration under ``stage`` (and in the request trace when sampled)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage)
+        current = current_trace()
+        if current is not None:
+            current.spans.append((stage, elapsed))
+
+
+def observe(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage)
+
+
+# Flask integration
+
+def render_metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+def instrument_app(app):
+    """Request metrics, sampled traces and ``GET /metrics`` for a Flask app."""
+
+    @app.before_request
+    def start_request():
+        g._metrics_started = time.perf_counter()
+        IN_FLIGHT.inc()
+        if TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE:
+            g._trace = Trace()
+
+    @app.after_request
+    def record_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        status = g.pop('_metrics_status', 500 if exc is not None else 200)
+        HTTP_REQUESTS.inc(endpoint, request.method, str(status))
+        HTTP_SECONDS.observe(elapsed, endpoint)
+        current = g.pop('_trace', None)
+        if current is not None:
+            spans = ' '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in current.spans)
+            notes = ' | '.join(current.notes)
+            trace_logger.debug(f"{request.method} {request.full_path.rstrip('?')} {status} "
+                               f"{elapsed * 1000:.1f}ms [{spans}]" + (f" {notes}" if notes else ''))
+
+    app.add_url_rule('/metrics', 'metrics', render_metrics, methods=['GET'])
+    return app
@@ -0,0 +1,424 @@
+"""Per-symbol LSTM model registry.
+
+Models are keyed by symbol plus the hyperparameters they were built with and
+stored as versioned artifacts::
+
+    models/<SYMBOL>/<slug>/v0001/model.h5
+    models/<SYMBOL>/<slug>/v0001/model.npz
+    models/<SYMBOL>/<slug>/v0001/meta.json
+    models/<SYMBOL>/<slug>/v0001/metrics.json
+    models/<SYMBOL>/<slug>/latest
+    models/<SYMBOL>/tuned.json
+
+``metrics.json`` holds validation metrics for that version, keyed by a
+fingerprint of the bars they were computed on, so they are only recomputed
+when the model or the data changes.
+
+``tuned.json`` holds the hyperparameters chosen for the symbol by
+model_tuning.py; the prediction API trains and serves that configuration.
+
+``model.npz`` is the NumPy export of the same weights (see lstm_export.py).
+With ``INFERENCE_RUNTIME=numpy`` models are served from it and TensorFlow is
+only imported to export older artifacts that lack it.
+
+Loaded models are kept in a size-bounded in-memory LRU so the request path
+never reloads a model that is already warm.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, Counter, namedtuple
+
+from lstm_export import NumpyLSTM, export_model, EXPORT_FILE
+
+logger = logging.getLogger("model_registry")
+
+MODEL_DIR = os.environ.get('MODEL_REGISTRY_DIR', 'models')
+MODEL_CACHE_BYTES = int(os.environ.get('MODEL_CACHE_BYTES', 256 * 1024 * 1024))
+MODEL_WARM_COUNT = int(os.environ.get('MODEL_WARM_COUNT', 5))
+INFERENCE_RUNTIME = os.environ.get('INFERENCE_RUNTIME', 'keras')  # 'keras' or 'numpy'
+POPULARITY_FLUSH_SECONDS = 60
+METRICS_HISTORY = 32  # fingerprints kept per model version
+
+LoadedModel = namedtuple('LoadedModel', ['model', 'version', 'meta', 'size'])
+
+
+class ModelKey(namedtuple('ModelKey', ['symbol', 'params'])):
+    """Symbol plus a frozen, sorted tuple of hyperparameters."""
+
+    @classmethod
+    def create(cls, symbol, **params):
+        frozen = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+        return cls(symbol, frozen)
+
+    @property
+    def param_dict(self):
+        return {k: list(v) if isinstance(v, tuple) else v for k, v in self.params}
+
+    @property
+    def slug(self):
+        digest = hashlib.sha1(json.dumps(self.param_dict, sort_keys=True).encode('utf-8')).hexdigest()[:10]
+        return f"w{self.param_dict.get('time_step', 'x')}-{digest}"
+
+
+def _safe_name(symbol):
+    return re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+
+
+class ModelRegistry:
+    """Versioned on-disk model artifacts with a bounded in-memory LRU."""
+
+    def __init__(self, root=MODEL_DIR, capacity_bytes=MODEL_CACHE_BYTES, runtime=INFERENCE_RUNTIME):
+        if runtime not in ('keras', 'numpy'):
+            raise ValueError(f"Unknown inference runtime: {runtime}")
+        self.root = root
+        self.capacity_bytes = capacity_bytes
+        self.runtime = runtime
+        self._cache = OrderedDict()  # ModelKey -> LoadedModel
+        self._cache_bytes = 0
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._metrics = {}  # (ModelKey, version) -> {fingerprint: entry}
+        self._tuned = {}  # symbol -> (mtime_ns, entry)
+        self._hits = Counter()
+        self._hits_flushed_at = time.time()
+        self.cache_hits = 0  # LRU lookups, exported by /metrics
+        self.cache_misses = 0
+
+    # Layout
+
+    def _key_dir(self, key):
+        return os.path.join(self.root, _safe_name(key.symbol), key.slug)
+
+    def _version_dir(self, key, version):
+        return os.path.join(self._key_dir(key), f"v{version:04d}")
+
+    def latest_version(self, key):
+        try:
+            with open(os.path.join(self._key_dir(key), 'latest'), encoding='utf-8') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def read_meta(self, key, version):
+        with open(os.path.join(self._version_dir(key, version), 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _metrics_path(self, key, version):
+        return os.path.join(self._version_dir(key, version), 'metrics.json')
+
+    def read_metrics(self, key, version, reload=False):
+        """Stored validation metrics of a version as ``{fingerprint: entry}``."""
+        with self._lock:
+            entries = self._metrics.get((key, version))
+        if entries is not None and not reload:
+            return entries
+        try:
+            with open(self._metrics_path(key, version), encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        with self._lock:
+            self._metrics[(key, version)] = entries
+        return entries
+
+    def _tuned_path(self, symbol):
+        return os.path.join(self.root, _safe_name(symbol), 'tuned.json')
+
+    def tuned_params(self, symbol):
+        """Hyperparameters registered for ``symbol`` by the tuner, or None.
+
+        Costs one ``stat`` per call, so a search finishing in another process
+        is picked up on the next request.
+        """
+        path = self._tuned_path(symbol)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._tuned.get(symbol)
+        if cached is None or cached[0] != mtime:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    cached = (mtime, json.load(f))
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                self._tuned[symbol] = cached
+        return cached[1]['params']
+
+    # Writes
+
+    def save(self, key, model, meta=None):
+        """Store ``model`` as a new version of ``key`` and make it the latest."""
+        key_dir = self._key_dir(key)
+        os.makedirs(key_dir, exist_ok=True)
+        version = self._reserve_version(key)
+        tmp_dir = os.path.join(key_dir, f".tmp-v{version:04d}-{os.getpid()}")
+        try:
+            meta = self._stage(key, model, meta, version, tmp_dir)
+            # Replaces the empty reserved directory in one rename
+            os.replace(tmp_dir, self._version_dir(key, version))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            try:
+                os.rmdir(self._version_dir(key, version))
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            # A save that reserved a later version may have finished first
+            if version > (self.latest_version(key) or 0):
+                tmp_latest = os.path.join(key_dir, f".latest-{os.getpid()}")
+                with open(tmp_latest, 'w', encoding='utf-8') as f:
+                    f.write(str(version))
+                os.replace(tmp_latest, os.path.join(key_dir, 'latest'))
+
+        if self.runtime == 'numpy':
+            model = NumpyLSTM.load(os.path.join(self._version_dir(key, version), EXPORT_FILE))
+        size = self._artifact_size(key, version)
+        self._put(key, LoadedModel(model, version, meta, size))
+        logger.info(f"Saved model {key.symbol}/{key.slug} v{version}")
+        return version
+
+    def _reserve_version(self, key):
+        """Claim the next free version number by creating its directory.
+
+        ``mkdir`` fails if the directory exists, so two processes saving the
+        same key (API workers, training pool) never get the same version."""
+        version = (self.latest_version(key) or 0) + 1
+        while True:
+            try:
+                os.mkdir(self._version_dir(key, version))
+                return version
+            except FileExistsError:
+                version += 1
+
+    def _stage(self, key, model, meta, version, tmp_dir):
+        os.makedirs(tmp_dir, exist_ok=True)
+        model.save(os.path.join(tmp_dir, 'model.h5'))
+        try:
+            export_model(model, os.path.join(tmp_dir, EXPORT_FILE))
+        except ValueError as e:
+            logger.warning(f"NumPy export skipped for {key.symbol}/{key.slug}: {str(e)}")
+        meta = dict(meta or {})
+        meta.update({
+            'symbol': key.symbol,
+            'params': key.param_dict,
+            'version': version,
+            'created_at': time.time(),
+        })
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+    def save_metrics(self, key, version, fingerprint, data_range, metrics):
+        """Store validation metrics of ``version`` computed on the bars identified by ``fingerprint``."""
+        with self._lock:
+            # Merge with the file, other processes may have added fingerprints
+            entries = dict(self.read_metrics(key, version, reload=True))
+            entries[fingerprint] = {'range': data_range, 'metrics': metrics, 'computed_at': time.time()}
+            if len(entries) > METRICS_HISTORY:
+                newest = sorted(entries.items(), key=lambda item: item[1]['computed_at'])[-METRICS_HISTORY:]
+                entries = dict(newest)
+            path = self._metrics_path(key, version)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp_path, path)
+            self._metrics[(key, version)] = entries
+
+    def save_tuned_params(self, symbol, params, summary=None):
+        """Register ``params`` as the configuration to train and serve for ``symbol``."""
+        path = self._tuned_path(symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = dict(summary or {}, symbol=symbol, params=params, tuned_at=time.time())
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp_path, path)
+
+    # Reads
+
+    def get(self, key):
+        """Latest version of ``key`` as a LoadedModel, loading from disk on a miss."""
+        self._record_hit(key.symbol)
+        latest = self.latest_version(key)
+        if latest is None:
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry.version == latest:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return entry
+            self.cache_misses += 1
+        return self._load(key, latest)
+
+    def _load(self, key, version):
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry is not None and entry.version == version:
+                    return entry
+            started = time.time()
+            model = self._read_model(key, version)
+            entry = LoadedModel(model, version, self.read_meta(key, version), self._artifact_size(key, version))
+            self._put(key, entry)
+            logger.info(f"Loaded model {key.symbol}/{key.slug} v{version} in {time.time() - started:.2f}s")
+            return entry
+
+    def _read_model(self, key, version):
+        version_dir = self._version_dir(key, version)
+        if self.runtime == 'numpy':
+            path = os.path.join(version_dir, EXPORT_FILE)
+            if not os.path.exists(path):
+                # Artifact from before the NumPy export existed
+                from tensorflow.keras.models import load_model
+
+                export_model(load_model(os.path.join(version_dir, 'model.h5'), compile=False), path)
+            return NumpyLSTM.load(path)
+
+        from tensorflow.keras.models import load_model
+
+        return load_model(os.path.join(version_dir, 'model.h5'))
+
+    def _artifact_size(self, key, version):
+        """Size of the file the runtime loads, as an estimate of its memory footprint"""
+        name = EXPORT_FILE if self.runtime == 'numpy' else 'model.h5'
+        return os.path.getsize(os.path.join(self._version_dir(key, version), name))
+
+    # LRU
+
+    def _put(self, key, entry):
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cache_bytes -= previous.size
+            self._cache[key] = entry
+            self._cache_bytes += entry.size
+            # Evict least recently used models, but always keep the one just added
+            while self._cache_bytes > self.capacity_bytes and len(self._cache) > 1:
+                evicted_key, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted.size
+                logger.info(f"Evicted model {evicted_key.symbol}/{evicted_key.slug} v{evicted.version}")
+
+    def cached_keys(self):
+        with self._lock:
+            return list(self._cache)
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._cache.pop(key, None)
+            if entry is not None:
+                self._cache_bytes -= entry.size
+
+    def delete(self, key):
+        self.invalidate(key)
+        with self._lock:
+            for cached in [cached for cached in self._metrics if cached[0] == key]:
+                del self._metrics[cached]
+        shutil.rmtree(self._key_dir(key), ignore_errors=True)
+
+    # Popularity and warm-up
+
+    def _record_hit(self, symbol):
+        with self._lock:
+            self._hits[symbol] += 1
+            if time.time() - self._hits_flushed_at < POPULARITY_FLUSH_SECONDS:
+                return
+            hits, self._hits = self._hits, Counter()
+            self._hits_flushed_at = time.time()
+        self._flush_hits(hits)
+
+    def flush(self):
+        """Write hit counts that have not been flushed yet (e.g. on shutdown)."""
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+            self._hits_flushed_at = time.time()
+        if hits:
+            self._flush_hits(hits)
+
+    def _popularity_path(self):
+        return os.path.join(self.root, 'popularity.json')
+
+    def _read_popularity(self):
+        try:
+            with open(self._popularity_path(), encoding='utf-8') as f:
+                return Counter(json.load(f))
+        except (OSError, ValueError):
+            return Counter()
+
+    def _flush_hits(self, hits):
+        counts = self._read_popularity()
+        counts.update(hits)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._popularity_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(counts), f)
+        os.replace(tmp_path, self._popularity_path())
+
+    def popular_symbols(self, count=MODEL_WARM_COUNT):
+        """Most requested symbols, falling back to the most recently trained."""
+        symbols = [symbol for symbol, _ in self._read_popularity().most_common(count)]
+        if len(symbols) < count and os.path.isdir(self.root):
+            trained = [entry for entry in os.scandir(self.root) if entry.is_dir()]
+            trained.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+            for entry in trained:
+                if len(symbols) >= count:
+                    break
+                meta_symbol = self._symbol_from_dir(entry.path)
+                if meta_symbol and meta_symbol not in symbols:
+                    symbols.append(meta_symbol)
+        return symbols
+
+    def _symbol_from_dir(self, symbol_dir):
+        for key_dir in os.scandir(symbol_dir):
+            if not key_dir.is_dir():
+                continue
+            for version_dir in os.scandir(key_dir.path):
+                meta_path = os.path.join(version_dir.path, 'meta.json')
+                if version_dir.is_dir() and os.path.exists(meta_path):
+                    with open(meta_path, encoding='utf-8') as f:
+                        return json.load(f).get('symbol')
+        return None
+
+    def warm(self, keys):
+        """Load the latest version of each key; returns ``{key: LoadedModel}`` for those loaded."""
+        loaded = {}
+        for key in keys:
+            try:
+                version = self.latest_version(key)
+                if version is not None:
+                    loaded[key] = self._load(key, version)
+            except Exception as e:
+                logger.warning(f"Warm-up failed for {key.symbol}: {str(e)}")
+        return loaded
+
+    def warm_async(self, keys):
+        """Load ``keys`` in a background thread so startup is not blocked."""
+        thread = threading.Thread(target=self.warm, args=(list(keys),), name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide registry configured from the environment."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
@@ -0,0 +1,241 @@
+"""Hyperparameter and architecture search for the per-symbol LSTM.
+
+Candidate configurations (``time_step``, layer ``units``, ``batch_size``) are
+drawn from ``SEARCH_SPACE`` and trained with successive halving: every
+surviving trial is trained up to the rung's epoch budget, then only the best
+``1 / eta`` by validation loss move on to the next, ``eta`` times larger
+budget. Within a rung, training stops early once the validation loss has not
+improved for ``TUNE_PATIENCE`` epochs. Trials resume from their checkpoint,
+so a trial that reaches the last rung has trained for ``max_epochs`` in total.
+
+Trials of all symbols run in one spawn-based process pool with
+``TUNE_WORKERS`` processes (default: one per CPU core), each limited to its
+share of the cores. Every configuration is scored on the same holdout (the
+last 20% of the bars), whatever its window length. The winner of each symbol
+is saved to the model registry and registered as that symbol's tuned
+configuration, which ``StockPredictor`` then uses for training and
+prediction.
+
+Usage::
+
+    python -m model_tuning AKBNK.IS GARAN.IS --start 2020-01-01 --end 2023-01-01 --trials 12
+"""
+import os
+import sys
+import math
+import shutil
+import random
+import logging
+import argparse
+import datetime
+import itertools
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from windows import sliding_windows
+
+logger = logging.getLogger("model_tuning")
+
+TUNE_WORKERS = int(os.environ.get('TUNE_WORKERS', os.cpu_count() or 1))
+TUNE_PATIENCE = int(os.environ.get('TUNE_PATIENCE', 5))
+SEARCH_SPACE = {
+    'time_step': [30, 60, 90],
+    'units': [[50], [64, 32], [100, 50, 25], [128, 64, 32]],
+    'batch_size': [16, 32, 64],
+}
+HOLDOUT_FRACTION = 0.2
+
+
+def sample_configs(space=SEARCH_SPACE, count=12, seed=0):
+    """``count`` distinct configurations from the grid (all of them if the grid is smaller)."""
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    if count >= len(grid):
+        return grid
+    return random.Random(seed).sample(grid, count)
+
+
+def rung_budgets(min_epochs, max_epochs, eta):
+    """Cumulative epoch budgets of the successive-halving rungs, e.g. 4, 12, 36, 100."""
+    budgets = [min_epochs]
+    while budgets[-1] < max_epochs:
+        budgets.append(min(budgets[-1] * eta, max_epochs))
+    return budgets
+
+
+def holdout_split(scaled, time_step, holdout):
+    """Training and validation windows; the validation targets are the last ``holdout`` bars."""
+    X, y = sliding_windows(scaled, time_step)
+    return (X[:-holdout], y[:-holdout]), (X[-holdout:], y[-holdout:])
+
+
+# Worker side
+
+def _init_worker(threads):
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _run_trial(trial, scaled, holdout, budget):
+    """Train ``trial`` from its checkpoint up to ``budget`` epochs; returns the updated trial."""
+    import keras
+    from keras.callbacks import EarlyStopping
+    from api import StockPredictor
+
+    params = trial['params']
+    (X, y), validation = holdout_split(scaled, params['time_step'], holdout)
+    if os.path.exists(trial['checkpoint']):
+        model = keras.models.load_model(trial['checkpoint'])
+    else:
+        keras.utils.set_random_seed(trial['seed'])
+        model = StockPredictor().create_model((params['time_step'], 1), params['units'])
+
+    history = model.fit(X, y, validation_data=validation, batch_size=params['batch_size'],
+                        initial_epoch=trial['epochs'], epochs=budget, verbose=0,
+                        callbacks=[EarlyStopping(monitor='val_loss', patience=TUNE_PATIENCE,
+                                                 restore_best_weights=True)])
+    losses = history.history['val_loss']
+    best = int(np.argmin(losses))
+    improved = trial['val_loss'] is None or losses[best] < trial['val_loss']
+    if improved:
+        # The model holds the weights of its best epoch in this rung
+        model.save(trial['checkpoint'])
+        trial = dict(trial, val_loss=float(losses[best]), best_epoch=trial['epochs'] + best + 1)
+    # Stopped early, or no better than after the previous rung: more epochs will not help
+    converged = not improved or len(losses) < budget - trial['epochs']
+    return dict(trial, epochs=trial['epochs'] + len(losses), converged=converged)
+
+
+# Parent side
+
+class Tuner:
+    """Successive-halving search over several symbols in one process pool."""
+
+    def __init__(self, predictor=None, workers=TUNE_WORKERS, trials=12, min_epochs=4, max_epochs=100, eta=3,
+                 space=SEARCH_SPACE, seed=0):
+        if eta < 2 or min_epochs < 1 or max_epochs < min_epochs:
+            raise ValueError("Invalid successive-halving schedule")
+        from api import StockPredictor
+
+        self.predictor = predictor or StockPredictor()
+        self.workers = workers
+        self.trials = trials
+        self.budgets = rung_budgets(min_epochs, max_epochs, eta)
+        self.eta = eta
+        self.space = space
+        self.seed = seed
+
+    def _prepare(self, symbol, start_date, end_date):
+        # Same history as StockPredictor.train_model: two years before the requested range
+        train_start = (datetime.datetime.strptime(start_date, "%Y-%m-%d") -
+                       datetime.timedelta(days=730)).strftime("%Y-%m-%d")
+        data = self.predictor.get_stock_data(symbol, train_start, end_date)
+        scaled, scaler = self.predictor.preprocess_data(data)
+        holdout = int((len(scaled) - max(self.space['time_step'])) * HOLDOUT_FRACTION)
+        if holdout < 1:
+            raise ValueError(f"Not enough data to tune {symbol}")
+        return {'train_start': train_start, 'data_points': len(data), 'scaled': scaled, 'scaler': scaler,
+                'holdout': holdout}
+
+    def run(self, symbols, start_date, end_date):
+        """Tune every symbol; returns ``{symbol: summary}`` and registers the winners."""
+        datasets = {symbol: self._prepare(symbol, start_date, end_date) for symbol in symbols}
+        workdir = tempfile.mkdtemp(prefix='tuning-')
+        trials = {
+            symbol: [{'id': i, 'symbol': symbol, 'params': params, 'seed': self.seed + i, 'epochs': 0,
+                      'val_loss': None, 'best_epoch': 0, 'converged': False,
+                      'checkpoint': os.path.join(workdir, f"{n}-{i}.keras")}
+                     for i, params in enumerate(sample_configs(self.space, self.trials, self.seed))]
+            for n, symbol in enumerate(symbols)
+        }
+        survivors = {symbol: list(symbol_trials) for symbol, symbol_trials in trials.items()}
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        context = multiprocessing.get_context('spawn')  # TensorFlow is not fork-safe
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                     initializer=_init_worker, initargs=(threads,)) as pool:
+                for rung, budget in enumerate(self.budgets):
+                    pending = [trial for symbol_trials in survivors.values() for trial in symbol_trials
+                               if not trial['converged'] and trial['epochs'] < budget]
+                    logger.info(f"Rung {rung}: {len(pending)} trial(s) up to {budget} epochs")
+                    futures = [(trial, pool.submit(_run_trial, trial, datasets[trial['symbol']]['scaled'],
+                                                   datasets[trial['symbol']]['holdout'], budget))
+                               for trial in pending]
+                    for trial, future in futures:
+                        trial.update(future.result())
+                    if rung < len(self.budgets) - 1:
+                        for symbol, symbol_trials in survivors.items():
+                            symbol_trials.sort(key=lambda t: t['val_loss'])
+                            del symbol_trials[max(1, math.ceil(len(symbol_trials) / self.eta)):]
+            return {symbol: self._register(symbol, min(survivors[symbol], key=lambda t: t['val_loss']),
+                                           trials[symbol], datasets[symbol], start_date, end_date)
+                    for symbol in symbols}
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _register(self, symbol, best, symbol_trials, dataset, start_date, end_date):
+        from tensorflow.keras.models import load_model
+
+        params = dict(best['params'], epochs=best['best_epoch'])
+        key = self.predictor.model_key(symbol, params)
+        model = load_model(best['checkpoint'])
+        meta = {
+            'train_start': dataset['train_start'],
+            'train_end': end_date,
+            'data_points': dataset['data_points'],
+            'scaler': dataset['scaler'].to_dict(),
+            'val_loss': best['val_loss'],
+        }
+        version = self.predictor.registry.save(key, model, meta)
+        summary = {
+            'params': params,
+            'version': version,
+            'val_loss': best['val_loss'],
+            'trials': len(symbol_trials),
+            'epochs_trained': sum(t['epochs'] for t in symbol_trials),
+            'epochs_exhaustive': len(symbol_trials) * self.budgets[-1],
+            'leaderboard': [{'params': t['params'], 'val_loss': t['val_loss'], 'epochs': t['epochs']}
+                            for t in sorted(symbol_trials, key=lambda t: t['val_loss'])[:5]],
+        }
+        self.predictor.registry.save_tuned_params(symbol, params, summary)
+        logger.info(f"Tuned {symbol}: {params} (val_loss {best['val_loss']:.6f}, v{version})")
+        try:
+            data = self.predictor.get_stock_data(symbol, start_date, end_date)
+            self.predictor.evaluate(key, version, model, data, f"{start_date}:{end_date}",
+                                    self.predictor.scaler_for(key, meta, symbol, data))
+        except Exception as e:
+            logger.warning(f"Could not compute validation metrics for {symbol}: {str(e)}")
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--start', default='2020-01-01')
+    parser.add_argument('--end', default='2023-01-01')
+    parser.add_argument('--trials', type=int, default=12, help='configurations sampled per symbol')
+    parser.add_argument('--min-epochs', type=int, default=4)
+    parser.add_argument('--max-epochs', type=int, default=100)
+    parser.add_argument('--eta', type=int, default=3, help='keep the best 1/eta trials per rung')
+    parser.add_argument('--workers', type=int, default=TUNE_WORKERS)
+    args = parser.parse_args(argv)
+
+    from api import convert_turkish_chars
+
+    tuner = Tuner(workers=args.workers, trials=args.trials, min_epochs=args.min_epochs,
+                  max_epochs=args.max_epochs, eta=args.eta)
+    results = tuner.run([convert_turkish_chars(s) for s in args.symbols], args.start, args.end)
+    for symbol, summary in results.items():
+        print(f"{symbol}: {summary['params']} val_loss={summary['val_loss']:.6f} v{summary['version']} "
+              f"({summary['epochs_trained']} of {summary['epochs_exhaustive']} epochs)")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,609 @@
+"""Local OHLCV store shared by the prediction and technical analysis APIs.
+
+Daily bars are kept on disk per symbol and only the date ranges that are not
+yet covered locally are fetched from the upstream provider. Each symbol has a
+``meta.json`` describing the covered range and pointing at a ``bars-*.npy``
+file with one contiguous row per field (date, open, high, low, close, volume),
+which is opened memory-mapped on read.
+
+The covered range only grows over dates the provider actually answered: an
+empty (or all-NaN) answer for a range with trading days is a provider
+failure, and a tail answer covers the range only through its last bar.
+
+Provider calls go through an ``UpstreamGate`` (see upstream.py), which
+collapses concurrent identical fetches, bounds their concurrency and their
+wait time. When only the tail of a request is out of date, the stored bars
+are served as they are for up to ``OHLCV_STALE_MAX_AGE`` seconds since the
+last sync and the tail is refreshed in the background. The same applies
+when refreshing the tail fails.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import zlib
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from upstream import UpstreamGate, UpstreamError, UPSTREAM_CONCURRENCY, UPSTREAM_TIMEOUT
+
+logger = logging.getLogger("ohlcv_store")
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+STORE_DIR = os.environ.get('OHLCV_STORE_DIR', 'ohlcv_store')
+# Today's bar is still moving during the session; refetch it at most this often
+TAIL_MAX_AGE = int(os.environ.get('OHLCV_TAIL_MAX_AGE', 900))
+# Past that, serve the stored tail while it is refreshed in the background, up to this age (0 disables)
+STALE_MAX_AGE = int(os.environ.get('OHLCV_STALE_MAX_AGE', 3600))
+# Business days without bars at the start of a stored range that show the symbol was not listed yet
+# (longer than any market holiday)
+LISTING_GAP_DAYS = 10
+
+
+def to_day(value):
+    """Normalize a date string, date or datetime to ``numpy.datetime64[D]``."""
+    if isinstance(value, np.datetime64):
+        return value.astype('datetime64[D]')
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return np.datetime64(value, 'D')
+    return np.datetime64(str(value)[:10], 'D')
+
+
+def today():
+    return np.datetime64(datetime.date.today(), 'D')
+
+
+def normalize_frame(data):
+    """Bring a provider frame into the store layout: flat COLUMNS, naive daily index."""
+    if data is None or data.empty:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name='Date'), dtype=float)
+    if isinstance(data.columns, pd.MultiIndex):
+        # yfinance returns (Price, Ticker) columns even for a single ticker
+        data = data.copy()
+        data.columns = data.columns.get_level_values(0)
+    data = data[COLUMNS].astype(float)
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    data.index = index.normalize()
+    data.index.name = 'Date'
+    data = data.dropna(subset=['Close'])
+    data = data[~data.index.duplicated(keep='last')]
+    return data.sort_index()
+
+
+class DataProvider:
+    """Upstream source of daily OHLCV bars."""
+
+    name = 'base'
+
+    def fetch(self, symbol, start, end):
+        """Return the bars in ``[start, end)`` as a DataFrame with COLUMNS."""
+        raise NotImplementedError
+
+    def fetch_many(self, symbols, start, end):
+        """Return ``{symbol: bars}``; providers with a bulk API override this."""
+        return {symbol: self.fetch(symbol, start, end) for symbol in symbols}
+
+
+class _YahooErrors(logging.Handler):
+    """Collect the per-ticker failures yf.download reports for the calling thread.
+
+    yfinance does not raise for failed tickers; it logs ``['SYM', ...]: <error>``
+    on its ``yfinance`` logger once the download is done and returns what it got."""
+
+    LINE = re.compile(r"^\[(?P<tickers>.*?)\]: (?P<error>.*)$", re.S)
+    # Yahoo's answer for a range it holds no bars for; the store decides whether that is a failure
+    NO_PRICES = ('no price data found', 'possibly delisted')
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.errors = {}
+
+    def emit(self, record):
+        if record.thread != self.thread:
+            return
+        match = self.LINE.match(record.getMessage().strip())
+        if match:
+            for ticker in re.findall(r"'([^']+)'", match.group('tickers')):
+                self.errors[ticker.upper()] = match.group('error')
+
+    def __enter__(self):
+        logging.getLogger('yfinance').addHandler(self)
+        return self
+
+    def __exit__(self, *exc):
+        logging.getLogger('yfinance').removeHandler(self)
+
+    def failure(self, symbol):
+        """The reported error for ``symbol`` unless it only says there were no bars."""
+        error = self.errors.get(symbol.upper())
+        if error is None or any(text in error.lower() for text in self.NO_PRICES):
+            return None
+        return error
+
+
+class YahooProvider(DataProvider):
+    """Daily bars from Yahoo Finance via yfinance, over one keep-alive HTTP session per process.
+
+    Tickers yfinance reports as failed raise UpstreamError instead of coming back
+    as empty frames."""
+
+    name = 'yahoo'
+
+    def __init__(self, timeout=UPSTREAM_TIMEOUT, threads=UPSTREAM_CONCURRENCY):
+        self.timeout = timeout
+        self.threads = threads
+        self._session = None
+        self._session_pid = None
+
+    def session(self):
+        # Connections are not shared across fork(); each worker opens its own session
+        if self._session is None or self._session_pid != os.getpid():
+            try:
+                from curl_cffi import requests as curl_requests
+            except ImportError:
+                return None  # yfinance creates its own
+            self._session = curl_requests.Session(impersonate='chrome')
+            self._session_pid = os.getpid()
+        return self._session
+
+    def fetch(self, symbol, start, end):
+        import yfinance as yf
+        logger.info(f"Downloading {symbol} from {start} to {end}")
+        with _YahooErrors() as errors:
+            data = yf.download(symbol, start=str(start), end=str(end), progress=False,
+                               timeout=self.timeout, session=self.session())
+        error = errors.failure(symbol)
+        if error is not None:
+            raise UpstreamError(f"{symbol}: {error}")
+        if (data is None or data.empty) and symbol.upper() not in errors.errors \
+                and np.busday_count(to_day(start), min(to_day(end), today())) > 0:
+            raise UpstreamError(f"{symbol}: yfinance returned nothing for {start}..{end}")
+        return data
+
+    def fetch_many(self, symbols, start, end):
+        """``{symbol: bars}``; symbols yfinance reports as failed are left out.
+
+        Raises UpstreamError when every symbol failed."""
+        import yfinance as yf
+        logger.info(f"Downloading {len(symbols)} symbols from {start} to {end}")
+        with _YahooErrors() as errors:
+            data = yf.download(list(symbols), start=str(start), end=str(end), progress=False, group_by='ticker',
+                               threads=max(1, min(self.threads, len(symbols))), timeout=self.timeout,
+                               session=self.session())
+        failed = {symbol: error for symbol in symbols if (error := errors.failure(symbol)) is not None}
+        if failed and len(failed) == len(symbols):
+            symbol, error = next(iter(failed.items()))
+            raise UpstreamError(f"{len(failed)} symbol(s) failed, {symbol}: {error}")
+        if failed:
+            logger.warning(f"yfinance failed for {sorted(failed)}")
+        if data is None or data.empty:
+            return {}
+        if not isinstance(data.columns, pd.MultiIndex):
+            return {symbols[0]: data} if len(symbols) == 1 and not failed else {}
+        tickers = set(data.columns.get_level_values(0))
+        return {symbol: data[symbol] for symbol in symbols if symbol in tickers and symbol not in failed}
+
+
+class SyntheticProvider(DataProvider):
+    """Deterministic random-walk bars for offline runs and tests.
+
+    Every symbol gets its own seeded path starting at ``EPOCH``, so any
+    sub-range fetched on its own is consistent with a larger fetch.
+    """
+
+    name = 'synthetic'
+    EPOCH = np.datetime64('2000-01-03', 'D')
+
+    def __init__(self, seed=0, start_price=100.0, volatility=0.02):
+        self.seed = seed
+        self.start_price = start_price
+        self.volatility = volatility
+
+    def fetch(self, symbol, start, end):
+        start, end = max(to_day(start), self.EPOCH), to_day(end)
+        if end <= start:
+            return normalize_frame(None)
+        days = np.arange(self.EPOCH, end, dtype='datetime64[D]')
+        days = days[np.is_busday(days)]
+        n = len(days)
+        symbol_seed = zlib.crc32(symbol.encode('utf-8'))
+        # One stream per field keeps every prefix identical whatever ``end`` is
+        rng = [np.random.default_rng([self.seed, symbol_seed, field]) for field in range(5)]
+        returns = rng[0].normal(0.0003, self.volatility, n)
+        close = self.start_price * np.exp(np.cumsum(returns))
+        open_ = np.concatenate(([self.start_price], close[:-1])) * (1 + rng[1].normal(0, self.volatility / 4, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng[2].normal(0, self.volatility / 2, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng[3].normal(0, self.volatility / 2, n)))
+        volume = np.round(rng[4].lognormal(13, 0.5, n))
+
+        mask = days >= start
+        return pd.DataFrame(
+            {'Open': open_[mask], 'High': high[mask], 'Low': low[mask],
+             'Close': close[mask], 'Volume': volume[mask]},
+            index=pd.DatetimeIndex(days[mask], name='Date'),
+        )
+
+
+PROVIDERS = {
+    YahooProvider.name: YahooProvider,
+    SyntheticProvider.name: SyntheticProvider,
+}
+
+
+def register_provider(name, provider_cls):
+    PROVIDERS[name] = provider_cls
+
+
+def get_provider(name=None):
+    """Instantiate a provider by name (defaults to ``OHLCV_PROVIDER`` or yahoo)."""
+    name = name or os.environ.get('OHLCV_PROVIDER', YahooProvider.name)
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown OHLCV provider: {name}")
+    return PROVIDERS[name]()
+
+
+class OHLCVStore:
+    """Per-symbol on-disk bar store that syncs missing ranges from a provider."""
+
+    def __init__(self, root=STORE_DIR, provider=None, tail_max_age=TAIL_MAX_AGE, stale_max_age=STALE_MAX_AGE,
+                 gate=None):
+        self.root = root
+        self.provider = provider or get_provider()
+        self.tail_max_age = tail_max_age
+        self.stale_max_age = stale_max_age
+        self.gate = gate or UpstreamGate()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._mmaps = {}
+        self._revalidating = set()
+        self._revalidate_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ohlcv-revalidate')
+
+    # Paths and metadata
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9._-]', '_', symbol))
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _read_meta(self, symbol):
+        try:
+            with open(os.path.join(self._symbol_dir(symbol), 'meta.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load_bars(self, symbol, meta):
+        """Memory-map the bars file referenced by ``meta`` (cached per file)."""
+        while True:
+            path = os.path.join(self._symbol_dir(symbol), meta['file'])
+            cached = self._mmaps.get(symbol)
+            if cached is not None and cached[0] == path:
+                return cached[1]
+            try:
+                bars = np.load(path, mmap_mode='r')
+            except FileNotFoundError:
+                # A concurrent commit replaced the file after ``meta`` was read; its bars cover the same range
+                newer = self._read_meta(symbol)
+                if newer is None or newer['file'] == meta['file']:
+                    raise
+                meta = newer
+                continue
+            self._mmaps[symbol] = (path, bars)
+            return bars
+
+    def _write(self, symbol, frame, covered_start, covered_end, previous):
+        symbol_dir = self._symbol_dir(symbol)
+        os.makedirs(symbol_dir, exist_ok=True)
+
+        bars = np.empty((len(COLUMNS) + 1, len(frame)), dtype=np.float64)
+        bars[0] = frame.index.values.astype('datetime64[D]').astype(np.int64)
+        bars[1:] = frame[COLUMNS].to_numpy(dtype=np.float64).T
+
+        file_name = f"bars-{uuid.uuid4().hex[:12]}.npy"
+        np.save(os.path.join(symbol_dir, file_name), bars)
+
+        meta = {
+            'symbol': symbol,
+            'file': file_name,
+            'start': str(covered_start),
+            'end': str(covered_end),
+            'rows': len(frame),
+            'synced_at': time.time(),
+        }
+        tmp_meta = os.path.join(symbol_dir, f"meta.{file_name}.tmp")
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        # Replacing meta.json is the commit point; readers never see a partial file
+        os.replace(tmp_meta, os.path.join(symbol_dir, 'meta.json'))
+
+        if previous and previous.get('file') != file_name:
+            self._mmaps.pop(symbol, None)
+            try:
+                os.remove(os.path.join(symbol_dir, previous['file']))
+            except OSError:
+                pass  # still mapped by another reader (Windows)
+        return meta
+
+    # Sync
+
+    def _listed_after(self, symbol, meta, day):
+        """Whether the stored bars show that ``symbol`` had no bars before ``day`` (not listed yet)."""
+        if meta is None or not meta.get('rows') or day > to_day(meta['start']):
+            return False
+        first = self._load_bars(symbol, meta)[0][0].astype(np.int64).astype('datetime64[D]')
+        return np.busday_count(to_day(meta['start']), first) > LISTING_GAP_DAYS
+
+    def _check_answer(self, symbol, meta, frame, start, end):
+        """Raise when the provider returned no bars for a range that must have some.
+
+        Providers (yfinance in particular) report failures as an empty frame; storing that
+        would mark the range as covered. Today's bar may be missing (before the open), and
+        so may every bar before the symbol was listed.
+        """
+        if (frame.empty and np.busday_count(start, min(end, today())) > 0
+                and not self._listed_after(symbol, meta, end)):
+            raise UpstreamError(f"{symbol}: no bars returned for {start}..{end}")
+        return frame
+
+    def _fetch(self, symbol, meta, start, end):
+        frame = normalize_frame(self.gate.call((f"{symbol} {start}..{end}", ), self.provider.fetch,
+                                               symbol, start, end))
+        return self._check_answer(symbol, meta, frame, start, end)
+
+    def _fetch_many(self, symbols, start, end):
+        return self.gate.call((f"{len(symbols)} symbols {start}..{end}", tuple(symbols)),
+                              self.provider.fetch_many, symbols, start, end)
+
+    def _frame(self, symbol, meta):
+        if meta is None:
+            return normalize_frame(None)
+        bars = self._load_bars(symbol, meta)
+        return pd.DataFrame(
+            np.asarray(bars[1:]).T,
+            columns=COLUMNS,
+            index=pd.DatetimeIndex(bars[0].astype(np.int64).astype('datetime64[D]'), name='Date'),
+        )
+
+    def _plan(self, symbol, start, end, stale_ok=True):
+        """Ranges missing for ``[start, end)`` and whether the out-of-date tail is served
+        as stored (and must be refreshed in the background)."""
+        now_day = today()
+        # Bars before today are final; today's bar is covered by the tail refresh
+        needed_end = min(end, now_day + 1)
+        meta = self._read_meta(symbol)
+        if needed_end <= start:
+            return meta, [], False
+        if meta is None:
+            return meta, [(start, needed_end)], False
+
+        covered_start, covered_end = to_day(meta['start']), to_day(meta['end'])
+        gaps = []
+        stale = False
+        if start < covered_start:
+            gaps.append((start, covered_start))
+        if needed_end > covered_end:
+            age = time.time() - meta.get('synced_at', 0)
+            if covered_end == now_day and age < self.tail_max_age:
+                pass  # today's bar is recent enough
+            elif stale_ok and not gaps and age < self.stale_max_age:
+                stale = True
+            else:
+                gaps.append((covered_end, needed_end))
+        return meta, gaps, stale
+
+    def _revalidate(self, symbols, start, end):
+        """Refresh stale tails in the background, at most one refresh per symbol at a time."""
+        with self._locks_guard:
+            symbols = [symbol for symbol in symbols if symbol not in self._revalidating]
+            self._revalidating.update(symbols)
+        if not symbols:
+            return
+
+        def run():
+            try:
+                self.sync_many(symbols, start, end, stale_ok=False)
+            except Exception as e:
+                logger.warning(f"Background refresh of {len(symbols)} symbol(s) failed: {e}")
+            finally:
+                with self._locks_guard:
+                    self._revalidating.difference_update(symbols)
+
+        self._revalidate_pool.submit(run)
+
+    @staticmethod
+    def _can_serve_stored(meta, start):
+        """Whether the stored bars cover the start of the request, so only the tail is missing."""
+        return meta is not None and start >= to_day(meta['start'])
+
+    @staticmethod
+    def _coverage(meta, gaps, fetched):
+        """Covered range once ``fetched`` (one frame per gap) is stored; ``(None, None)`` if nothing is.
+
+        A gap before the stored bars lies between answered ranges and is covered in full. A
+        gap at the end is covered only through its last bar and the weekend days after it,
+        so a cut-short answer leaves the rest to be fetched again. Today is never covered.
+        """
+        now_day = today()
+        start = end = None
+        if meta is not None:
+            start, end = to_day(meta['start']), to_day(meta['end'])
+        for (gap_start, gap_end), frame in zip(gaps, fetched):
+            if start is not None and gap_end <= start:
+                start = gap_start
+                continue
+            proven = min(gap_end, now_day)
+            if not frame.empty:
+                after_last = to_day(frame.index[-1]) + 1
+                proven = min(proven, np.busday_offset(after_last, 0, roll='forward'))
+            elif np.busday_count(gap_start, proven) > 0:
+                proven = gap_start
+            if start is None:
+                if frame.empty and proven <= gap_start:
+                    continue
+                start, end = gap_start, max(gap_start, proven)
+            elif gap_start <= end:
+                end = max(end, proven)
+        return start, end
+
+    def _commit(self, symbol, gaps, fetched, fetched_at):
+        """Merge fetched frames into the stored bars (caller holds the symbol lock)."""
+        meta = self._read_meta(symbol)
+        covered_start, covered_end = self._coverage(meta, gaps, fetched)
+        if covered_start is None:
+            return meta  # nothing answered and nothing stored
+        if (meta is not None and meta.get('synced_at', 0) >= fetched_at and
+                to_day(meta['start']) <= covered_start and to_day(meta['end']) >= covered_end):
+            # A concurrent sync that shared this fetch has already written the same bars
+            return meta
+        frames = [f for f in [self._frame(symbol, meta)] + list(fetched) if not f.empty]
+        merged = pd.concat(frames) if frames else normalize_frame(None)
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        return self._write(symbol, merged, covered_start, covered_end, meta)
+
+    def sync(self, symbol, start, end, stale_ok=True):
+        """Make sure ``[start, end)`` is covered locally, fetching only the gaps.
+
+        Raises UpstreamError when the provider fails and the stored bars do not
+        cover the start of the range."""
+        start, end = to_day(start), to_day(end)
+        meta, gaps, stale = self._plan(symbol, start, end, stale_ok)
+        if stale:
+            self._revalidate([symbol], start, end)
+        if not gaps:
+            return meta
+        # Fetched outside the symbol lock: readers keep being served from the stored bars,
+        # and concurrent syncs of the same gap share one upstream call
+        fetched_at = time.time()
+        try:
+            fetched = []
+            for gap_start, gap_end in gaps:
+                logger.info(f"Syncing {symbol}: {gap_start} -> {gap_end}")
+                fetched.append(self._fetch(symbol, meta, gap_start, gap_end))
+        except UpstreamError as e:
+            if not self._can_serve_stored(meta, start):
+                raise
+            logger.warning(f"Serving stored bars for {symbol}: {e}")
+            return meta
+        with self._lock(symbol):
+            return self._commit(symbol, gaps, fetched, fetched_at)
+
+    def sync_many(self, symbols, start, end, stale_ok=True):
+        """Sync several symbols, fetching symbols with the same gap in one provider call.
+
+        Symbols whose fetch failed keep their stored bars; raises UpstreamError
+        only when no symbol has any."""
+        start, end = to_day(start), to_day(end)
+        metas, plans, by_gap, stale_symbols = {}, {}, {}, []
+        for symbol in symbols:
+            meta, gaps, stale = self._plan(symbol, start, end, stale_ok)
+            metas[symbol] = meta
+            if stale:
+                stale_symbols.append(symbol)
+            if gaps:
+                plans[symbol] = (gaps, [])
+            for gap in gaps:
+                by_gap.setdefault(gap, []).append(symbol)
+        if stale_symbols:
+            self._revalidate(stale_symbols, start, end)
+
+        failed = {}
+        fetched_at = time.time()
+        for (gap_start, gap_end), gap_symbols in by_gap.items():
+            logger.info(f"Syncing {len(gap_symbols)} symbols: {gap_start} -> {gap_end}")
+            try:
+                frames = self._fetch_many(gap_symbols, gap_start, gap_end)
+            except UpstreamError as e:
+                failed.update(dict.fromkeys(gap_symbols, e))
+                continue
+            for symbol in gap_symbols:
+                try:
+                    frame = self._check_answer(symbol, metas[symbol], normalize_frame(frames.get(symbol)),
+                                               gap_start, gap_end)
+                except UpstreamError as e:
+                    failed[symbol] = e
+                    continue
+                plans[symbol][1].append(frame)
+
+        for symbol, (gaps, fetched) in plans.items():
+            if symbol in failed:
+                continue  # its stored bars, if any, are served as they are
+            with self._lock(symbol):
+                metas[symbol] = self._commit(symbol, gaps, fetched, fetched_at)
+        if failed:
+            error = next(iter(failed.values()))
+            for symbol in failed:
+                if not self._can_serve_stored(metas[symbol], start):
+                    metas[symbol] = None
+            if not any(metas.values()):
+                raise error
+            logger.warning(f"Serving stored bars for {len(failed)} symbol(s): {error}")
+        return metas
+
+    # Reads
+
+    def _window(self, symbol, meta, start, end):
+        if meta is None or not meta.get('rows'):
+            return normalize_frame(None)
+        bars = self._load_bars(symbol, meta)
+        days = bars[0]
+        lo = np.searchsorted(days, start.astype(np.int64), side='left')
+        hi = np.searchsorted(days, end.astype(np.int64), side='left')
+        window = bars[:, lo:hi]
+        return pd.DataFrame(
+            np.array(window[1:]).T,
+            columns=COLUMNS,
+            index=pd.DatetimeIndex(window[0].astype(np.int64).astype('datetime64[D]'), name='Date'),
+        )
+
+    def get(self, symbol, start, end):
+        """Bars for ``[start, end)``, synced from the provider where missing."""
+        start, end = to_day(start), to_day(end)
+        return self._window(symbol, self.sync(symbol, start, end), start, end)
+
+    def get_many(self, symbols, start, end):
+        """``{symbol: bars}`` for ``[start, end)`` with one bulk sync for all symbols."""
+        start, end = to_day(start), to_day(end)
+        metas = self.sync_many(symbols, start, end)
+        return {symbol: self._window(symbol, metas[symbol], start, end) for symbol in symbols}
+
+    def get_period(self, symbol, days):
+        """Bars for the last ``days`` calendar days, including today."""
+        end = today() + 1
+        return self.get(symbol, end - 1 - int(days), end)
+
+    def get_period_many(self, symbols, days):
+        end = today() + 1
+        return self.get_many(symbols, end - 1 - int(days), end)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store configured from the environment."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = OHLCVStore()
+        return _default_store
+
+
+def set_store(store):
+    """Replace the process-wide store (benchmarks and load tests use a synthetic one)."""
+    global _default_store
+    with _default_store_lock:
+        _default_store = store
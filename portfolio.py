@@ -0,0 +1,146 @@
+"""Risk analytics of a portfolio of holdings.
+
+The daily closes of all holdings are aligned on one date axis into a
+``(days, holdings)`` matrix. A day on which a holding did not trade repeats
+its last close, so its return is 0. The axis starts on the first day every
+holding has a price. Everything else is linear algebra on the simple-return
+matrix ``R``:
+
+* covariance ``C = (R - mean)^T (R - mean) / (n - 1)`` and the correlation
+  matrix derived from it
+* portfolio volatility ``sqrt(w^T C w)``
+* parametric (normal) VaR from the portfolio mean and volatility, scaled by
+  ``sqrt(horizon)``
+* historical VaR and expected shortfall from the portfolio's overlapping
+  ``horizon``-day returns, ``R w`` compounded
+* risk contribution of each holding ``w_i (C w)_i / sigma``; these add up to
+  the portfolio volatility
+
+Volatilities are annualized over ``TRADING_DAYS``; VaR figures are fractions
+of the portfolio value over ``horizon`` trading days, reported as positive
+losses.
+"""
+import os
+import logging
+from statistics import NormalDist
+
+import numpy as np
+
+from backtest import TRADING_DAYS
+
+logger = logging.getLogger("portfolio")
+
+PORTFOLIO_CONFIDENCE = float(os.environ.get('PORTFOLIO_CONFIDENCE', 0.95))
+MIN_RETURNS = 30  # daily returns needed for a meaningful covariance
+
+
+def align_closes(frames, symbols):
+    """``(days, closes)``: the union of the bar dates and a forward-filled close matrix,
+    starting on the first day every symbol has a close."""
+    dates = [frames[s].index.values.astype('datetime64[D]') for s in symbols]
+    columns = [frames[s]['Close'].to_numpy(dtype=np.float64) for s in symbols]
+    if all(np.array_equal(d, dates[0]) for d in dates):
+        return dates[0], np.column_stack(columns)  # the usual case: same trading days
+
+    days = np.unique(np.concatenate(dates))
+    closes = np.full((len(days), len(symbols)), np.nan)
+    for j, (d, column) in enumerate(zip(dates, columns)):
+        closes[np.searchsorted(days, d), j] = column
+    # Forward fill: index of the last valid row per column
+    valid = ~np.isnan(closes)
+    last = np.where(valid, np.arange(len(days))[:, None], 0)
+    np.maximum.accumulate(last, axis=0, out=last)
+    closes = np.take_along_axis(closes, last, axis=0)
+    start = int(valid.argmax(axis=0).max())
+    return days[start:], closes[start:]
+
+
+def analyze(frames, weights, confidence=PORTFOLIO_CONFIDENCE, horizon=1, include_covariance=False):
+    """Risk figures for ``{symbol: OHLCV DataFrame}`` held with ``{symbol: weight}``.
+
+    Weights are normalized to sum to 1 (negative weights are short positions).
+    Returns None when there are fewer than ``MIN_RETURNS`` common returns.
+    """
+    if not 0.5 <= confidence < 1:
+        raise ValueError("confidence must be in [0.5, 1)")
+    if horizon < 1:
+        raise ValueError("horizon must be at least 1 day")
+    symbols = [s for s in weights if s in frames]
+    if not symbols:
+        return None
+    w = np.array([weights[s] for s in symbols], dtype=np.float64)
+    if w.sum() <= 0:
+        raise ValueError("weights must sum to a positive number")
+    w /= w.sum()
+
+    days, closes = align_closes(frames, symbols)
+    returns = closes[1:] / closes[:-1] - 1
+    n = len(returns)
+    if n < max(MIN_RETURNS, horizon + 1):
+        return None
+
+    mean = returns.mean(axis=0)
+    centered = returns - mean
+    cov = centered.T @ centered / (n - 1)
+    vol = np.sqrt(np.diag(cov))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = cov / np.outer(vol, vol)
+    corr[~np.isfinite(corr)] = 0.0
+    np.fill_diagonal(corr, 1.0)
+
+    marginal = cov @ w
+    portfolio_var = float(w @ marginal)
+    portfolio_vol = np.sqrt(max(portfolio_var, 0.0))
+    contribution = w * marginal / portfolio_vol if portfolio_vol > 0 else np.zeros_like(w)
+
+    # Parametric VaR, normal returns with the i.i.d. square-root-of-time rule
+    z = NormalDist().inv_cdf(confidence)
+    portfolio_mean = float(w @ mean)
+    parametric_var = z * portfolio_vol * np.sqrt(horizon) - portfolio_mean * horizon
+    parametric_es = portfolio_vol * np.sqrt(horizon) * NormalDist().pdf(z) / (1 - confidence) - portfolio_mean * horizon
+
+    # Historical VaR on overlapping horizon-day returns of the rebalanced portfolio
+    value = np.concatenate(([1.0], np.cumprod(1 + returns @ w)))
+    period_returns = value[horizon:] / value[:-horizon] - 1
+    historical_var = -float(np.quantile(period_returns, 1 - confidence))
+    tail = period_returns[period_returns <= -historical_var]
+    historical_es = -float(tail.mean()) if len(tail) else historical_var
+
+    annual = np.sqrt(TRADING_DAYS)
+    result = {
+        'holdings': len(symbols),
+        'start': str(days[0]),
+        'end': str(days[-1]),
+        'observations': n,
+        'confidence': confidence,
+        'horizon_days': horizon,
+        'portfolio': {
+            'annualized_return': round(float((1 + portfolio_mean) ** TRADING_DAYS - 1), 6),
+            'annualized_volatility': round(float(portfolio_vol * annual), 6),
+            'diversification_ratio': round(float(w @ vol / portfolio_vol), 6) if portfolio_vol > 0 else None,
+            'var_parametric': round(float(parametric_var), 6),
+            'var_historical': round(historical_var, 6),
+            'expected_shortfall_parametric': round(float(parametric_es), 6),
+            'expected_shortfall_historical': round(historical_es, 6),
+        },
+        'per_holding': {
+            symbol.replace('.IS', ''): {
+                'weight': round(float(w[i]), 6),
+                'annualized_volatility': round(float(vol[i] * annual), 6),
+                'marginal_contribution': round(float(marginal[i] / portfolio_vol * annual), 6) if portfolio_vol > 0 else 0.0,
+                'risk_contribution': round(float(contribution[i] * annual), 6),
+                'risk_contribution_pct': round(float(contribution[i] / portfolio_vol), 6) if portfolio_vol > 0 else 0.0,
+            }
+            for i, symbol in enumerate(symbols)
+        },
+        'correlation': {
+            'symbols': [s.replace('.IS', '') for s in symbols],
+            'matrix': np.round(corr, 4).tolist(),
+        },
+    }
+    if include_covariance:
+        result['covariance'] = {
+            'symbols': result['correlation']['symbols'],
+            'matrix': (cov * TRADING_DAYS).tolist(),  # annualized
+        }
+    return result
@@ -0,0 +1,122 @@
+"""After-close precomputation for a watchlist.
+
+BIST daily bars are final once the session has closed. ``PrecomputeScheduler``
+runs a job for the ``PRECOMPUTE_WATCHLIST`` symbols once when the service
+starts and then every trading day at ``PRECOMPUTE_AT`` (Istanbul time). The
+first requests of the evening and of the next morning are then served from
+the caches instead of paying for the download and the computation:
+
+* the technical analysis API refreshes the bars and publishes the analyses for
+  ``PRECOMPUTE_PERIODS`` into its response cache, for the request windows of
+  every day up to the next trading day (a window starts ``period_days`` before
+  the day of the request)
+* the prediction API loads or trains the models, then computes the forecasts
+  (up to ``MAX_HORIZON``) and the validation metrics of the last
+  ``PRECOMPUTE_PREDICT_DAYS`` days, several symbols at a time
+
+Once the next session's live bar reaches the store (see
+``OHLCV_TAIL_MAX_AGE``), requests are computed on demand again.
+
+The caches are per process, so every worker runs its own scheduler. The bar
+refresh is serialized across processes with a lock file in the store
+directory, so only the first worker downloads.
+"""
+import os
+import time
+import logging
+import datetime
+import threading
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, each worker refreshes
+    fcntl = None
+
+from ohlcv_store import get_store, today
+from metrics import observe
+
+logger = logging.getLogger("precompute")
+
+PRECOMPUTE_WATCHLIST = [s.strip() for s in os.environ.get('PRECOMPUTE_WATCHLIST', '').split(',') if s.strip()]
+# The session closes at 18:00 and the closing auction ends around 18:10
+PRECOMPUTE_AT = os.environ.get('PRECOMPUTE_AT', '18:45')
+PRECOMPUTE_PERIODS = [int(p) for p in os.environ.get('PRECOMPUTE_PERIODS', '90').split(',')]
+PRECOMPUTE_PREDICT_DAYS = int(os.environ.get('PRECOMPUTE_PREDICT_DAYS', 365))
+PRECOMPUTE_WORKERS = int(os.environ.get('PRECOMPUTE_WORKERS', os.cpu_count() or 1))
+# Entries are keyed on the bars they were computed from; this only bounds how long they are kept
+PRECOMPUTE_TTL = 36 * 3600
+MARKET_TZ = ZoneInfo('Europe/Istanbul')
+
+
+def serving_days():
+    """Today and every day up to and including the next trading day."""
+    day = today()
+    next_session = np.busday_offset(day + 1, 0, roll='forward')
+    return list(np.arange(day, next_session + 1, dtype='datetime64[D]'))
+
+
+def refresh_bars(symbols, days):
+    """Sync the last ``days`` days of ``symbols``, one process at a time."""
+    store = get_store()
+    end = today() + 1
+    os.makedirs(store.root, exist_ok=True)
+    with open(os.path.join(store.root, '.precompute.lock'), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file is closed
+        # No stale tail: after the close the last bar must be the final one
+        return store.sync_many(symbols, end - 1 - days, end, stale_ok=False)
+
+
+class PrecomputeScheduler:
+    """Runs ``job(symbols) -> summary dict`` at start and then daily after the close."""
+
+    def __init__(self, name, job, symbols=None, at=PRECOMPUTE_AT):
+        self.name = name
+        self.job = job
+        self.symbols = list(PRECOMPUTE_WATCHLIST if symbols is None else symbols)
+        hour, minute = (int(part) for part in at.split(':'))
+        self.at = datetime.time(hour, minute)
+        self.last_run = None
+        self._stop = threading.Event()
+
+    def next_run(self, now=None):
+        now = now or datetime.datetime.now(MARKET_TZ)
+        run = now.replace(hour=self.at.hour, minute=self.at.minute, second=0, microsecond=0)
+        if run <= now:
+            run += datetime.timedelta(days=1)
+        while not np.is_busday(np.datetime64(run.date(), 'D')):
+            run += datetime.timedelta(days=1)
+        return run
+
+    def run_once(self):
+        started = time.time()
+        try:
+            summary = self.job(self.symbols) or {}
+        except Exception as e:
+            logger.error(f"Precompute ({self.name}) failed: {str(e)}")
+            summary = {'error': str(e)}
+        elapsed = time.time() - started
+        observe('precompute', elapsed)
+        self.last_run = dict(summary, started_at=started, seconds=round(elapsed, 3))
+        logger.info(f"Precomputed {self.name} for {len(self.symbols)} symbols in {elapsed:.1f}s: {summary}")
+        return self.last_run
+
+    def start(self):
+        """Start the background thread; None when the watchlist is empty."""
+        if not self.symbols:
+            return None
+
+        def loop():
+            self.run_once()
+            while not self._stop.wait((self.next_run() - datetime.datetime.now(MARKET_TZ)).total_seconds()):
+                self.run_once()
+
+        thread = threading.Thread(target=loop, name=f'precompute-{self.name}', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
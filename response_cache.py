@@ -0,0 +1,82 @@
+"""In-memory cache of serialized JSON responses with ETag support.
+
+Callers key entries on everything the response depends on (for market data:
+symbol, period and a stamp of the bars it was computed from), so a newer bar
+produces a new key and the old entry simply ages out of the LRU. Each entry
+also expires after ``ttl`` seconds. ``to_response`` answers ``If-None-Match``
+with ``304 Not Modified`` when the client already has the entry.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+from flask import Response
+
+logger = logging.getLogger("response_cache")
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 512))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'mimetype', 'expires_at'])
+
+
+def bar_stamp(data):
+    """First and last bar date plus the last close, identifying a window of bars."""
+    if data is None or data.empty:
+        return None
+    return (data.index[0].strftime('%Y-%m-%d'), data.index[-1].strftime('%Y-%m-%d'),
+            float(data['Close'].iloc[-1]))
+
+
+class ResponseCache:
+    """TTL + LRU cache of response bodies."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, body, mimetype='application/json', ttl=None):
+        """Store ``body``; ``ttl`` overrides the cache-wide TTL (e.g. for precomputed entries)."""
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        entry = CachedResponse(body, etag, mimetype, time.monotonic() + (self.ttl if ttl is None else ttl))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def to_response(entry, request):
+    """Flask response for ``entry``; ``304`` when ``If-None-Match`` matches its ETag."""
+    response = Response(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept')
+    return response.make_conditional(request)
@@ -0,0 +1,71 @@
+"""Close-price scalers persisted with each model version.
+
+``PriceScaler`` is the min-max transform ``MinMaxScaler(feature_range=(0, 1))``
+applies to the close column, computed the same way (``x * scale + offset``),
+so the scaled values are bit-for-bit identical. It only needs NumPy and
+serializes to two numbers. It is stored in the model version's
+``meta.json``, so inference feeds a model inputs scaled exactly like its
+training data, however the request's date range differs.
+
+``NORMALIZATION`` selects how the prediction API scales a request's closes:
+
+* ``fixed`` (default): the scaler fitted on the training range, unchanged
+* ``rolling``: the training scaler, widened to any newer bar that leaves its
+  range (the expanding min/max up to the last bar of the request)
+* ``refit``: a new scaler fitted on the request's own bars, the previous
+  behaviour
+
+Artifacts saved before scalers were stored, and symbols the global model was
+not trained on, fall back to ``refit``.
+"""
+import os
+
+import numpy as np
+
+NORMALIZATION = os.environ.get('NORMALIZATION', 'fixed')  # 'fixed', 'rolling' or 'refit'
+NORMALIZATION_MODES = ('fixed', 'rolling', 'refit')
+
+
+class PriceScaler:
+    """Min-max scaling of one column to [0, 1]."""
+
+    def __init__(self, data_min, data_max):
+        self.data_min = float(data_min)
+        self.data_max = float(data_max)
+        data_range = self.data_max - self.data_min
+        # MinMaxScaler leaves constant columns unscaled
+        self.scale = 1.0 / data_range if data_range != 0 else 1.0
+        self.offset = -self.data_min * self.scale
+
+    @classmethod
+    def fit(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        return cls(np.nanmin(values), np.nanmax(values))
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['min'], state['max'])
+
+    def to_dict(self):
+        return {'min': self.data_min, 'max': self.data_max}
+
+    def extend(self, values):
+        """Scaler whose range also covers ``values``; ``self`` when it already does."""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return self
+        data_min = min(self.data_min, float(np.nanmin(values)))
+        data_max = max(self.data_max, float(np.nanmax(values)))
+        if data_min == self.data_min and data_max == self.data_max:
+            return self
+        return PriceScaler(data_min, data_max)
+
+    def transform(self, values):
+        """``(n, 1)`` (or ``(n,)``) prices -> scaled array of the same shape."""
+        return np.asarray(values, dtype=np.float64) * self.scale + self.offset
+
+    def inverse_transform(self, values):
+        return (np.asarray(values, dtype=np.float64) - self.offset) / self.scale
+
+    def __repr__(self):
+        return f"PriceScaler(min={self.data_min}, max={self.data_max})"
@@ -0,0 +1,106 @@
+"""Production entry point for the two Flask services.
+
+Usage::
+
+    python serve.py api          # stock prediction API, default 0.0.0.0:5000
+    python serve.py technical    # technical analysis API, default 0.0.0.0:5001
+
+With gunicorn installed (Linux/macOS) the app module is imported once in the
+master before the workers fork (``preload_app``), together with the libraries
+its ``preload()`` pulls in (TensorFlow, scikit-learn), so they are shared
+copy-on-write. Work that does not survive ``fork()`` - background threads,
+loading models into TensorFlow - runs in each worker after the fork through
+the module's ``start_background_tasks()``. On SIGTERM workers stop accepting
+connections and get ``SERVE_GRACEFUL_TIMEOUT`` seconds to finish in-flight
+requests.
+
+Without gunicorn (e.g. on Windows) the app runs in one process on Werkzeug's
+threaded server. SIGTERM/SIGINT turn ``/ready`` to 503 and stop the server
+after in-flight requests complete.
+"""
+import os
+import sys
+import signal
+import logging
+import importlib
+import threading
+
+logger = logging.getLogger("serve")
+
+APPS = {
+    # Training jobs and the inference batcher live in-process: one worker, many threads
+    'api': {'module': 'api', 'port': 5000, 'workers': 1, 'threads': 8, 'timeout': 600},
+    'technical': {'module': 'technical_analysis_api', 'port': 5001,
+                  'workers': min(4, os.cpu_count() or 1), 'threads': 4, 'timeout': 60},
+}
+
+
+def settings(name):
+    spec = APPS[name]
+    return {
+        'bind': os.environ.get('SERVE_BIND', f"0.0.0.0:{spec['port']}"),
+        'workers': int(os.environ.get('SERVE_WORKERS', spec['workers'])),
+        'threads': int(os.environ.get('SERVE_THREADS', spec['threads'])),
+        'timeout': int(os.environ.get('SERVE_TIMEOUT', spec['timeout'])),
+        'graceful_timeout': int(os.environ.get('SERVE_GRACEFUL_TIMEOUT', 30)),
+    }
+
+
+def run_gunicorn(module_name, options):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            config = dict(options, preload_app=True, worker_class='gthread',
+                          post_worker_init=lambda worker: importlib.import_module(module_name).start_background_tasks(),
+                          worker_exit=lambda server, worker: importlib.import_module(module_name).shutdown())
+            for key, value in config.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            module = importlib.import_module(module_name)
+            if hasattr(module, 'preload'):
+                module.preload()  # heavy libraries are shared copy-on-write by the workers
+            return module.app
+
+    Server().run()
+
+
+def run_werkzeug(module_name, options):
+    from werkzeug.serving import make_server
+
+    module = importlib.import_module(module_name)
+    host, port = options['bind'].rsplit(':', 1)
+    server = make_server(host, int(port), module.app, threaded=True)
+    server.daemon_threads = False  # server_close() waits for in-flight requests
+
+    def stop(signum, frame):
+        logger.info(f"Received signal {signum}, draining")
+        module.shutdown()
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    module.start_background_tasks()
+    logger.info(f"Serving {module_name} on {options['bind']} (single process, threaded)")
+    server.serve_forever()
+    server.server_close()
+
+
+def main(argv):
+    if len(argv) != 2 or argv[1] not in APPS:
+        print(f"Usage: python serve.py {{{'|'.join(APPS)}}}", file=sys.stderr)
+        return 2
+    name = argv[1]
+    options = settings(name)
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_werkzeug(APPS[name]['module'], options)
+    else:
+        run_gunicorn(APPS[name]['module'], options)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
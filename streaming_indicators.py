@@ -0,0 +1,393 @@
+"""Incremental indicator state for intraday updates.
+
+Each indicator keeps just enough state to fold in one bar at a time, so the
+work per bar depends on the indicator period and never on the length of the
+history. The values match the batch ``calculate_*`` functions in
+technical_analysis_api.py. States can be snapshotted to plain dicts (JSON)
+and restored later.
+
+A bar with the same date as the previous one revises it (an intraday update
+of today's candle) instead of being appended.
+"""
+import os
+import re
+import json
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger("streaming_indicators")
+
+STATE_DIR = os.environ.get('INDICATOR_STATE_DIR', 'indicator_state')
+
+
+class _Window:
+    """Fixed-size window of the most recent values."""
+
+    def __init__(self, size, values=()):
+        self.size = size
+        self.values = deque(values, maxlen=size)
+
+    def push(self, value):
+        self.values.append(value)
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return sum(self.values) / self.size
+
+    def std(self):
+        mean = self.mean()
+        return (sum((v - mean) ** 2 for v in self.values) / (self.size - 1)) ** 0.5
+
+
+class _MonotonicExtreme:
+    """Rolling max (or min) over the last ``size`` values in amortized O(1)."""
+
+    def __init__(self, size, kind, count=0, entries=()):
+        self.size = size
+        self.kind = kind
+        self.count = count
+        self.entries = deque(tuple(e) for e in entries)  # (index, value)
+
+    def push(self, value):
+        dominated = (lambda v: v <= value) if self.kind == 'max' else (lambda v: v >= value)
+        while self.entries and dominated(self.entries[-1][1]):
+            self.entries.pop()
+        self.entries.append((self.count, value))
+        self.count += 1
+        while self.entries[0][0] <= self.count - 1 - self.size:
+            self.entries.popleft()
+
+    @property
+    def full(self):
+        return self.count >= self.size
+
+    @property
+    def value(self):
+        return self.entries[0][1]
+
+
+class StreamingIndicator:
+    """Base class: ``update(bar)`` returns the indicator dict, or None while warming up."""
+
+    name = None
+
+    def update(self, bar):
+        raise NotImplementedError
+
+    def snapshot(self):
+        raise NotImplementedError
+
+    @classmethod
+    def restore(cls, state):
+        raise NotImplementedError
+
+
+class EMA(StreamingIndicator):
+    """pandas ``ewm(span=period).mean()`` with adjust=True."""
+
+    name = 'ema'
+
+    def __init__(self, period=20, num=0.0, den=0.0, count=0):
+        self.period = period
+        self.decay = 1.0 - 2.0 / (period + 1.0)
+        self.num = num
+        self.den = den
+        self.count = count
+
+    def push(self, value):
+        self.num = value + self.decay * self.num
+        self.den = 1.0 + self.decay * self.den
+        self.count += 1
+        return self.num / self.den
+
+    def update(self, bar):
+        value = self.push(bar['close'])
+        if self.count < self.period:
+            return None
+        return {'current': value, 'period': self.period}
+
+    def snapshot(self):
+        return {'period': self.period, 'num': self.num, 'den': self.den, 'count': self.count}
+
+    @classmethod
+    def restore(cls, state):
+        return cls(**state)
+
+
+class SMA(StreamingIndicator):
+    name = 'sma'
+
+    def __init__(self, period=20, values=()):
+        self.period = period
+        self.window = _Window(period, values)
+
+    def update(self, bar):
+        self.window.push(bar['close'])
+        if not self.window.full:
+            return None
+        return {'current': self.window.mean(), 'period': self.period}
+
+    def snapshot(self):
+        return {'period': self.period, 'values': list(self.window.values)}
+
+    @classmethod
+    def restore(cls, state):
+        return cls(**state)
+
+
+class RSI(StreamingIndicator):
+    name = 'rsi'
+
+    def __init__(self, period=14, last_close=None, gains=(), losses=(), count=0):
+        self.period = period
+        self.last_close = last_close
+        self.gains = _Window(period, gains)
+        self.losses = _Window(period, losses)
+        self.count = count
+
+    def update(self, bar):
+        close = bar['close']
+        # The batch version treats the first (undefined) change as zero
+        delta = 0.0 if self.last_close is None else close - self.last_close
+        self.last_close = close
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        self.count += 1
+        if self.count < self.period + 1:
+            return None
+        avg_loss = self.losses.mean() or 0.0001
+        rs = self.gains.mean() / avg_loss
+        return {'current': 100 - (100 / (1 + rs)), 'period': self.period}
+
+    def snapshot(self):
+        return {'period': self.period, 'last_close': self.last_close, 'count': self.count,
+                'gains': list(self.gains.values), 'losses': list(self.losses.values)}
+
+    @classmethod
+    def restore(cls, state):
+        return cls(**state)
+
+
+class MACD(StreamingIndicator):
+    name = 'macd'
+
+    def __init__(self, fast=None, slow=None, signal=None, count=0):
+        self.fast = EMA.restore(fast) if fast else EMA(12)
+        self.slow = EMA.restore(slow) if slow else EMA(26)
+        self.signal = EMA.restore(signal) if signal else EMA(9)
+        self.count = count
+
+    def update(self, bar):
+        close = bar['close']
+        macd_line = self.fast.push(close) - self.slow.push(close)
+        signal_line = self.signal.push(macd_line)
+        self.count += 1
+        if self.count < 35:
+            return None
+        return {'macd_line': macd_line, 'signal_line': signal_line, 'histogram': macd_line - signal_line}
+
+    def snapshot(self):
+        return {'fast': self.fast.snapshot(), 'slow': self.slow.snapshot(),
+                'signal': self.signal.snapshot(), 'count': self.count}
+
+    @classmethod
+    def restore(cls, state):
+        return cls(**state)
+
+
+class Bollinger(StreamingIndicator):
+    name = 'bollinger'
+
+    def __init__(self, period=20, values=()):
+        self.period = period
+        self.window = _Window(period, values)
+
+    def update(self, bar):
+        self.window.push(bar['close'])
+        if not self.window.full:
+            return None
+        middle = self.window.mean()
+        std = self.window.std()
+        return {'upper_band': middle + 2 * std, 'middle_band': middle, 'lower_band': middle - 2 * std}
+
+    def snapshot(self):
+        return {'period': self.period, 'values': list(self.window.values)}
+
+    @classmethod
+    def restore(cls, state):
+        return cls(**state)
+
+
+class _HighLowRange:
+    """Rolling highest high / lowest low shared by Stochastic and Williams %R."""
+
+    def __init__(self, period, highest=None, lowest=None):
+        self.period = period
+        self.highest = _MonotonicExtreme(period, 'max', **(highest or {}))
+        self.lowest = _MonotonicExtreme(period, 'min', **(lowest or {}))
+
+    def push(self, bar):
+        self.highest.push(bar['high'])
+        self.lowest.push(bar['low'])
+
+    @property
+    def full(self):
+        return self.highest.full
+
+    @property
+    def denominator(self):
+        return (self.highest.value - self.lowest.value) or 0.0001
+
+    def snapshot(self):
+        return {
+            'period': self.period,
+            'highest': {'count': self.highest.count, 'entries': list(self.highest.entries)},
+            'lowest': {'count': self.lowest.count, 'entries': list(self.lowest.entries)},
+        }
+
+
+class Stochastic(StreamingIndicator):
+    name = 'stochastic'
+
+    def __init__(self, period=14, price_range=None, k_values=()):
+        self.period = period
+        self.range = _HighLowRange(**price_range) if price_range else _HighLowRange(period)
+        self.k_values = _Window(3, k_values)
+
+    def update(self, bar):
+        self.range.push(bar)
+        if not self.range.full:
+            return None
+        k_percent = 100 * (bar['close'] - self.range.lowest.value) / self.range.denominator
+        self.k_values.push(k_percent)
+        # The batch version needs period + 3 bars before it reports anything
+        if self.range.highest.count < self.period + 3:
+            return None
+        return {'k_percent': k_percent, 'd_percent': self.k_values.mean()}
+
+    def snapshot(self):
+        return {'period': self.period, 'price_range': self.range.snapshot(), 'k_values': list(self.k_values.values)}
+
+    @classmethod
+    def restore(cls, state):
+        return cls(**state)
+
+
+class WilliamsR(StreamingIndicator):
+    name = 'williams_r'
+
+    def __init__(self, period=14, price_range=None):
+        self.period = period
+        self.range = _HighLowRange(**price_range) if price_range else _HighLowRange(period)
+
+    def update(self, bar):
+        self.range.push(bar)
+        if not self.range.full:
+            return None
+        return {'current': -100 * (self.range.highest.value - bar['close']) / self.range.denominator}
+
+    def snapshot(self):
+        return {'period': self.period, 'price_range': self.range.snapshot()}
+
+    @classmethod
+    def restore(cls, state):
+        return cls(**state)
+
+
+# Same order as the batch engine's output
+INDICATOR_CLASSES = [SMA, EMA, RSI, MACD, Bollinger, Stochastic, WilliamsR]
+
+
+class IndicatorState:
+    """All streaming indicators for one symbol."""
+
+    def __init__(self, indicators=None, last_date=None, previous=None, current=None):
+        self.indicators = indicators or [cls() for cls in INDICATOR_CLASSES]
+        self.last_date = last_date
+        self.previous = previous  # snapshot taken before the last bar, for revisions
+        self.current = current or {}
+
+    def update(self, bar):
+        """Fold in ``bar`` (dict with date, high, low, close) and return the indicators."""
+        date = str(bar.get('date', ''))[:10] or None
+        if date is not None and self.last_date is not None:
+            if date < self.last_date:
+                raise ValueError(f"Bar {date} is older than the last bar {self.last_date}")
+            if date == self.last_date and self.previous is not None:
+                self.indicators = IndicatorState.restore(self.previous).indicators
+
+        self.previous = self._indicator_snapshot()
+        bar = {key: float(bar[key]) for key in ('high', 'low', 'close')}
+        current = {}
+        for indicator in self.indicators:
+            value = indicator.update(bar)
+            if value is not None:
+                current[indicator.name] = value
+        self.last_date = date
+        self.current = current
+        return current
+
+    @classmethod
+    def from_history(cls, data):
+        """Seed the state by replaying an OHLCV DataFrame."""
+        state = cls()
+        for date, high, low, close in zip(data.index, data['High'].to_numpy(),
+                                          data['Low'].to_numpy(), data['Close'].to_numpy()):
+            state.update({'date': date.strftime('%Y-%m-%d'), 'high': high, 'low': low, 'close': close})
+        return state
+
+    def _indicator_snapshot(self):
+        return {'indicators': {indicator.name: indicator.snapshot() for indicator in self.indicators}}
+
+    def snapshot(self):
+        state = self._indicator_snapshot()
+        state.update({'last_date': self.last_date, 'previous': self.previous, 'current': self.current})
+        return state
+
+    @classmethod
+    def restore(cls, state):
+        by_name = {indicator_cls.name: indicator_cls for indicator_cls in INDICATOR_CLASSES}
+        indicators = [by_name[name].restore(snapshot) for name, snapshot in state['indicators'].items()]
+        return cls(indicators, state.get('last_date'), state.get('previous'), state.get('current'))
+
+
+class IndicatorStateStore:
+    """Per-symbol IndicatorState cached in memory and persisted as JSON."""
+
+    def __init__(self, root=STATE_DIR):
+        self.root = root
+        self._states = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _path(self, symbol):
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9._-]', '_', symbol) + '.json')
+
+    def lock(self, symbol):
+        with self._guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def load(self, symbol):
+        state = self._states.get(symbol)
+        if state is not None:
+            return state
+        try:
+            with open(self._path(symbol), encoding='utf-8') as f:
+                state = IndicatorState.restore(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        self._states[symbol] = state
+        return state
+
+    def save(self, symbol, state):
+        self._states[symbol] = state
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(symbol)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state.snapshot(), f)
+        os.replace(tmp_path, path)
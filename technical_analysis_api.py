@@ -2,13 +2,28 @@ import logging
 import pandas as pd
 import numpy as np
 import datetime
-import yfinance as yf
-from flask import Flask, jsonify, request
+import json
+from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 import ssl
 import os
 import warnings
 import sys
+import threading
+from ohlcv_store import get_store
+from indicator_engine import default_engine, BarContext
+from streaming_indicators import IndicatorState, IndicatorStateStore
+from response_cache import ResponseCache, bar_stamp, to_response
+from backtest import run_backtest, BACKTEST_COST_BPS
+from portfolio import analyze as analyze_portfolio, PORTFOLIO_CONFIDENCE
+from metrics import instrument_app, cache_metrics, upstream_metrics, timed, trace
+from upstream import UpstreamError
+from precompute import PrecomputeScheduler, refresh_bars, serving_days, PRECOMPUTE_PERIODS, PRECOMPUTE_TTL
+
+try:
+    import orjson  # isteğe bağlı: NumPy dizilerini doğrudan kodlar
+except ImportError:
+    orjson = None
 
 # Windows encoding düzeltmesi
 if sys.platform == "win32":
@@ -33,6 +48,31 @@ logger = logging.getLogger("technical_analysis_api")
 
 app = Flask(__name__)
 CORS(app)
+instrument_app(app)  # /metrics, istek metrikleri ve örneklenmiş izleme
+
+MAX_BATCH_SYMBOLS = 500
+STREAM_SEED_DAYS = 140  # varsayılan analiz penceresi (90 + 50 gün)
+COLUMNAR_MIMETYPE = 'application/vnd.smartbist.columnar+json'
+
+indicator_states = IndicatorStateStore()
+# Yanıt önbelleği: anahtar sembol, süre ve son barı içerir, yeni bar gelince kendiliğinden yenilenir
+response_cache = ResponseCache()
+cache_metrics({'response': lambda: (response_cache.hits, response_cache.misses)})
+upstream_metrics(lambda: get_store().gate)
+# Sağlayıcı hatası 404 değil 503 olarak döner: veri yok değil, şu an alınamıyor
+UPSTREAM_ERROR = "Veri sağlayıcısına şu an ulaşılamıyor, lütfen tekrar deneyin"
+ready = threading.Event()
+
+def start_background_tasks():
+    """İşlem başına başlangıç işleri (serve.py her worker'da fork sonrası çağırır)"""
+    # Önbellek işleme özel, izleme listesini her worker kendisi hesaplar (bkz. precompute.py)
+    precompute_scheduler.start()
+    ready.set()
+
+def shutdown():
+    """Hazır bildirmeyi bırak (kapanış sırasında yeni trafik gelmesin)"""
+    ready.clear()
+    precompute_scheduler.stop()
 
 def fix_symbol(symbol):
     """Sembol formatını düzelt"""
@@ -44,22 +84,34 @@ def fix_symbol(symbol):
 def get_stock_data(symbol, days=100):
     """Hisse verilerini çek"""
     try:
-        end_date = datetime.datetime.now()
-        start_date = end_date - datetime.timedelta(days=days)
-        
-        logger.info(f"Veri çekiliyor: {symbol}")
-        data = yf.download(symbol, start=start_date, end=end_date, progress=False)
+        with timed('fetch'):
+            data = get_store().get_period(symbol, days)
         
         if data.empty:
             return None
             
-        logger.info(f"Başarılı: {len(data)} veri noktası")
+        trace(f"{symbol}: {len(data)} veri noktası")
         return data
         
+    except UpstreamError:
+        raise
     except Exception as e:
         logger.error(f"Veri çekme hatası {symbol}: {e}")
         return None
 
+def get_stock_data_many(symbols, days=100):
+    """Birden fazla hissenin verisini tek toplu çekimle al"""
+    try:
+        trace(f"Toplu veri: {len(symbols)} sembol")
+        with timed('fetch'):
+            frames = get_store().get_period_many(symbols, days)
+        return {symbol: data for symbol, data in frames.items() if not data.empty}
+    except UpstreamError:
+        raise
+    except Exception as e:
+        logger.error(f"Toplu veri çekme hatası: {e}")
+        return {}
+
 def calculate_sma(data, period=20):
     """Basit Hareketli Ortalama"""
     try:
@@ -265,68 +317,10 @@ def calculate_williams_r(data, period=14):
         return None
 
 def calculate_all_indicators(data):
-    """Tüm teknik göstergeleri hesapla"""
-    indicators = {}
-    logger.info(f"Toplam veri noktası: {len(data)}")
-    
-    # Her göstergeyi ayrı ayrı hesapla
-    logger.info("SMA hesaplanıyor...")
-    sma = calculate_sma(data)
-    if sma: 
-        indicators['sma'] = sma
-        logger.info("SMA başarılı")
-    else:
-        logger.warning("SMA hesaplanamadı")
-    
-    logger.info("EMA hesaplanıyor...")
-    ema = calculate_ema(data)
-    if ema: 
-        indicators['ema'] = ema
-        logger.info("EMA başarılı")
-    else:
-        logger.warning("EMA hesaplanamadı")
-    
-    logger.info("RSI hesaplanıyor...")
-    rsi = calculate_rsi(data)
-    if rsi: 
-        indicators['rsi'] = rsi
-        logger.info("RSI başarılı")
-    else:
-        logger.warning("RSI hesaplanamadı")
-    
-    logger.info("MACD hesaplanıyor...")
-    macd = calculate_macd(data)
-    if macd: 
-        indicators['macd'] = macd
-        logger.info("MACD başarılı")
-    else:
-        logger.warning("MACD hesaplanamadı")
-    
-    logger.info("Bollinger hesaplanıyor...")
-    bollinger = calculate_bollinger(data)
-    if bollinger: 
-        indicators['bollinger'] = bollinger
-        logger.info("Bollinger başarılı")
-    else:
-        logger.warning("Bollinger hesaplanamadı")
-    
-    logger.info("Stochastic hesaplanıyor...")
-    stochastic = calculate_stochastic(data)
-    if stochastic: 
-        indicators['stochastic'] = stochastic
-        logger.info("Stochastic başarılı")
-    else:
-        logger.warning("Stochastic hesaplanamadı")
-    
-    logger.info("Williams %R hesaplanıyor...")
-    williams = calculate_williams_r(data)
-    if williams: 
-        indicators['williams_r'] = williams
-        logger.info("Williams %R başarılı")
-    else:
-        logger.warning("Williams %R hesaplanamadı")
-    
-    logger.info(f"Toplam hesaplanan gösterge sayısı: {len(indicators)}")
+    """Tüm teknik göstergeleri hesapla (tek geçişte, bkz. indicator_engine)"""
+    with timed('indicators'):
+        indicators = default_engine.compute(data)
+    trace(f"Toplam veri noktası: {len(data)}, hesaplanan gösterge sayısı: {len(indicators)}")
     return indicators
 
 def calculate_signals(indicators, current_price):
@@ -412,19 +406,122 @@ def calculate_signals(indicators, current_price):
         'neutral_signals': neutral_count
     }
 
+def _price_columns(data):
+    """Fiyat sütunlarını NumPy dizileri olarak al"""
+    return {
+        'date': np.datetime_as_string(data.index.values.astype('datetime64[D]')),
+        'open': data['Open'].to_numpy(dtype=np.float64),
+        'high': data['High'].to_numpy(dtype=np.float64),
+        'low': data['Low'].to_numpy(dtype=np.float64),
+        'close': data['Close'].to_numpy(dtype=np.float64),
+        'volume': data['Volume'].to_numpy(dtype=np.float64).astype(np.int64),
+    }
+
 def format_price_history(data):
-    """Fiyat geçmişini formatla"""
-    history = []
-    for date, row in data.iterrows():
-        history.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'open': float(row['Open']),
-            'high': float(row['High']),
-            'low': float(row['Low']),
-            'close': float(row['Close']),
-            'volume': int(row['Volume'])
-        })
-    return history
+    """Fiyat geçmişini formatla (bar başına bir nesne)"""
+    columns = {name: values.tolist() for name, values in _price_columns(data).items()}
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+def format_price_history_columnar(data):
+    """Fiyat geçmişini sütun dizileri olarak formatla (alan başına bir dizi)"""
+    columns = _price_columns(data)
+    if orjson is None:
+        return {name: values.tolist() for name, values in columns.items()}
+    # orjson sayısal dizileri tampondan doğrudan yazar; tarih dizisi str listesi olmalı
+    columns['date'] = columns['date'].tolist()
+    return columns
+
+def wants_columnar():
+    """Sütunlu biçim ?format=columnar ya da Accept başlığıyla istenir"""
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt.lower() == 'columnar'
+    return request.accept_mimetypes.best_match(['application/json', COLUMNAR_MIMETYPE]) == COLUMNAR_MIMETYPE
+
+def encode_json(payload):
+    """Sütunlu yanıtlar için hızlı JSON kodlayıcı"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+def build_analysis(symbol, data, period_days, indicators, columnar=False):
+    """Teknik analiz yanıtını oluştur"""
+    # Son period_days kadar veri
+    recent_data = data.tail(period_days)
+    current_price = float(recent_data['Close'].iloc[-1])
+    
+    # Sinyalleri hesapla
+    with timed('signals'):
+        signals = calculate_signals(indicators, current_price)
+    
+    return {
+        "symbol": symbol.replace('.IS', ''),
+        "current_price": current_price,
+        "analysis_date": datetime.datetime.now().isoformat(),
+        "period_days": period_days,
+        "data_points": len(recent_data),
+        "indicators": indicators,
+        "signals": signals,
+        "price_history": (format_price_history_columnar(recent_data) if columnar
+                          else format_price_history(recent_data))
+    }
+
+def iter_batch_indicators(frames):
+    """Aynı uzunluktaki hisseleri sembol x zaman matrisinde birlikte hesapla"""
+    groups = {}
+    for symbol, data in frames.items():
+        groups.setdefault(len(data), []).append(symbol)
+    
+    for symbols in groups.values():
+        ctx = BarContext(
+            np.stack([frames[s]['Close'].to_numpy() for s in symbols]),
+            np.stack([frames[s]['High'].to_numpy() for s in symbols]),
+            np.stack([frames[s]['Low'].to_numpy() for s in symbols]),
+        )
+        with timed('indicators'):
+            results = default_engine.compute_context(ctx)
+        yield from zip(symbols, results)
+
+def iter_batch_analyses(frames, period_days):
+    for symbol, indicators in iter_batch_indicators(frames):
+        yield symbol, build_analysis(symbol, frames[symbol], period_days, indicators)
+
+def analysis_cache_key(symbol, period_days, columnar, data):
+    """Yanıt önbelleği anahtarı; analizin hesaplandığı barları içerir"""
+    return ('technical-analysis', symbol, period_days, columnar, bar_stamp(data))
+
+def publish_analysis(symbol, data, period_days, indicators, columnar, ttl=None):
+    """Analizi kodlayıp yanıt önbelleğine koy"""
+    analysis = build_analysis(symbol, data, period_days, indicators, columnar)
+    cache_key = analysis_cache_key(symbol, period_days, columnar, data)
+    with timed('serialize'):
+        if columnar:
+            return response_cache.put(cache_key, encode_json(analysis), COLUMNAR_MIMETYPE, ttl)
+        return response_cache.put(cache_key, jsonify(analysis).get_data(), ttl=ttl)
+
+def precompute_analyses(symbols):
+    """Kapanış sonrası: verileri yenile, izleme listesinin analizlerini önbelleğe yaz.
+    Bir sonraki işlem gününe kadarki her günün istek penceresi ayrı hesaplanır."""
+    symbols = list(dict.fromkeys(fix_symbol(s) for s in symbols))
+    refresh_bars(symbols, max(PRECOMPUTE_PERIODS) + 50)
+    entries = 0
+    with app.app_context():
+        for day in serving_days():
+            end = day + 1
+            for period_days in PRECOMPUTE_PERIODS:
+                # get_period ile aynı pencere: isteğin yapıldığı gün dahil son period_days + 50 gün
+                frames = get_store().get_many(symbols, end - 1 - (period_days + 50), end)
+                frames = {s: data for s, data in frames.items() if len(data) >= 30}
+                for symbol, indicators in iter_batch_indicators(frames):
+                    for columnar in (False, True):
+                        publish_analysis(symbol, frames[symbol], period_days, indicators, columnar, PRECOMPUTE_TTL)
+                        entries += 1
+    if entries > response_cache.max_entries:
+        logger.warning(f"Önceden hesaplanan {entries} yanıt RESPONSE_CACHE_SIZE={response_cache.max_entries} sınırını aşıyor")
+    return {"entries": entries}
+
+precompute_scheduler = PrecomputeScheduler('analyses', precompute_analyses)
 
 # API Endpoint'leri
 @app.route('/', methods=['GET'])
@@ -434,8 +531,14 @@ def home():
         "version": "2.0.0",
         "status": "çalışıyor",
         "endpoints": {
-            "/technical-analysis/<symbol>": "Teknik analiz",
-            "/price-history/<symbol>": "Fiyat geçmişi"
+            "/technical-analysis/<symbol>": "Teknik analiz (?format=columnar ile sütunlu fiyat geçmişi)",
+            "/technical-analysis/batch": "Toplu teknik analiz (POST, NDJSON akışı)",
+            "/technical-analysis/<symbol>/update": "Yeni bar ile artımlı gösterge güncellemesi (POST)",
+            "/price-history/<symbol>": "Fiyat geçmişi (?format=columnar ile sütunlu)",
+            "/backtest": "Sinyallerin geçmiş veride toplu testi (POST)",
+            "/portfolio/analytics": "Portföy riski: korelasyon, volatilite, VaR, risk katkısı (POST)",
+            "/ready": "Hazırlık kontrolü",
+            "/metrics": "Prometheus metrikleri"
         }
     })
 
@@ -448,7 +551,7 @@ def technical_analysis(symbol):
         # Sembol düzelt
         symbol = fix_symbol(symbol)
         
-        logger.info(f"Teknik analiz isteği: {symbol}, süre: {period_days} gün")
+        trace(f"Teknik analiz isteği: {symbol}, süre: {period_days} gün")
         
         # Veri çek
         data = get_stock_data(symbol, period_days + 50)
@@ -459,35 +562,118 @@ def technical_analysis(symbol):
         if len(data) < 30:
             return jsonify({"error": "Yeterli veri yok"}), 400
         
-        # Son period_days kadar veri
-        recent_data = data.tail(period_days)
-        current_price = float(recent_data['Close'].iloc[-1])
+        columnar = wants_columnar()
+        cached = response_cache.get(analysis_cache_key(symbol, period_days, columnar, data))
+        if cached is None:
+            # Teknik göstergeleri hesapla
+            indicators = calculate_all_indicators(data)
+            cached = publish_analysis(symbol, data, period_days, indicators, columnar)
         
-        # Teknik göstergeleri hesapla
-        indicators = calculate_all_indicators(data)
+        return to_response(cached, request)
         
-        # Sinyalleri hesapla
-        signals = calculate_signals(indicators, current_price)
+    except UpstreamError as e:
+        logger.warning(f"Veri sağlayıcı hatası {symbol}: {e}")
+        return jsonify({"error": UPSTREAM_ERROR}), 503
+    except Exception as e:
+        logger.error(f"Teknik analiz hatası: {e}")
+        return jsonify({"error": "Analiz yapılamadı"}), 500
+
+@app.route('/technical-analysis/batch', methods=['POST'])
+def technical_analysis_batch():
+    try:
+        payload = request.get_json(silent=True) or {}
+        raw_symbols = payload.get('symbols') or []
+        period_days = int(payload.get('period_days', 90))
+        
+        if not isinstance(raw_symbols, list) or not raw_symbols:
+            return jsonify({"error": "symbols listesi gerekli"}), 400
+        if len(raw_symbols) > MAX_BATCH_SYMBOLS:
+            return jsonify({"error": f"En fazla {MAX_BATCH_SYMBOLS} sembol gönderilebilir"}), 400
         
-        # Fiyat geçmişi
-        price_history = format_price_history(recent_data)
+        symbols = list(dict.fromkeys(fix_symbol(str(s)) for s in raw_symbols))
+        trace(f"Toplu teknik analiz isteği: {len(symbols)} sembol, süre: {period_days} gün")
         
-        result = {
+    except (TypeError, ValueError):
+        return jsonify({"error": "Geçersiz istek"}), 400
+    
+    def generate():
+        try:
+            frames = get_stock_data_many(symbols, period_days + 50)
+        except UpstreamError as e:
+            logger.warning(f"Veri sağlayıcı hatası: {e}")
+            for symbol in symbols:
+                yield json.dumps({"symbol": symbol.replace('.IS', ''), "error": UPSTREAM_ERROR}) + "\n"
+            return
+        usable = {}
+        for symbol in symbols:
+            data = frames.get(symbol)
+            if data is None:
+                yield json.dumps({"symbol": symbol.replace('.IS', ''), "error": f"{symbol} için veri bulunamadı"}) + "\n"
+            elif len(data) < 30:
+                yield json.dumps({"symbol": symbol.replace('.IS', ''), "error": "Yeterli veri yok"}) + "\n"
+            else:
+                usable[symbol] = data
+        
+        try:
+            for symbol, result in iter_batch_analyses(usable, period_days):
+                with timed('serialize'):
+                    line = json.dumps(result) + "\n"
+                yield line
+        except Exception as e:
+            logger.error(f"Toplu teknik analiz hatası: {e}")
+            yield json.dumps({"error": "Analiz yapılamadı"}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/technical-analysis/<symbol>/update', methods=['POST'])
+def technical_analysis_update(symbol):
+    try:
+        bar = request.get_json(silent=True) or {}
+        if not isinstance(bar, dict):
+            return jsonify({"error": "Gövde bir JSON nesnesi olmalı"}), 400
+        missing = [key for key in ('date', 'high', 'low', 'close') if key not in bar]
+        if missing:
+            return jsonify({"error": f"Eksik alanlar: {', '.join(missing)}"}), 400
+        try:
+            prices = {key: float(bar[key]) for key in ('high', 'low', 'close')}
+        except (TypeError, ValueError):
+            return jsonify({"error": "high, low ve close sayı olmalı"}), 400
+        bar = dict(bar, **prices)
+        
+        symbol = fix_symbol(symbol)
+        bar_date = str(bar['date'])[:10]
+        
+        with indicator_states.lock(symbol):
+            state = indicator_states.load(symbol)
+            if state is None:
+                # İlk güncellemede durumu geçmiş verilerle başlat
+                trace(f"Gösterge durumu oluşturuluyor: {symbol}")
+                history = get_stock_data(symbol, STREAM_SEED_DAYS)
+                if history is not None:
+                    history = history[history.index < pd.Timestamp(bar_date)]
+                state = IndicatorState.from_history(history) if history is not None else IndicatorState()
+            
+            with timed('indicators'):
+                indicators = state.update(bar)
+            indicator_states.save(symbol, state)
+        
+        current_price = float(bar['close'])
+        return jsonify({
             "symbol": symbol.replace('.IS', ''),
+            "date": bar_date,
             "current_price": current_price,
-            "analysis_date": datetime.datetime.now().isoformat(),
-            "period_days": period_days,
-            "data_points": len(recent_data),
             "indicators": indicators,
-            "signals": signals,
-            "price_history": price_history
-        }
-        
-        return jsonify(result)
+            "signals": calculate_signals(indicators, current_price)
+        })
         
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except UpstreamError as e:
+        logger.warning(f"Veri sağlayıcı hatası {symbol}: {e}")
+        return jsonify({"error": UPSTREAM_ERROR}), 503
     except Exception as e:
-        logger.error(f"Teknik analiz hatası: {e}")
-        return jsonify({"error": "Analiz yapılamadı"}), 500
+        logger.error(f"Artımlı güncelleme hatası: {e}")
+        return jsonify({"error": "Güncelleme yapılamadı"}), 500
 
 @app.route('/price-history/<symbol>', methods=['GET'])
 def price_history(symbol):
@@ -499,18 +685,132 @@ def price_history(symbol):
         if data is None or data.empty:
             return jsonify({"error": f"{symbol} için veri bulunamadı"}), 404
         
-        history = format_price_history(data)
-        
-        return jsonify({
-            "symbol": symbol.replace('.IS', ''),
-            "price_history": history,
-            "data_points": len(data)
-        })
-        
+        columnar = wants_columnar()
+        cache_key = ('price-history', symbol, period_days, columnar, bar_stamp(data))
+        cached = response_cache.get(cache_key)
+        if cached is None:
+            with timed('serialize'):
+                if columnar:
+                    cached = response_cache.put(cache_key, encode_json({
+                        "symbol": symbol.replace('.IS', ''),
+                        "price_history": format_price_history_columnar(data),
+                        "data_points": len(data)
+                    }), COLUMNAR_MIMETYPE)
+                else:
+                    cached = response_cache.put(cache_key, jsonify({
+                        "symbol": symbol.replace('.IS', ''),
+                        "price_history": format_price_history(data),
+                        "data_points": len(data)
+                    }).get_data())
+        
+        return to_response(cached, request)
+        
+    except UpstreamError as e:
+        logger.warning(f"Veri sağlayıcı hatası {symbol}: {e}")
+        return jsonify({"error": UPSTREAM_ERROR}), 503
     except Exception as e:
         logger.error(f"Fiyat geçmişi hatası: {e}")
         return jsonify({"error": "Fiyat geçmişi alınamadı"}), 500
 
+@app.route('/backtest', methods=['POST'])
+def backtest():
+    try:
+        payload = request.get_json(silent=True) or {}
+        raw_symbols = payload.get('symbols') or []
+        period_days = int(payload.get('period_days', 5 * 365))
+        cost_bps = float(payload.get('cost_bps', BACKTEST_COST_BPS))
+        delay = int(payload.get('delay', 1))
+        allow_short = bool(payload.get('allow_short', False))
+        per_symbol = bool(payload.get('per_symbol', False))
+        
+        if not isinstance(raw_symbols, list) or not raw_symbols:
+            return jsonify({"error": "symbols listesi gerekli"}), 400
+        if len(raw_symbols) > MAX_BATCH_SYMBOLS:
+            return jsonify({"error": f"En fazla {MAX_BATCH_SYMBOLS} sembol gönderilebilir"}), 400
+        if period_days < 60 or cost_bps < 0 or delay < 1:
+            return jsonify({"error": "Geçersiz parametre"}), 400
+        
+        symbols = list(dict.fromkeys(fix_symbol(str(s)) for s in raw_symbols))
+        
+    except (TypeError, ValueError):
+        return jsonify({"error": "Geçersiz istek"}), 400
+    
+    try:
+        trace(f"Backtest isteği: {len(symbols)} sembol, süre: {period_days} gün, maliyet: {cost_bps} bp")
+        frames = get_stock_data_many(symbols, period_days)
+        with timed('backtest'):
+            result = run_backtest(frames, cost_bps=cost_bps, allow_short=allow_short, delay=delay,
+                                  per_symbol=per_symbol)
+        if result is None:
+            return jsonify({"error": "Test için yeterli veri yok"}), 404
+        result['missing_symbols'] = [s.replace('.IS', '') for s in symbols if s not in frames]
+        return jsonify(result)
+        
+    except UpstreamError as e:
+        logger.warning(f"Veri sağlayıcı hatası: {e}")
+        return jsonify({"error": UPSTREAM_ERROR}), 503
+    except Exception as e:
+        logger.error(f"Backtest hatası: {e}")
+        return jsonify({"error": "Backtest yapılamadı"}), 500
+
+@app.route('/portfolio/analytics', methods=['POST'])
+def portfolio_analytics():
+    try:
+        payload = request.get_json(silent=True) or {}
+        holdings = payload.get('holdings') or []
+        period_days = int(payload.get('period_days', 365))
+        confidence = float(payload.get('confidence', PORTFOLIO_CONFIDENCE))
+        horizon = int(payload.get('horizon_days', 1))
+        include_covariance = bool(payload.get('include_covariance', False))
+        
+        if not isinstance(holdings, list) or not holdings:
+            return jsonify({"error": "holdings listesi gerekli"}), 400
+        if len(holdings) > MAX_BATCH_SYMBOLS:
+            return jsonify({"error": f"En fazla {MAX_BATCH_SYMBOLS} varlık gönderilebilir"}), 400
+        if period_days < 60 or not 0.5 <= confidence < 1 or horizon < 1:
+            return jsonify({"error": "Geçersiz parametre"}), 400
+        
+        # Her varlık ya ağırlıkla ya da adetle verilir; adetler son kapanışla değere çevrilir
+        by_quantity = all('weight' not in h and 'quantity' in h for h in holdings)
+        if not by_quantity and not all('weight' in h for h in holdings):
+            return jsonify({"error": "Her varlık için weight (ya da hepsi için quantity) gerekli"}), 400
+        amounts = {}
+        for holding in holdings:
+            symbol = fix_symbol(str(holding['symbol']))
+            amounts[symbol] = amounts.get(symbol, 0.0) + float(holding['quantity' if by_quantity else 'weight'])
+        
+    except (TypeError, ValueError, KeyError):
+        return jsonify({"error": "Geçersiz istek"}), 400
+    
+    try:
+        trace(f"Portföy analizi isteği: {len(amounts)} varlık, süre: {period_days} gün")
+        frames = get_stock_data_many(list(amounts), period_days)
+        weights = amounts
+        if by_quantity:
+            weights = {s: q * float(frames[s]['Close'].iloc[-1]) for s, q in amounts.items() if s in frames}
+        with timed('portfolio'):
+            result = analyze_portfolio(frames, weights, confidence, horizon, include_covariance)
+        if result is None:
+            return jsonify({"error": "Analiz için yeterli ortak veri yok"}), 404
+        result['missing_symbols'] = [s.replace('.IS', '') for s in amounts if s not in frames]
+        with timed('serialize'):
+            return jsonify(result)
+        
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except UpstreamError as e:
+        logger.warning(f"Veri sağlayıcı hatası: {e}")
+        return jsonify({"error": UPSTREAM_ERROR}), 503
+    except Exception as e:
+        logger.error(f"Portföy analizi hatası: {e}")
+        return jsonify({"error": "Portföy analizi yapılamadı"}), 500
+
+@app.route('/ready', methods=['GET'])
+def readiness():
+    if not ready.is_set():
+        return jsonify({"status": "hazır değil"}), 503
+    return jsonify({"status": "hazır"})
+
 @app.errorhandler(404)
 def not_found(e):
     return jsonify({"error": "Sayfa bulunamadı"}), 404
@@ -521,4 +821,5 @@ def server_error(e):
 
 if __name__ == '__main__':
     logger.info("Teknik Analiz API başlatılıyor...")
-    app.run(host='0.0.0.0', port=5001, debug=True) 
\ No newline at end of file
+    start_background_tasks()
+    app.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
@@ -0,0 +1,40 @@
+import threading
+
+import numpy as np
+
+from inference_batcher import InferenceBatcher
+
+
+class Doubler:
+    def __init__(self):
+        self.calls = 0
+
+    def predict_on_batch(self, inputs):
+        self.calls += 1
+        return inputs * 2
+
+
+def test_concurrent_callers_share_passes_and_leave_no_queues():
+    batcher = InferenceBatcher(max_batch_size=64, max_wait_ms=50)
+    model = Doubler()
+    results = {}
+
+    def call(i):
+        results[i] = batcher.predict(('SYM', 1), model, np.full((1, 3), i))
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all((results[i] == 2 * i).all() for i in range(16))
+    assert model.calls < 16
+    assert batcher._queues == {}
+
+
+def test_queues_of_old_versions_are_dropped():
+    batcher = InferenceBatcher(max_wait_ms=0)
+    for version in range(5):
+        batcher.predict(('SYM', version), Doubler(), np.ones((1, 3)))
+    assert batcher._queues == {}
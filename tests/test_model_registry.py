@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+
+import numpy as np
+
+from model_registry import ModelKey, ModelRegistry
+
+
+class TinyModel:
+    """Stands in for a Keras model: ``save`` writes a file, the NumPy export is skipped."""
+
+    layers = []
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(b'weights')
+
+    def predict_on_batch(self, inputs):
+        return np.zeros((len(inputs), 1))
+
+
+def save_versions(root, count):
+    registry = ModelRegistry(root, runtime='keras')
+    return [registry.save(ModelKey.create('SYM.IS'), TinyModel()) for _ in range(count)]
+
+
+def test_concurrent_processes_get_distinct_versions(tmp_path):
+    with multiprocessing.get_context('spawn').Pool(4) as pool:
+        results = pool.starmap(save_versions, [(str(tmp_path), 5)] * 4)
+    versions = sorted(v for result in results for v in result)
+    assert versions == list(range(1, 21))
+
+    registry = ModelRegistry(str(tmp_path), runtime='keras')
+    key = ModelKey.create('SYM.IS')
+    assert registry.latest_version(key) == 20
+    assert all(registry.read_meta(key, v)['version'] == v for v in versions)
+    assert not [name for name in os.listdir(registry._key_dir(key)) if name.startswith('.tmp')]
+
+
+def test_failed_save_releases_its_version(tmp_path):
+    class Broken(TinyModel):
+        def save(self, path):
+            raise OSError("disk full")
+
+    registry = ModelRegistry(str(tmp_path), runtime='keras')
+    key = ModelKey.create('SYM.IS')
+    try:
+        registry.save(key, Broken())
+    except OSError:
+        pass
+    assert registry.save(key, TinyModel()) == 1
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import yfinance
+
+from ohlcv_store import DataProvider, OHLCVStore, SyntheticProvider, YahooProvider
+from upstream import UpstreamError, UpstreamGate
+
+
+class FlakyProvider(DataProvider):
+    """Synthetic bars, except that the first ``failures`` calls answer with an empty frame."""
+
+    def __init__(self, failures=1, answer=pd.DataFrame):
+        self.bars = SyntheticProvider()
+        self.failures = failures
+        self.answer = answer
+        self.calls = 0
+
+    def fetch(self, symbol, start, end):
+        self.calls += 1
+        if self.calls <= self.failures:
+            return self.answer()
+        return self.bars.fetch(symbol, start, end)
+
+
+def all_nan():
+    index = pd.bdate_range('2024-01-01', '2024-05-31', name='Date')
+    return pd.DataFrame(np.nan, index=index, columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+
+
+def make_store(tmp_path, provider):
+    # No stale-while-revalidate: every sync of a missing tail fetches in the foreground
+    return OHLCVStore(root=str(tmp_path), provider=provider, stale_max_age=0, gate=UpstreamGate(timeout=5))
+
+
+def read_meta(tmp_path, symbol):
+    path = os.path.join(str(tmp_path), symbol, 'meta.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize('answer', [pd.DataFrame, all_nan])
+def test_empty_answer_is_a_failure_and_not_stored(tmp_path, answer):
+    provider = FlakyProvider(answer=answer)
+    store = make_store(tmp_path, provider)
+
+    with pytest.raises(UpstreamError):
+        store.get('FLAKY.IS', '2024-01-01', '2024-06-01')
+    assert read_meta(tmp_path, 'FLAKY.IS') is None
+
+    # The provider recovered: the range is fetched again
+    data = store.get('FLAKY.IS', '2024-01-01', '2024-06-01')
+    expected = SyntheticProvider().fetch('FLAKY.IS', '2024-01-01', '2024-06-01')
+    assert len(data) == len(expected) > 100
+    assert read_meta(tmp_path, 'FLAKY.IS')['rows'] == len(expected)
+
+
+def test_failed_tail_keeps_stored_bars_and_coverage(tmp_path):
+    provider = FlakyProvider(failures=0)
+    store = make_store(tmp_path, provider)
+    store.get('FLAKY.IS', '2024-01-01', '2024-03-01')
+
+    provider.failures = provider.calls + 1  # the next call fails
+    data = store.get('FLAKY.IS', '2024-01-01', '2024-06-01')
+    assert data.index[-1] < pd.Timestamp('2024-03-01')
+    assert read_meta(tmp_path, 'FLAKY.IS')['end'] == '2024-03-01'
+
+    data = store.get('FLAKY.IS', '2024-01-01', '2024-06-01')
+    assert data.index[-1] >= pd.Timestamp('2024-05-30')
+    assert read_meta(tmp_path, 'FLAKY.IS')['end'] == '2024-06-01'
+
+
+def test_cut_short_answer_covers_only_the_bars_returned(tmp_path):
+    class CutShort(SyntheticProvider):
+        def fetch(self, symbol, start, end):
+            return super().fetch(symbol, start, min(np.datetime64(end), np.datetime64('2024-03-16')))
+
+    store = make_store(tmp_path, CutShort())
+    store.get('CUT.IS', '2024-01-01', '2024-06-01')
+    # Friday 2024-03-15 was the last bar: covered through the weekend, up to Monday
+    assert read_meta(tmp_path, 'CUT.IS')['end'] == '2024-03-18'
+
+
+def test_empty_answer_before_listing_is_accepted(tmp_path):
+    class ListedInMarch(SyntheticProvider):
+        def fetch(self, symbol, start, end):
+            return super().fetch(symbol, max(np.datetime64(start), np.datetime64('2024-03-01')), end)
+
+    store = make_store(tmp_path, ListedInMarch())
+    assert store.get('NEW.IS', '2024-01-01', '2024-06-01').index[0] == pd.Timestamp('2024-03-01')
+    assert len(store.get('NEW.IS', '2023-06-01', '2024-06-01')) > 0
+    assert read_meta(tmp_path, 'NEW.IS')['start'] == '2023-06-01'
+
+
+def test_sync_many_marks_empty_symbols_failed(tmp_path):
+    class OneMissing(SyntheticProvider):
+        def fetch_many(self, symbols, start, end):
+            return {symbol: self.fetch(symbol, start, end) for symbol in symbols if symbol != 'GONE.IS'}
+
+    store = make_store(tmp_path, OneMissing())
+    frames = store.get_many(['A.IS', 'GONE.IS'], '2024-01-01', '2024-06-01')
+    assert len(frames['A.IS']) > 100 and frames['GONE.IS'].empty
+    assert read_meta(tmp_path, 'GONE.IS') is None
+
+
+def yahoo_download(errors=None, answer=pd.DataFrame):
+    """A stand-in for yf.download that reports ``errors`` the way yfinance does."""
+    def download(tickers, **kwargs):
+        log = logging.getLogger('yfinance')
+        for error, symbols in (errors or {}).items():
+            log.error(f"{symbols}: {error}")
+        return answer()
+    return download
+
+
+@pytest.mark.parametrize('errors', [
+    {'YFRateLimitError("Too Many Requests. Rate limited. Try after a while.")': ['THYAO.IS']},
+    {"Timeout('Failed to perform, curl: (28) Operation timed out')": ['THYAO.IS']},
+    None,
+])
+def test_yahoo_provider_raises_on_reported_errors_and_empty_answers(monkeypatch, errors):
+    monkeypatch.setattr(yfinance, 'download', yahoo_download(errors))
+    with pytest.raises(UpstreamError):
+        YahooProvider().fetch('THYAO.IS', '2024-01-01', '2024-06-01')
+
+
+def test_yahoo_provider_leaves_no_prices_to_the_store(monkeypatch):
+    errors = {'YFPricesMissingError("possibly delisted; no price data found")': ['NEW.IS']}
+    monkeypatch.setattr(yfinance, 'download', yahoo_download(errors))
+    assert YahooProvider().fetch('NEW.IS', '2024-01-01', '2024-06-01').empty
+
+
+def test_yahoo_provider_fetch_many_drops_failed_symbols(monkeypatch):
+    bars = SyntheticProvider().fetch('A.IS', '2024-01-01', '2024-06-01')
+    answer = lambda: pd.concat({'A.IS': bars, 'B.IS': bars * np.nan}, axis=1)
+    monkeypatch.setattr(yfinance, 'download', yahoo_download({"Timeout('timed out')": ['B.IS']}, answer))
+    assert list(YahooProvider().fetch_many(['A.IS', 'B.IS'], '2024-01-01', '2024-06-01')) == ['A.IS']
+
+    monkeypatch.setattr(yfinance, 'download', yahoo_download({"Timeout('timed out')": ['A.IS', 'B.IS']}))
+    with pytest.raises(UpstreamError):
+        YahooProvider().fetch_many(['A.IS', 'B.IS'], '2024-01-01', '2024-06-01')
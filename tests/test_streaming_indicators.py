@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+from benchmarks.bench_indicators import streaming_divergence
+from ohlcv_store import SyntheticProvider
+from streaming_indicators import IndicatorState
+
+
+@pytest.fixture(scope='module')
+def history():
+    return SyntheticProvider().fetch('SYM000.IS', '2024-01-01', '2024-07-01')
+
+
+def test_streaming_matches_batch_functions(history):
+    assert streaming_divergence(history) < 1e-6
+
+
+def test_snapshot_restore_round_trip(history):
+    state = IndicatorState.from_history(history.iloc[:60])
+    restored = IndicatorState.restore(json.loads(json.dumps(state.snapshot())))
+    for date, row in history.iloc[60:].iterrows():
+        bar = {'date': date.strftime('%Y-%m-%d'), 'high': row['High'], 'low': row['Low'], 'close': row['Close']}
+        assert restored.update(bar) == state.update(bar)
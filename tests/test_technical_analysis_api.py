@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+import yfinance
+
+import technical_analysis_api
+from ohlcv_store import OHLCVStore, SyntheticProvider, YahooProvider, set_store, today
+from upstream import UpstreamGate
+
+from test_ohlcv_store import yahoo_download
+
+
+@pytest.fixture
+def client():
+    technical_analysis_api.app.config['TESTING'] = True
+    yield technical_analysis_api.app.test_client()
+    set_store(None)
+
+
+def install(tmp_path, provider):
+    store = OHLCVStore(root=str(tmp_path), provider=provider, stale_max_age=0, gate=UpstreamGate(timeout=5))
+    set_store(store)
+    return store
+
+
+def rate_limited(monkeypatch, symbols):
+    """Make yf.download report ``symbols`` as rate limited; returns the list of its calls."""
+    errors = {'YFRateLimitError("Too Many Requests. Rate limited. Try after a while.")': symbols}
+    download = yahoo_download(errors)
+    calls = []
+
+    def counted(tickers, **kwargs):
+        calls.append(tickers)
+        return download(tickers, **kwargs)
+    monkeypatch.setattr(yfinance, 'download', counted)
+    return calls
+
+
+def test_failing_provider_is_503_not_404(client, tmp_path, monkeypatch):
+    calls = rate_limited(monkeypatch, ['THYAO.IS'])
+    install(tmp_path, YahooProvider())
+    response = client.get('/price-history/THYAO?period_days=60')
+    assert response.status_code == 503
+    assert calls
+
+
+def test_failing_provider_serves_stored_bars(client, tmp_path, monkeypatch):
+    # Bars stored up to three weeks ago: the last three weeks are a gap to fetch
+    store = install(tmp_path, SyntheticProvider())
+    stored_end = today() - 21
+    stored = store.get('THYAO.IS', today() - 120, stored_end)
+    assert len(stored) > 50
+
+    calls = rate_limited(monkeypatch, ['THYAO.IS', 'GARAN.IS'])
+    store.provider = YahooProvider()
+    response = client.get('/price-history/THYAO?period_days=60')
+    assert calls == ['THYAO.IS']
+    assert response.status_code == 200
+    history = response.get_json()['price_history']
+    dates = pd.DatetimeIndex([bar['date'] for bar in history])
+    assert len(history) > 20
+    assert dates[-1] < pd.Timestamp(stored_end) <= dates[-1] + pd.Timedelta(days=4)
+    assert np.allclose([bar['close'] for bar in history], stored['Close'].tail(len(history)).to_numpy())
+
+    # Nothing stored for this one: the failure is the answer
+    response = client.get('/price-history/GARAN?period_days=60')
+    assert calls == ['THYAO.IS', 'GARAN.IS']
+    assert response.status_code == 503
+
+
+@pytest.mark.parametrize('body', ['[1, 2, 3]', '"bar"', '42', '{"date": "2024-06-03", "high": 10}',
+                                  '{"date": "2024-06-03", "high": null, "low": 9, "close": 9.5}',
+                                  '{"date": "2024-06-03", "high": [10], "low": 9, "close": 9.5}'])
+def test_update_rejects_malformed_bars(client, tmp_path, body):
+    install(tmp_path, SyntheticProvider())
+    response = client.post('/technical-analysis/THYAO/update', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
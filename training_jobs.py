@@ -0,0 +1,209 @@
+"""Background training jobs for the prediction API.
+
+Training runs in a spawn-based process pool so a 100-epoch fit never blocks a
+Flask request thread. Workers report per-epoch progress over a queue that a
+listener thread in the parent folds into the job records served by
+``GET /jobs/<id>``. Concurrent submissions for the same model key share one
+job.
+"""
+import os
+import time
+import uuid
+import atexit
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger("training_jobs")
+
+TRAIN_WORKERS = int(os.environ.get('TRAIN_WORKERS', 1))
+MAX_FINISHED_JOBS = 500
+
+QUEUED, RUNNING, COMPLETED, FAILED = 'queued', 'running', 'completed', 'failed'
+
+# Set in each worker process by _init_worker
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_job(trainer, job_id, symbol, start_date, end_date, params):
+    def progress(epoch, epochs, logs=None):
+        _progress_queue.put(('progress', job_id, {'epoch': epoch, 'epochs': epochs, 'logs': logs or {}}))
+
+    _progress_queue.put(('started', job_id, {'pid': os.getpid()}))
+    return trainer(symbol, start_date, end_date, params, progress=progress)
+
+
+class TrainingPending(Exception):
+    """Raised when a prediction needs a model that is still being trained."""
+
+    def __init__(self, job):
+        super().__init__(f"Model training in progress (job {job['id']})")
+        self.job = job
+
+
+class TrainingJobQueue:
+    """Deduplicating job queue on top of a process pool."""
+
+    def __init__(self, trainer, max_workers=TRAIN_WORKERS, on_complete=None):
+        self.trainer = trainer
+        self.max_workers = max_workers
+        self.on_complete = on_complete
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._active = {}  # dedup key -> job id
+        self._lock = threading.Lock()
+        self._executor = None
+        self._queue = None
+        self._listener = None
+        atexit.register(self.shutdown)
+
+    def _ensure_pool(self):
+        if self._executor is not None:
+            return
+        context = multiprocessing.get_context('spawn')  # TensorFlow is not fork-safe
+        self._queue = context.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._queue,),
+        )
+        self._listener = threading.Thread(target=self._listen, name='training-progress', daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            kind, job_id, payload = event
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                if kind == 'started' and job['status'] == QUEUED:
+                    job['status'] = RUNNING
+                    job['started_at'] = time.time()
+                elif kind == 'progress':
+                    job['epoch'] = payload['epoch']
+                    job['epochs'] = payload['epochs']
+                    job['metrics'].append(dict(payload['logs'], epoch=payload['epoch']))
+
+    def submit(self, dedup_key, symbol, start_date, end_date, params=None):
+        """Queue a training run; returns ``(job, created)``."""
+        with self._lock:
+            active_id = self._active.get(dedup_key)
+            if active_id is not None:
+                return dict(self._jobs[active_id]), False
+
+            self._ensure_pool()
+            job_id = uuid.uuid4().hex
+            try:
+                future = self._executor.submit(_run_job, self.trainer, job_id, symbol, start_date, end_date, params)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM during fit); start a fresh pool
+                logger.warning("Training pool is broken, restarting it")
+                self.shutdown()
+                self._ensure_pool()
+                future = self._executor.submit(_run_job, self.trainer, job_id, symbol, start_date, end_date, params)
+
+            job = {
+                'id': job_id,
+                'status': QUEUED,
+                'symbol': symbol,
+                'start': start_date,
+                'end': end_date,
+                'params': params,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'epoch': 0,
+                'epochs': None,
+                'metrics': [],
+                'result': None,
+                'error': None,
+            }
+            self._jobs[job_id] = job
+            self._active[dedup_key] = job_id
+            self._futures[job_id] = future
+            self._trim()
+
+        future.add_done_callback(lambda f: self._finish(dedup_key, job_id, f))
+        logger.info(f"Queued training job {job_id} for {symbol}")
+        return dict(job), True
+
+    def _finish(self, dedup_key, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            self._active.pop(dedup_key, None)
+            self._futures.pop(job_id, None)
+            if job is None:
+                return
+            job['finished_at'] = time.time()
+            if future.cancelled():
+                # Still queued when the pool shut down (shutdown(cancel_futures=True))
+                error = RuntimeError("Cancelled: the training pool was shut down")
+            else:
+                error = future.exception()
+            if error is None:
+                job['status'] = COMPLETED
+                job['result'] = future.result()
+            else:
+                job['status'] = FAILED
+                job['error'] = str(error)
+        if error is None:
+            logger.info(f"Training job {job_id} completed")
+            if self.on_complete is not None:
+                self.on_complete(dedup_key, job)
+        else:
+            logger.error(f"Training job {job_id} failed: {str(error)}")
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in (COMPLETED, FAILED)]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, metrics=list(job['metrics'])) if job is not None else None
+
+    def active_count(self):
+        """Jobs queued or running."""
+        with self._lock:
+            return len(self._active)
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes and return its final record."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except FutureTimeout:
+                return self.get(job_id)
+            except (Exception, CancelledError):
+                pass  # surfaced through the job record
+        # _finish runs in a done callback; make sure it has landed
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            job = self.get(job_id)
+            if job is None or job['status'] in (COMPLETED, FAILED):
+                return job
+            time.sleep(0.01)
+        return self.get(job_id)
+
+    def shutdown(self, wait=False):
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        self._queue.put(None)
+        self._executor = None
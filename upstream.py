@@ -0,0 +1,75 @@
+"""Bounded, deduplicated calls to the upstream market data provider.
+
+Every provider call of the OHLCV store goes through one ``UpstreamGate`` per
+process:
+
+* Concurrent calls with the same arguments share one upstream call
+  (singleflight); the callers that join it wait for its result.
+* At most ``UPSTREAM_CONCURRENCY`` calls run at once; the rest queue.
+* A caller waits at most ``UPSTREAM_TIMEOUT`` seconds, including the time
+  spent queued. It then gets an ``UpstreamError``, while the call keeps its
+  slot until the provider returns, so a hanging upstream cannot pile up
+  threads.
+
+Provider failures are raised as ``UpstreamError`` as well, so callers can
+tell "the provider is unavailable" apart from "there is no data". The store
+uses this to serve the bars it already has (stale-while-revalidate, see
+ohlcv_store.py).
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+logger = logging.getLogger("upstream")
+
+UPSTREAM_CONCURRENCY = int(os.environ.get('UPSTREAM_CONCURRENCY', 4))
+UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 30))  # seconds per call, queueing included
+
+
+class UpstreamError(Exception):
+    """The provider failed or did not answer in time."""
+
+
+class UpstreamGate:
+    """Singleflight, concurrency limit and deadline for provider calls."""
+
+    def __init__(self, concurrency=UPSTREAM_CONCURRENCY, timeout=UPSTREAM_TIMEOUT):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='upstream')
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.calls = 0  # upstream calls started
+        self.shared = 0  # callers that joined a call already in flight
+
+    def call(self, key, fn, *args):
+        """``fn(*args)``, shared with concurrent callers passing the same ``key``."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._executor.submit(fn, *args)
+                self._inflight[key] = future
+                self.calls += 1
+            else:
+                self.shared += 1
+        if leader:
+            # Outside the lock: the callback runs right here if the call has already finished
+            future.add_done_callback(lambda f: self._forget(key, f))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise UpstreamError(f"{key[0]} timed out after {self.timeout:g}s") from None
+        except UpstreamError:
+            raise
+        except Exception as e:
+            raise UpstreamError(f"{key[0]} failed: {e}") from e
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def inflight(self):
+        with self._lock:
+            return len(self._inflight)
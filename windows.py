@@ -0,0 +1,86 @@
+"""Sliding-window datasets for the LSTM.
+
+``sliding_windows`` returns ``X`` and ``y`` as strided views of the scaled
+series, so the ``time_step`` x overlap between consecutive windows is never
+copied. For multi-symbol training sets that do not fit in memory,
+``iter_window_batches`` and ``window_dataset`` stream fixed-size batches from
+any iterable of series (e.g. one symbol at a time from the OHLCV store), and
+only the batch being fed to the model is materialized.
+"""
+import logging
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger("windows")
+
+
+def sliding_windows(series, time_step):
+    """``(X, y)`` views with ``X[i] = series[i:i + time_step]`` and ``y[i] = series[i + time_step]``.
+
+    ``series`` is 1-D or a single-column 2-D array. ``X`` has shape
+    ``(len - time_step, time_step, 1)``; both are read-only views.
+    """
+    values = np.asarray(series)
+    if values.ndim == 2:
+        values = values[:, 0]
+    if len(values) <= time_step:
+        raise ValueError(f"Insufficient data: {len(values)} points available, {time_step} required")
+    X = sliding_window_view(values, time_step)[:-1, :, np.newaxis]
+    y = values[time_step:]
+    return X, y
+
+
+def iter_window_batches(series_iter, time_step, batch_size=256, dtype=np.float32):
+    """Yield ``(X_batch, y_batch)`` arrays across a stream of series.
+
+    Windows never span two series. Batches are filled across series
+    boundaries, so every batch except the last has ``batch_size`` rows. Series
+    too short for one window are skipped.
+    """
+    X_buffer = np.empty((batch_size, time_step, 1), dtype=dtype)
+    y_buffer = np.empty(batch_size, dtype=dtype)
+    filled = 0
+    for series in series_iter:
+        try:
+            X, y = sliding_windows(series, time_step)
+        except ValueError:
+            continue
+        start = 0
+        while start < len(X):
+            take = min(batch_size - filled, len(X) - start)
+            X_buffer[filled:filled + take] = X[start:start + take]
+            y_buffer[filled:filled + take] = y[start:start + take]
+            filled += take
+            start += take
+            if filled == batch_size:
+                yield X_buffer.copy(), y_buffer.copy()
+                filled = 0
+    if filled:
+        yield X_buffer[:filled].copy(), y_buffer[:filled].copy()
+
+
+def window_dataset(series_source, time_step, batch_size=256, shuffle_buffer=0, mix_buffer=0):
+    """``tf.data.Dataset`` of window batches streamed from ``series_source``.
+
+    ``series_source`` is a zero-argument callable returning a fresh iterable of
+    series, so the dataset can be iterated once per epoch. With
+    ``shuffle_buffer`` > 0, batches (not single windows) are shuffled. With
+    ``mix_buffer`` > 0, single windows are shuffled through a buffer of that
+    many windows and rebatched, so each batch mixes consecutive series (e.g.
+    several symbols).
+    """
+    import tensorflow as tf
+
+    dataset = tf.data.Dataset.from_generator(
+        lambda: iter_window_batches(series_source(), time_step, batch_size),
+        output_signature=(
+            tf.TensorSpec(shape=(None, time_step, 1), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32),
+        ),
+    )
+    if mix_buffer:
+        dataset = dataset.unbatch().shuffle(mix_buffer).batch(batch_size)
+    if shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer)
+    return dataset.prefetch(tf.data.AUTOTUNE)